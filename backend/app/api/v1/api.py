@@ -1,6 +1,8 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import stocks, debug
+from app.api.v1.endpoints import stocks, debug, jobs, quotes
 
 api_router = APIRouter()
 api_router.include_router(stocks.router)
-api_router.include_router(debug.router) 
\ No newline at end of file
+api_router.include_router(debug.router)
+api_router.include_router(jobs.router)
+api_router.include_router(quotes.router) 
\ No newline at end of file
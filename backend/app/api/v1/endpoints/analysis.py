@@ -1,136 +1,479 @@
+import logging
 from typing import List, Dict
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.db.session import get_db, get_read_db, get_async_db
+from app.core.config import settings
+from app.core.executor import run_cpu_bound
+from app.core.profiling import profile_section
+from app.core.responses import FastJSONResponse
+from app import tasks
+from app.schemas.analysis import BacktestRequest, BacktestSweepRequest, IndicatorBatchRequest, IndicatorBatchResponse
 from app.schemas.stock import StockTrade
-from app.services import stock, analysis, export
+from app.services import stock, analysis, backtest, export, indicator_state, market_analysis, sweep
+from app.services.cache import indicator_cache
+from app.services.columnar import get_columnar_store, dates_to_strings
 from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 指标输入列对应的交易数据字段
+INPUT_FIELDS = {
+    "close": "close_price",
+    "high": "high_price",
+    "low": "low_price",
+    "volume": "volume"
+}
+
+@router.post("/indicators/batch", response_model=IndicatorBatchResponse)
+async def get_batch_technical_indicators(
+    request: IndicatorBatchRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """批量获取多只股票的技术指标
+
+    一次查询加载全部股票的交易数据，按列向量化计算指标，可选的指标及每只股票的结果与
+    /indicators/{stock_code} 一致。不存在或交易数据不足的股票放入 errors。
+    """
+    codes = list(dict.fromkeys(request.codes))
+    if len(codes) > settings.BATCH_INDICATOR_MAX_CODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"单次最多计算 {settings.BATCH_INDICATOR_MAX_CODES} 只股票"
+        )
+    try:
+        selected = analysis.resolve_indicators(request.indicators)
+        start = datetime.strptime(request.start_date, '%Y-%m-%d').date() if request.start_date else None
+        end = datetime.strptime(request.end_date, '%Y-%m-%d').date() if request.end_date else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    indicators = [indicator.name for indicator in selected]
+    lookback = analysis.max_lookback(selected)
+    last = None if start else settings.INDICATOR_DEFAULT_BARS
+
+    try:
+        matrix = await db.run_sync(
+            market_analysis.load_price_matrix,
+            start_date=start,
+            end_date=end,
+            stock_codes=codes,
+            per_symbol_limit=None if start else last + lookback,
+            lookback=lookback,
+            inputs=analysis.required_inputs(selected)
+        )
+        results, errors = await run_cpu_bound(
+            _calculate_batch_indicators, matrix, indicators, start, last, lookback
+        )
+
+        missing = [code for code in codes if code not in results and code not in errors]
+        if missing:
+            existing = set(await db.run_sync(stock.get_existing_codes, missing))
+            for code in missing:
+                errors[code] = (
+                    f"未找到股票 {code} 在指定时间范围内的交易数据" if code in existing
+                    else f"股票 {code} 不存在"
+                )
+        return {"results": results, "errors": errors}
+
+    except Exception as e:
+        logger.error(f"批量计算技术指标时发生错误：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="计算技术指标时发生错误，请稍后重试"
+        )
+
+def _calculate_batch_indicators(matrix, indicators: List[str], start_date=None, last: int = None, lookback: int = 0):
+    computed = market_analysis.calculate_market_indicators(matrix, indicators, start_date, last)
+    return market_analysis.symbol_results(matrix, computed, indicators, start_date, last, lookback)
+
+def _load_indicator_inputs(
+    db: Session,
+    stock_code: str,
+    start_date: str = None,
+    end_date: str = None,
+    inputs: List[str] = ("close", "volume"),
+    lookback: int = 0,
+    period: str = "day"
+):
+    """检查股票是否存在并读取计算技术指标所需的输入列和日期
+
+    在请求区间之前多读取 lookback 个交易日作为预热数据，使区间开头的指标与连续计算的结果一致；
+    未指定开始日期时区间为最近的 INDICATOR_DEFAULT_BARS 个交易日。period 不为 day 时读取周期K线，
+    上述条数均按K线计。
+
+    Returns:
+        (columns, dates, warmup)：columns 的键为 inputs 中的输入列名称，前 warmup 条为预热数据
+    """
+    # 首先检查股票是否存在
+    stock_info = stock.get_stock_basic(db=db, code=stock_code)
+    if not stock_info:
+        raise HTTPException(
+            status_code=404,
+            detail=f"股票 {stock_code} 不存在"
+        )
+
+    start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+    end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    default_bars = settings.INDICATOR_DEFAULT_BARS
+
+    # 日线优先从列式存储读取，未启用或缺少该股票时回退到数据库
+    store = get_columnar_store() if period == "day" else None
+    columns = store.read_range(
+        stock_code,
+        start_date=start,
+        end_date=end,
+        limit=None if start else default_bars,
+        lookback=lookback
+    ) if store else None
+    
+    if columns is not None:
+        trade_dates = columns["trade_date"]
+        if start:
+            warmup = int(np.searchsorted(trade_dates, np.datetime64(start, "D")))
+        else:
+            warmup = max(len(trade_dates) - default_bars, 0)
+        dates = dates_to_strings(trade_dates)
+        columns = {name: columns[INPUT_FIELDS[name]] for name in inputs}
+    else:
+        rows, warmup = stock.get_trade_window(
+            db,
+            stock_info.id,
+            [INPUT_FIELDS[name] for name in inputs],
+            start_date=start,
+            end_date=end,
+            lookback=lookback,
+            default_bars=default_bars,
+            period=period
+        )
+        columns = {name: [row[i + 1] for row in rows] for i, name in enumerate(inputs)}
+        dates = [row[0].strftime('%Y-%m-%d') for row in rows]
+    
+    if len(dates) == warmup:
+        raise HTTPException(
+            status_code=404,
+            detail=f"未找到股票 {stock_code} 在指定时间范围内的交易数据"
+        )
+    
+    # 预热数据不足（上市时间较短）时，至少需要 MIN_INDICATOR_BARS 天数据才能计算技术指标
+    if warmup < lookback and len(dates) < market_analysis.MIN_INDICATOR_BARS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"股票 {stock_code} 的交易数据不足{market_analysis.MIN_INDICATOR_BARS}天，无法计算技术指标"
+        )
+
+    return columns, dates, warmup
+
+def _calculate_indicators(
+    columns: Dict[str, List[float]],
+    dates: List[str],
+    indicators: List[str] = None,
+    warmup: int = 0
+) -> Dict:
+    """在包含预热数据的序列上计算请求的技术指标，只返回预热数据之后的部分"""
+    return {"dates": dates[warmup:], **analysis.calculate_indicators(columns, indicators, skip=warmup)}
+
+def _parse_indicators(indicators: str = None) -> List[str]:
+    """解析逗号分隔的指标名称，未知名称抛出 ValueError"""
+    names = [name.strip() for name in indicators.split(",") if name.strip()] if indicators else None
+    return [indicator.name for indicator in analysis.resolve_indicators(names)]
+
+def _cache_params(start_date: str = None, end_date: str = None, indicators: List[str] = None, period: str = "day") -> Dict:
+    """缓存键参数，包含所请求指标的计算参数，修改参数后旧缓存自动失效"""
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "period": period,
+        "indicators": {indicator.name: indicator.params for indicator in analysis.resolve_indicators(indicators)}
+    }
+
+def _technical_indicators(db: Session, stock_code: str, start_date: str = None, end_date: str = None) -> Dict:
+    """同步计算默认技术指标，供导出等同步接口使用"""
+    cache_params = _cache_params(start_date, end_date)
+    data_version = stock.get_trade_data_version(db, stock_code) if indicator_cache else None
+    if indicator_cache:
+        cached = indicator_cache.get(stock_code, cache_params, data_version)
+        if cached is not None:
+            return cached
+
+    selected = analysis.resolve_indicators()
+    columns, dates, warmup = _load_indicator_inputs(
+        db, stock_code, start_date, end_date, analysis.required_inputs(selected), analysis.max_lookback(selected)
+    )
+    results = _calculate_indicators(columns, dates, warmup=warmup)
+    if indicator_cache:
+        indicator_cache.set(stock_code, cache_params, results, data_version)
+    return results
+
 @router.get("/indicators/{stock_code}")
-def get_technical_indicators(
+async def get_technical_indicators(
     stock_code: str,
+    request: Request,
     start_date: str = None,
     end_date: str = None,
-    db: Session = Depends(get_db)
+    indicators: str = Query(None, description="逗号分隔的指标名称，默认为原有的8项指标"),
+    period: str = Query("day", regex="^(day|week|month|quarter)$", description="K线周期"),
+    format: str = Query("json", regex="^(json|columnar)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取技术指标数据"""
+    """获取技术指标数据
+
+    只计算 indicators 中请求的指标，只读取这些指标用到的数据列；period 为 week、month、quarter 时
+    在预先聚合的周期K线上计算。
+    数据库读取通过异步会话完成，指标计算放到 CPU 计算线程池中执行，不阻塞事件循环。
+    响应直接由 orjson 序列化，较大的响应按 Accept-Encoding 压缩；format=columnar 时返回
+    共享日期轴的列式格式，适合图表前端直接解码为类型化数组。
+    """
     try:
-        # 首先检查股票是否存在
-        stock_info = stock.get_stock_basic(db=db, code=stock_code)
-        if not stock_info:
-            raise HTTPException(
-                status_code=404,
-                detail=f"股票 {stock_code} 不存在"
+        names = _parse_indicators(indicators)
+        cache_params = _cache_params(start_date, end_date, names, period)
+        results = data_version = None
+        if indicator_cache:
+            # 缓存键包含数据库中的数据版本，其他进程写入新数据后旧结果不会被命中
+            data_version = await db.run_sync(stock.get_trade_data_version, stock_code)
+            results = await indicator_cache.aget(stock_code, cache_params, data_version)
+
+        if results is None:
+            selected = analysis.resolve_indicators(names)
+            columns, dates, warmup = await db.run_sync(
+                _load_indicator_inputs, stock_code, start_date, end_date,
+                analysis.required_inputs(selected), analysis.max_lookback(selected), period
             )
+            results = await run_cpu_bound(_calculate_indicators, columns, dates, names, warmup)
+            if indicator_cache:
+                await indicator_cache.aset(stock_code, cache_params, results, data_version)
 
-        # 计算日期范围内的天数作为 limit
-        if start_date and end_date:
-            start = datetime.strptime(start_date, '%Y-%m-%d')
-            end = datetime.strptime(end_date, '%Y-%m-%d')
-            days = (end - start).days + 1
-            limit = max(days, 100)
-        else:
-            limit = 100
-
-        # 获取交易数据
-        trades_response = stock.get_stock_trades(
-            db=db,
-            stock_code=stock_code,
-            start_date=start_date,
-            end_date=end_date,
-            limit=limit
-        )
+        if format == "columnar":
+            results = analysis.indicators_to_columnar(results)
+        with profile_section("encode"):
+            return FastJSONResponse(results, accept_encoding=request.headers.get("accept-encoding"))
         
-        if not trades_response or not trades_response["items"]:
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"计算技术指标时发生错误: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="计算技术指标时发生错误，请稍后重试"
+        )
+
+@router.get("/indicators/{stock_code}/latest")
+async def get_latest_indicators(
+    stock_code: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取最新一个交易日的技术指标
+
+    直接读取更新交易数据时增量维护的指标状态，不需要加载历史数据
+    """
+    result = await db.run_sync(indicator_state.get_latest_indicators, stock_code)
+    if not result:
+        raise HTTPException(
+            status_code=404,
+            detail=f"股票 {stock_code} 暂无最新技术指标"
+        )
+    return result
+
+@router.post("/backtest")
+async def run_backtest(
+    request: BacktestRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """对一只股票执行策略回测
+
+    信号在收盘后产生、下一交易日开盘执行，考虑佣金、卖出印花税、滑点、T+1 和涨跌停无法成交的情况。
+    返回净值曲线、逐笔交易和汇总统计。
+    """
+    try:
+        start = datetime.strptime(request.start_date, '%Y-%m-%d').date() if request.start_date else None
+        end = datetime.strptime(request.end_date, '%Y-%m-%d').date() if request.end_date else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        loaded = await db.run_sync(backtest.load_backtest_bars, request.code, start, end)
+        if loaded is None:
             raise HTTPException(
                 status_code=404,
-                detail=f"未找到股票 {stock_code} 在指定时间范围内的交易数据"
+                detail=f"股票 {request.code} 不存在"
             )
-        
-        if len(trades_response["items"]) < 30:  # 至少需要30天数据才能计算技术指标
+        if len(loaded["bars"]) < 2:
             raise HTTPException(
-                status_code=400,
-                detail=f"股票 {stock_code} 在指定时间范围内的交易数据不足30天，无法计算技术指标"
+                status_code=404,
+                detail=f"未找到股票 {request.code} 在指定时间范围内的交易数据"
             )
 
-        # 提取价格、成交量和日期数据，并按日期排序
-        trades = sorted(trades_response["items"], key=lambda x: x.trade_date)
-        prices = [trade.close_price for trade in trades]
-        volumes = [trade.volume for trade in trades]
-        dates = [trade.trade_date.strftime('%Y-%m-%d') for trade in trades]
-        
-        # 计算各项技术指标
-        results = {
-            "dates": dates,
-            "ma5": analysis.calculate_ma(prices, 5),
-            "ma10": analysis.calculate_ma(prices, 10),
-            "ma20": analysis.calculate_ma(prices, 20),
-            "macd": analysis.calculate_macd(prices),
-            "rsi": analysis.calculate_rsi(prices),
-            "bollinger_bands": analysis.calculate_bollinger_bands(prices),
-            "volume_ma": analysis.calculate_volume_ma(volumes),
-            "price_change": analysis.calculate_price_change(prices)
-        }
-        
-        return results
-        
+        config = backtest.BacktestConfig(
+            initial_capital=request.initial_capital,
+            commission=request.commission,
+            stamp_duty=request.stamp_duty,
+            slippage=request.slippage,
+            price_limit=request.price_limit if request.price_limit is not None else loaded["price_limit"]
+        )
+        result = await run_cpu_bound(backtest.run_backtest, loaded["bars"], request.strategy, request.params, config)
+        result["code"] = request.code
+        result["strategy"] = request.strategy
+        result["params"] = request.params
+        return result
+
     except HTTPException:
         raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logger.error(f"计算技术指标时发生错误: {str(e)}", exc_info=True)
+        logger.error(f"回测股票 {request.code} 时发生错误：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
         raise HTTPException(
             status_code=500,
-            detail="计算技术指标时发生错误，请稍后重试"
+            detail="回测时发生错误，请稍后重试"
+        )
+
+@router.post("/backtest/sweep")
+def create_backtest_sweep(
+    request: BacktestSweepRequest,
+    db: Session = Depends(get_db)
+):
+    """提交回测参数扫描任务
+
+    对（股票 × 参数组合）逐一回测，任务由 Celery 的 backtest 队列在后台执行，
+    结果写入排行榜，可通过 GET /analysis/backtest/sweep/{sweep_id} 查询进度和排名。
+    """
+    try:
+        start = _parse_date(request.start_date)
+        end = _parse_date(request.end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    codes = list(dict.fromkeys(request.codes)) if request.codes else None
+    if codes:
+        missing = sorted(set(codes) - set(stock.get_existing_codes(db, codes)))
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"股票不存在：{', '.join(missing)}"
+            )
+
+    try:
+        config = backtest.BacktestConfig(
+            initial_capital=request.initial_capital,
+            commission=request.commission,
+            stamp_duty=request.stamp_duty,
+            slippage=request.slippage,
+            price_limit=request.price_limit
+        )
+        record = sweep.create_sweep(db, request.strategy, request.param_grid, codes, start, end, config)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = tasks.run_backtest_sweep.delay(record.id)
+    return {
+        "sweep_id": record.id,
+        "job_id": result.id,
+        "total_jobs": record.total_jobs,
+        "message": "任务已提交"
+    }
+
+@router.get("/backtest/sweep/{sweep_id}")
+def get_backtest_sweep(
+    sweep_id: int,
+    sort: str = Query("sharpe_ratio", regex=f"^({'|'.join(sweep.LEADERBOARD_METRICS)})$"),
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_read_db)
+):
+    """查询参数扫描进度和排行榜
+
+    扫描进行中也可以查询，排行榜只包含已写入的结果。
+    """
+    result = sweep.get_leaderboard(db, sweep_id, sort=sort, limit=limit)
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"参数扫描任务 {sweep_id} 不存在"
         )
+    return result
+
+def _download_response(chunks, filename: str, format: str, gzip: bool = False) -> StreamingResponse:
+    """构造文件下载响应，gzip 为 True 时对输出流逐块压缩"""
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        chunks = export.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=export.MEDIA_TYPES[format], headers=headers)
+
+def _check_format_supported(format: str) -> None:
+    if format in ("arrow", "parquet") and not export.arrow_available():
+        raise HTTPException(status_code=501, detail="服务器未安装 pyarrow，不支持 Arrow/Parquet 导出")
+
+def _parse_date(value: str):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
 
 @router.get("/export/basics")
 def export_stock_basics(
-    format: str = Query("csv", regex="^(csv|excel)$"),
-    db: Session = Depends(get_db)
+    format: str = Query("csv", regex="^(csv|ndjson|arrow|parquet|excel)$"),
+    gzip: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    """导出股票基础数据"""
+    """导出股票基础数据
+
+    CSV、NDJSON、Arrow 和 Parquet 通过数据库游标逐批读取并流式输出，内存占用与数据量无关；
+    Excel 需要完整生成文件后再返回。
+    """
+    _check_format_supported(format)
     try:
-        stocks = stock.get_stock_basics(db=db)
-        
-        if format == "csv":
-            filename = export.export_stock_basics_to_csv(stocks)
-        else:
-            filename = export.export_stock_basics_to_excel(stocks)
-            
-        return {"filename": filename, "message": "导出成功"}
-        
+        rows = export.iter_stock_basics_rows(db)
+        filename = export.export_filename("stock_basics", format)
+        if format == "excel":
+            return _download_response(iter([export.rows_to_excel(rows, export.STOCK_BASIC_COLUMNS)]), filename, format, gzip)
+        return _download_response(export.encode_rows(rows, export.STOCK_BASIC_COLUMNS, format), filename, format, gzip)
+
     except Exception as e:
+        logger.error(f"导出股票基础数据失败：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/export/trades/{stock_code}")
 def export_stock_trades(
     stock_code: str,
-    format: str = Query("csv", regex="^(csv|excel)$"),
+    format: str = Query("csv", regex="^(csv|ndjson|arrow|parquet|excel)$"),
     start_date: str = None,
     end_date: str = None,
-    db: Session = Depends(get_db)
+    gzip: bool = False,
+    db: Session = Depends(get_read_db)
 ):
-    """导出股票交易数据"""
+    """导出股票交易数据，按交易日期升序"""
+    _check_format_supported(format)
     try:
-        trades = stock.get_stock_trades(
-            db=db,
-            stock_code=stock_code,
-            start_date=start_date,
-            end_date=end_date
+        if not stock.get_stock_basic(db=db, code=stock_code):
+            raise HTTPException(
+                status_code=404,
+                detail=f"股票 {stock_code} 不存在"
+            )
+
+        rows = export.iter_stock_trades_rows(
+            db,
+            stock_code,
+            start_date=_parse_date(start_date),
+            end_date=_parse_date(end_date)
         )
-        
-        if format == "csv":
-            filename = export.export_stock_trades_to_csv(trades)
-        else:
-            filename = export.export_stock_trades_to_excel(trades)
-            
-        return {"filename": filename, "message": "导出成功"}
-        
+        filename = export.export_filename(f"stock_trades_{stock_code}", format)
+        if format == "excel":
+            return _download_response(iter([export.rows_to_excel(rows, export.STOCK_TRADE_COLUMNS)]), filename, format, gzip)
+        return _download_response(export.encode_rows(rows, export.STOCK_TRADE_COLUMNS, format), filename, format, gzip)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        logger.error(f"导出股票交易数据失败：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/export/analysis/{stock_code}")
@@ -138,22 +481,21 @@ def export_analysis_results(
     stock_code: str,
     start_date: str = None,
     end_date: str = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """导出分析结果"""
     try:
         # 获取技术指标数据
-        indicators = get_technical_indicators(
-            stock_code=stock_code,
-            start_date=start_date,
-            end_date=end_date,
-            db=db
-        )
+        indicators = _technical_indicators(db, stock_code, start_date, end_date)
         
         # 导出分析结果
-        filename = export.export_analysis_results(indicators)
-        
-        return {"filename": filename, "message": "导出成功"}
+        content = export.export_analysis_results(indicators)
+        filename = export.export_filename(f"analysis_results_{stock_code}", "excel")
+        return _download_response(iter([content]), filename, "excel")
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        logger.error(f"导出分析结果失败：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,12 @@
 from typing import Dict, Any
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.core.config import settings
+from app.core.profiling import request_metrics
+from app.db.session import get_read_db
 from app.models.stock import StockBasic, StockTrade
+from app.services.cache import indicator_cache
+from app.services.quotes import quote_refresher
 
 router = APIRouter(
     prefix="/debug",
@@ -10,7 +14,7 @@ router = APIRouter(
 )
 
 @router.get("/db-info", response_model=Dict[str, Any])
-def get_db_info(db: Session = Depends(get_db)):
+def get_db_info(db: Session = Depends(get_read_db)):
     """获取数据库信息"""
     # 获取表信息
     tables = [
@@ -54,4 +58,48 @@ def get_db_info(db: Session = Depends(get_db)):
             }
             for trade in stock_trades
         ]
-    } 
\ No newline at end of file
+    } 
+
+@router.get("/cache-stats", response_model=Dict[str, Any])
+def get_cache_stats():
+    """获取技术指标缓存的命中、未命中和淘汰统计"""
+    if not indicator_cache:
+        return {"enabled": False}
+    return {"enabled": True, **indicator_cache.stats()}
+
+@router.get("/quote-stats", response_model=Dict[str, Any])
+def get_quote_stats():
+    """获取实时行情后台刷新的状态、快照版本和订阅者数量"""
+    return quote_refresher.stats()
+
+@router.post("/cache/clear", response_model=Dict[str, Any])
+def clear_cache():
+    """清空进程内的技术指标缓存"""
+    if indicator_cache:
+        indicator_cache.clear()
+    return {"message": "缓存已清空"}
+
+
+@router.get("/metrics", response_model=Dict[str, Any])
+def get_metrics():
+    """获取各路由最近请求的延迟分布、SQL统计，以及采样分析器记录的最慢请求"""
+    if not settings.PROFILING_ENABLED:
+        return {"enabled": False}
+    return {"enabled": True, **request_metrics.snapshot()}
+
+@router.post("/metrics/profiler", response_model=Dict[str, Any])
+def set_profiler(enabled: bool):
+    """开启或关闭采样分析器
+
+    开启后后台线程定时采集调用栈，最慢的请求连同采样到的热点调用栈保留在 /debug/metrics 的 slowest_requests 中。
+    """
+    if not settings.PROFILING_ENABLED:
+        raise HTTPException(status_code=400, detail="请求性能分析未开启")
+    request_metrics.enable_profiler(enabled)
+    return {"profiler_enabled": enabled}
+
+@router.post("/metrics/reset", response_model=Dict[str, Any])
+def reset_metrics():
+    """清空请求统计和最慢请求记录"""
+    request_metrics.reset()
+    return {"message": "统计已清空"}
@@ -0,0 +1,49 @@
+from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Query
+from app import tasks
+from app.services import jobs
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+@router.post("/basics/update", response_model=Dict[str, Any])
+def enqueue_update_stock_basics():
+    """
+    提交股票基础数据更新任务
+    
+    Returns:
+        Dict[str, Any]: 包含任务ID
+    """
+    result = tasks.update_stock_basics.delay()
+    return {"job_id": result.id, "message": "任务已提交"}
+
+@router.post("/trades/refresh", response_model=Dict[str, Any])
+def enqueue_refresh_stock_trades(
+    days: int = Query(30, ge=1, le=365, description="要获取的天数（1-365天）"),
+    incremental: bool = Query(True, description="是否只获取已入库最新交易日期之后的数据"),
+    chunk_size: int = Query(None, ge=1, le=1000, description="每个子任务处理的股票数"),
+):
+    """
+    提交全市场交易数据刷新任务
+    
+    全部股票按 chunk_size 分批并行更新，可通过 GET /jobs/{job_id} 查询进度
+    
+    Returns:
+        Dict[str, Any]: 包含任务ID
+    """
+    result = tasks.refresh_all_stock_trades.delay(days=days, incremental=incremental, chunk_size=chunk_size)
+    return {"job_id": result.id, "message": "任务已提交"}
+
+@router.get("/{job_id}", response_model=Dict[str, Any])
+def get_job_status(job_id: str):
+    """
+    查询后台任务状态
+    
+    全市场刷新任务会返回整体进度、吞吐量以及每个分批任务的状态和失败股票
+    """
+    try:
+        return jobs.get_job_status(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,104 @@
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from app.core.config import settings
+from app.core.responses import FastJSONResponse
+from app.services.quotes import QUOTE_FIELDS, quote_store, stream_quote_events
+
+router = APIRouter(
+    prefix="/quotes",
+    tags=["quotes"],
+)
+
+def _parse_codes(codes: Optional[str]) -> Optional[list]:
+    if codes is None:
+        return None
+    stock_codes = list(dict.fromkeys(code.strip() for code in codes.split(",") if code.strip()))
+    if not stock_codes:
+        raise HTTPException(status_code=400, detail="请至少指定一只股票")
+    if len(stock_codes) > settings.QUOTE_MAX_CODES:
+        raise HTTPException(status_code=400, detail=f"单次最多查询 {settings.QUOTE_MAX_CODES} 只股票")
+    return stock_codes
+
+def _current_snapshot():
+    snapshot = quote_store.snapshot
+    if snapshot is None:
+        raise HTTPException(status_code=503, detail="实时行情尚未加载")
+    return snapshot
+
+@router.get("")
+def get_quotes(
+    codes: str = Query(..., description="股票代码，多个代码用逗号分隔"),
+    fields: str = Query(None, description="返回的行情字段，多个字段用逗号分隔，默认全部"),
+):
+    """
+    批量获取实时行情
+
+    直接读取内存中的最新行情快照，不访问数据库
+
+    Parameters:
+        codes: 股票代码列表，逗号分隔
+        fields: 行情字段列表，逗号分隔，可选值见 QUOTE_FIELDS
+
+    Returns:
+        FastJSONResponse: 快照版本号、更新时间、找到的股票行情 items 和不存在的代码 missing
+    """
+    stock_codes = _parse_codes(codes)
+    selected = None
+    if fields:
+        selected = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in selected if field not in QUOTE_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"未知的行情字段：{', '.join(unknown)}，可选值：{', '.join(QUOTE_FIELDS)}"
+            )
+    return FastJSONResponse(_current_snapshot().quotes(stock_codes, selected))
+
+@router.get("/stream")
+async def stream_quotes(
+    request: Request,
+    codes: str = Query(None, description="订阅的股票代码，多个代码用逗号分隔，默认订阅全部"),
+    last_event_id: Optional[int] = Header(None, description="断线重连时浏览器自动带上的最后一条消息 id"),
+):
+    """
+    订阅实时行情推送（Server-Sent Events）
+
+    连接后先推送订阅股票的完整快照（snapshot 事件），之后每次刷新只推送变化的字段（delta 事件），
+    消息 id 为快照版本号，重连时根据 Last-Event-ID 补发错过的增量
+
+    Parameters:
+        codes: 股票代码列表，逗号分隔
+
+    Returns:
+        StreamingResponse: text/event-stream
+    """
+    stock_codes = _parse_codes(codes)
+    events = stream_quote_events(
+        quote_store,
+        codes=set(stock_codes) if stock_codes is not None else None,
+        last_version=last_event_id,
+        is_disconnected=request.is_disconnected
+    )
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/{stock_code}")
+def get_quote(stock_code: str):
+    """
+    获取单只股票的实时行情
+
+    Parameters:
+        stock_code: 股票代码
+
+    Returns:
+        FastJSONResponse: 股票代码、名称和全部行情字段
+    """
+    snapshot = _current_snapshot()
+    quote = snapshot.quote(stock_code)
+    if quote is None:
+        raise HTTPException(status_code=404, detail=f"未找到股票 {stock_code} 的实时行情")
+    return FastJSONResponse({"version": snapshot.version, "updated_at": snapshot.updated_at, **quote})
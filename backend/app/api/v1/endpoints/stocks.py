@@ -1,9 +1,13 @@
+from datetime import datetime
 from typing import List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import get_db
+from app.core.config import settings
+from app.db.session import PoolTimeoutError, get_db, get_read_db, get_async_db
 from app.schemas.stock import StockBasic, StockTrade, StockBasicList, StockTradeList
-from app.services import stock
+from app.services import stock, export
 
 router = APIRouter(
     tags=["stocks"],
@@ -22,17 +26,22 @@ def update_stock_basics(db: Session = Depends(get_db)):
     """
     try:
         return stock.update_stock_basics(db)
+    except PoolTimeoutError:
+        # 由全局异常处理返回 503
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/basics", response_model=StockBasicList)
-def get_stock_basics(
+async def get_stock_basics(
     skip: int = Query(0, ge=0, description="跳过记录数"),
     limit: int = Query(100, ge=1, le=100, description="返回记录数"),
     industry: str = Query(None, description="行业筛选"),
     market: str = Query(None, description="市场类型筛选"),
     search: str = Query(None, description="搜索股票代码或名称"),
-    db: Session = Depends(get_db)
+    cursor: str = Query(None, description="分页游标，取上一页返回的 next_cursor"),
+    include_total: bool = Query(True, description="是否统计总记录数"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取股票基础数据列表
@@ -45,32 +54,110 @@ def get_stock_basics(
         industry: 行业名称
         market: 市场类型（主板/创业板/科创板/北交所/中小板）
         search: 搜索股票代码或名称
+        cursor: 分页游标，传入时忽略 skip
+        include_total: 是否统计总记录数，为 false 时 total 返回 null
+    
+    Returns:
+        StockBasicList: 包含总数、数据列表、分页信息和下一页游标
+    """
+    try:
+        return await db.run_sync(
+            stock.get_stock_basics,
+            skip=skip,
+            limit=limit,
+            industry=industry,
+            market=market,
+            search=search,
+            cursor=cursor,
+            include_total=include_total
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/search", response_model=List[Dict[str, Any]])
+async def search_stocks(
+    q: str = Query(..., min_length=1, description="股票代码、名称或拼音首字母"),
+    limit: int = Query(10, ge=1, le=50, description="返回记录数"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    股票输入联想
+    
+    按代码完全匹配、代码前缀、名称前缀、拼音首字母前缀、名称包含的顺序返回匹配的股票
+    
+    Parameters:
+        q: 股票代码、名称或拼音首字母
+        limit: 返回记录数（1-50）
     
     Returns:
-        StockBasicList: 包含总数、数据列表和分页信息
+        List[Dict[str, Any]]: 匹配的股票及匹配类型 rank（越小越匹配）
+    """
+    return await db.run_sync(stock.search_stocks, q=q, limit=limit)
+
+@router.get("/trades/bulk")
+def get_bulk_stock_trades(
+    codes: str = Query(..., description="股票代码，多个代码用逗号分隔"),
+    start_date: str = Query(None, description="开始日期（YYYY-MM-DD）"),
+    end_date: str = Query(None, description="结束日期（YYYY-MM-DD）"),
+    format: str = Query("arrow", regex="^(arrow|parquet)$", description="返回格式"),
+    db: Session = Depends(get_read_db)
+):
     """
-    return stock.get_stock_basics(
-        db=db,
-        skip=skip,
-        limit=limit,
-        industry=industry,
-        market=market,
-        search=search
+    批量获取多只股票的交易数据
+    
+    一次列式查询读取全部股票的数据，以 Arrow IPC 流或 Parquet 文件返回，
+    按股票代码和交易日期排序，适合研究时批量拉取多年历史数据
+    
+    Parameters:
+        codes: 股票代码列表，逗号分隔
+        start_date: 开始日期
+        end_date: 结束日期
+        format: arrow 或 parquet
+    
+    Returns:
+        StreamingResponse: 包含 code、trade_date 和 OHLCV 列的数据文件
+    """
+    stock_codes = list(dict.fromkeys(code.strip() for code in codes.split(",") if code.strip()))
+    if not stock_codes:
+        raise HTTPException(status_code=400, detail="请至少指定一只股票")
+    if len(stock_codes) > settings.BULK_EXPORT_MAX_CODES:
+        raise HTTPException(status_code=400, detail=f"单次最多查询 {settings.BULK_EXPORT_MAX_CODES} 只股票")
+    if not export.arrow_available():
+        raise HTTPException(status_code=501, detail="服务器未安装 pyarrow，不支持 Arrow/Parquet 导出")
+
+    try:
+        rows = export.iter_bulk_trades_rows(
+            db,
+            stock_codes,
+            start_date=datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+            end_date=datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    filename = export.export_filename("stock_trades", format)
+    return StreamingResponse(
+        export.encode_rows(rows, export.BULK_TRADE_COLUMNS, format),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 @router.get("/trades/{stock_code}", response_model=StockTradeList)
-def get_stock_trades(
+async def get_stock_trades(
     stock_code: str,
     start_date: str = Query(None, description="开始日期（YYYY-MM-DD）"),
     end_date: str = Query(None, description="结束日期（YYYY-MM-DD）"),
     skip: int = Query(0, ge=0, description="跳过记录数"),
     limit: int = Query(100, ge=1, le=100, description="返回记录数"),
-    db: Session = Depends(get_db)
+    cursor: str = Query(None, description="分页游标，取上一页返回的 next_cursor"),
+    include_total: bool = Query(True, description="是否统计总记录数"),
+    period: str = Query("day", regex="^(day|week|month|quarter)$", description="K线周期"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取股票交易数据
     
-    支持按日期范围筛选和分页
+    支持按日期范围筛选和分页，period 为 week、month、quarter 时返回预先聚合的周期K线
     
     Parameters:
         stock_code: 股票代码
@@ -78,23 +165,32 @@ def get_stock_trades(
         end_date: 结束日期
         skip: 跳过记录数
         limit: 返回记录数（1-100）
+        cursor: 分页游标，传入时忽略 skip
+        include_total: 是否统计总记录数，为 false 时 total 返回 null
+        period: K线周期，day（默认）、week、month 或 quarter
     
     Returns:
-        StockTradeList: 包含总数、数据列表和分页信息
+        StockTradeList: 包含总数、数据列表、分页信息和下一页游标
     """
-    return stock.get_stock_trades(
-        db=db,
-        stock_code=stock_code,
-        start_date=start_date,
-        end_date=end_date,
-        skip=skip,
-        limit=limit
-    )
+    try:
+        return await db.run_sync(
+            stock.get_stock_trades,
+            stock_code=stock_code,
+            start_date=start_date,
+            end_date=end_date,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            include_total=include_total,
+            period=period
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/basics/{code}", response_model=StockBasic)
-def get_stock_basic(
+async def get_stock_basic(
     code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     获取单个股票基础数据
@@ -105,7 +201,7 @@ def get_stock_basic(
     Returns:
         StockBasic: 股票基础数据
     """
-    result = stock.get_stock_basic(db=db, code=code)
+    result = await db.run_sync(stock.get_stock_basic, code=code)
     if not result:
         raise HTTPException(status_code=404, detail=f"股票 {code} 不存在")
     return result
@@ -114,6 +210,7 @@ def get_stock_basic(
 def update_stock_trades(
     stock_code: str = Query(None, description="股票代码（可选，不指定则更新所有股票）"),
     days: int = Query(30, ge=1, le=365, description="要获取的天数（1-365天）"),
+    incremental: bool = Query(False, description="是否只获取已入库最新交易日期之后的数据"),
     db: Session = Depends(get_db)
 ):
     """
@@ -124,11 +221,15 @@ def update_stock_trades(
     Parameters:
         stock_code: 股票代码（可选，不指定则更新所有股票）
         days: 要获取的天数（1-365天）
+        incremental: 是否增量更新，已是最新的股票会被跳过
     
     Returns:
         Dict[str, Any]: 包含更新状态和更新数量的消息
     """
     try:
-        return stock.update_stock_trades(db, stock_code=stock_code, days=days)
+        return stock.update_stock_trades(db, stock_code=stock_code, days=days, incremental=incremental)
+    except PoolTimeoutError:
+        # 由全局异常处理返回 503
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
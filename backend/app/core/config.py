@@ -12,6 +12,54 @@ class Settings(BaseSettings):
     
     # SQLite 配置（用于股票数据）
     SQLITE_DATABASE_PATH: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "stock_data.db")
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL 模式下写入事务不阻塞读取
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # WAL 模式下 NORMAL 只在检查点时同步磁盘，断电最多丢失最近的事务
+    SQLITE_MMAP_SIZE: int = 268435456  # 内存映射读取的字节数，0表示关闭
+    SQLITE_CACHE_SIZE: int = -65536  # 每个连接的页缓存，负数表示 KiB
+    SQLITE_TEMP_STORE: str = "MEMORY"  # 临时表和排序使用内存
+    SQLITE_BUSY_TIMEOUT: int = 30000  # 等待其他进程释放写锁的毫秒数
+    SQLITE_READ_POOL_SIZE: int = 8  # 只读连接池大小
+    SQLITE_WRITER_POOL_TIMEOUT: float = 5.0  # 等待唯一写连接的秒数，超时的请求返回 503，不随长时间的写入任务一起排队
+    
+    # 列式行情存储配置（可选，数据库仍是唯一数据源）
+    COLUMNAR_STORE_ENABLED: bool = False
+    COLUMNAR_STORE_PATH: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "columnar_store")
+    
+    # 技术指标缓存配置
+    INDICATOR_CACHE_ENABLED: bool = True
+    INDICATOR_CACHE_MAX_ENTRIES: int = 1024  # 进程内缓存的最大条目数
+    INDICATOR_CACHE_TTL: int = 3600  # 缓存过期时间（秒）
+    INDICATOR_CACHE_REDIS_URL: Optional[str] = None  # 配置后使用 Redis 作为二级缓存并共享数据版本号
+    
+    # 股票搜索索引配置
+    SEARCH_INDEX_REFRESH_INTERVAL: int = 60  # 检查其他进程是否更新了股票基础数据的间隔（秒）
+    
+    # 批量数据导出配置
+    BULK_EXPORT_MAX_CODES: int = 500  # 单次 Arrow/Parquet 导出的最大股票数
+    BATCH_INDICATOR_MAX_CODES: int = 300  # 单次批量计算技术指标的最大股票数
+    INDICATOR_DEFAULT_BARS: int = 100  # 技术指标接口未指定开始日期时返回的最近交易日数
+    
+    # 响应压缩配置
+    RESPONSE_COMPRESSION_MIN_SIZE: int = 4096  # 技术指标等接口的响应体不小于该字节数时按 Accept-Encoding 压缩
+    RESPONSE_GZIP_LEVEL: int = 1  # 指标数据为数字文本，提高压缩级别收益很小但耗时成倍增加
+    RESPONSE_BROTLI_QUALITY: int = 1
+    
+    # 实时行情快照配置
+    QUOTE_REFRESH_ENABLED: bool = False  # 启动时开启实时行情后台刷新
+    QUOTE_REFRESH_INTERVAL: float = 3.0  # 刷新间隔（秒）
+    QUOTE_REPLAY_PATH: Optional[str] = None  # 配置后从该目录下录制的快照文件回放行情，不访问 akshare
+    QUOTE_DELTA_HISTORY: int = 200  # 保留最近多少次刷新的增量，订阅者断线重连时据此补发
+    QUOTE_STREAM_HEARTBEAT: float = 15.0  # 推送连接空闲多少秒后发送心跳
+    QUOTE_MAX_CODES: int = 1000  # 单次查询实时行情的最大股票数
+
+    # 异步接口配置
+    CPU_EXECUTOR_WORKERS: int = 4  # 技术指标计算线程数
+    
+    # 回测参数扫描配置
+    BACKTEST_SWEEP_WORKERS: Optional[int] = None  # 参数扫描进程数，默认为CPU核数
+    BACKTEST_SWEEP_MAX_JOBS: int = 1000000  # 单次扫描的最大回测数（股票数 × 参数组合数）
+    BACKTEST_SWEEP_TASK_SIZE: int = 32  # 每个进程池任务包含的参数组合数
+    BACKTEST_SWEEP_COMMIT_SIZE: int = 1000  # 每写入多少条结果提交一次并更新进度
     
     # PostgreSQL 配置（用于 Celery）
     POSTGRES_SERVER: str = "postgres"
@@ -27,14 +75,30 @@ class Settings(BaseSettings):
     # Celery 配置
     CELERY_BROKER_URL: str = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
     CELERY_RESULT_BACKEND: str = f"redis://{REDIS_HOST}:{REDIS_PORT}/0"
+    CELERY_TASK_ALWAYS_EAGER: bool = False  # 测试时在当前进程内同步执行任务
+    TRADE_REFRESH_CHUNK_SIZE: int = 200  # 全市场交易数据刷新时每个子任务处理的股票数
     
     # JWT配置
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # 行情采集配置
+    TRADE_FETCH_WORKERS: int = 8  # 并发采集线程数
+    TRADE_FETCH_RATE_LIMIT: float = 5.0  # 每秒最多请求次数，0表示不限流
+    TRADE_WRITE_QUEUE_SIZE: int = 64  # 待写入队列长度
+    TRADE_WRITE_COMMIT_SIZE: int = 20  # 每写入多少只股票提交一次
+    TRADE_WRITE_COMMIT_INTERVAL: float = 2.0  # 本批第一次写入后最多多少秒提交一次，远小于 SQLITE_BUSY_TIMEOUT
+    
     # 日志配置
     LOG_LEVEL: str = "INFO"
+    
+    # 请求性能分析配置
+    PROFILING_ENABLED: bool = True  # 统计每个请求的耗时和SQL语句，添加 Server-Timing 响应头
+    PROFILING_WINDOW_SIZE: int = 1000  # 每个路由保留最近多少个请求用于计算延迟分布
+    PROFILING_SAMPLER_ENABLED: bool = False  # 启动时开启采样分析器，也可通过 /debug/metrics/profiler 开关
+    PROFILING_SAMPLER_INTERVAL: float = 0.005  # 采样间隔（秒）
+    PROFILING_SLOW_REQUESTS: int = 20  # 保留调用栈采样结果的最慢请求数
 
     @property
     def POSTGRES_DATABASE_URL(self) -> str:
@@ -0,0 +1,24 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
+from app.core.config import settings
+from app.core.profiling import profile_section
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 技术指标等 CPU 密集计算使用的线程池，与 FastAPI 处理同步接口的默认线程池分开，
+# 线程数固定，避免大量并发计算请求占满事件循环或无限制地创建线程
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_EXECUTOR_WORKERS,
+    thread_name_prefix="cpu-bound"
+)
+
+async def run_cpu_bound(func: Callable[..., T], *args, **kwargs) -> T:
+    """在 CPU 计算线程池中执行函数并等待结果，耗时记入 Server-Timing 的 cpu 分段"""
+    loop = asyncio.get_running_loop()
+    with profile_section("cpu"):
+        return await loop.run_in_executor(cpu_executor, partial(func, *args, **kwargs))
@@ -0,0 +1,311 @@
+import bisect
+import heapq
+import itertools
+import logging
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 延迟分布的分桶上界（毫秒），最后一个桶为无穷大
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+@dataclass
+class RequestProfile:
+    """单个请求的耗时统计
+
+    通过 ContextVar 传递，FastAPI 在线程池中执行同步接口时会复制上下文，
+    async 接口通过 run_sync 执行的查询也在同一上下文中，因此 SQL 事件可以记到所属的请求上。
+    """
+    started: float = field(default_factory=time.perf_counter)
+    sql_count: int = 0
+    sql_time: float = 0.0
+    sections: Dict[str, float] = field(default_factory=dict)
+
+    def add_section(self, name: str, seconds: float) -> None:
+        self.sections[name] = self.sections.get(name, 0.0) + seconds
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current_profile.get()
+
+@contextmanager
+def profile_section(name: str):
+    """把代码块的耗时记入当前请求的 Server-Timing，不在请求中时不做任何事"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_section(name, time.perf_counter() - started)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    starts = conn.info.get("query_start_time")
+    if profile is None or not starts:
+        return
+    profile.sql_count += 1
+    profile.sql_time += time.perf_counter() - starts.pop()
+
+class RouteStats:
+    """单个路由最近 window 个请求的耗时"""
+
+    def __init__(self, window: int):
+        self.count = 0
+        self.errors = 0
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.sql_counts: Deque[int] = deque(maxlen=window)
+        self.sql_times: Deque[float] = deque(maxlen=window)
+
+    def record(self, duration_ms: float, sql_count: int, sql_ms: float, status: int) -> None:
+        self.count += 1
+        if status >= 500:
+            self.errors += 1
+        self.latencies.append(duration_ms)
+        self.sql_counts.append(sql_count)
+        self.sql_times.append(sql_ms)
+
+    def summary(self) -> Dict:
+        latencies = np.array(self.latencies)
+        counts = np.bincount(
+            [bisect.bisect_left(LATENCY_BUCKETS_MS, value) for value in self.latencies],
+            minlength=len(LATENCY_BUCKETS_MS) + 1
+        )
+        p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) if len(latencies) else (None, None, None)
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "window": len(latencies),
+            "mean_ms": round(float(latencies.mean()), 3) if len(latencies) else None,
+            "p50_ms": round(float(p50), 3) if p50 is not None else None,
+            "p90_ms": round(float(p90), 3) if p90 is not None else None,
+            "p99_ms": round(float(p99), 3) if p99 is not None else None,
+            "max_ms": round(float(latencies.max()), 3) if len(latencies) else None,
+            "mean_sql_count": round(float(np.mean(self.sql_counts)), 2) if self.sql_counts else None,
+            "mean_sql_ms": round(float(np.mean(self.sql_times)), 3) if self.sql_times else None,
+            "histogram": [
+                {"le_ms": bound, "count": int(count)}
+                for bound, count in zip(LATENCY_BUCKETS_MS + ["+Inf"], counts)
+            ]
+        }
+
+class SamplingProfiler:
+    """采样分析器
+
+    后台线程每隔 interval 秒采集一次所有线程的调用栈，跳过空闲等待的线程，
+    把样本计入采集时所有进行中的请求。并发请求较多时样本会同时计入多个请求，
+    适合在低并发下定位慢请求的热点。
+    """
+
+    # 最内层栈帧位于这些文件时视为空闲线程
+    IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "socket.py")
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._active: Dict[int, Counter] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self._thread = None
+        with self._lock:
+            self._active.clear()
+
+    def begin(self, request_id: int) -> None:
+        with self._lock:
+            self._active[request_id] = Counter()
+
+    def end(self, request_id: int) -> Counter:
+        with self._lock:
+            return self._active.pop(request_id, Counter())
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                if not self._active:
+                    continue
+            stacks = [
+                self._fold(frame)
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own and not frame.f_code.co_filename.endswith(self.IDLE_FILES)
+            ]
+            with self._lock:
+                for samples in self._active.values():
+                    samples.update(stacks)
+
+    @staticmethod
+    def _fold(frame) -> str:
+        """把调用栈折叠为 "外层;...;内层" 的字符串，可直接用于生成火焰图"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+class RequestMetrics:
+    """按路由汇总请求耗时，并保留最慢请求的采样结果"""
+
+    def __init__(self, window: int, slow_requests: int, sampler_interval: float):
+        self.window = window
+        self.slow_requests = slow_requests
+        self.routes: Dict[str, RouteStats] = {}
+        self.profiler: Optional[SamplingProfiler] = None
+        self.sampler_interval = sampler_interval
+        self._slowest: List = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def enable_profiler(self, enabled: bool) -> None:
+        """开启或关闭采样分析器"""
+        with self._lock:
+            if enabled and self.profiler is None:
+                self.profiler = SamplingProfiler(self.sampler_interval)
+                self.profiler.start()
+            elif not enabled and self.profiler is not None:
+                self.profiler.stop()
+                self.profiler = None
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def record(self, route: str, duration_ms: float, profile: RequestProfile, status: int, samples: Optional[Counter] = None) -> None:
+        sql_ms = profile.sql_time * 1000
+        with self._lock:
+            stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteStats(self.window)
+            stats.record(duration_ms, profile.sql_count, sql_ms, status)
+
+            if samples is None:
+                return
+            # 小顶堆只保留最慢的 slow_requests 个请求
+            if len(self._slowest) >= self.slow_requests and duration_ms <= self._slowest[0][0]:
+                return
+            entry = (duration_ms, next(self._ids), {
+                "route": route,
+                "status": status,
+                "duration_ms": round(duration_ms, 3),
+                "sql_count": profile.sql_count,
+                "sql_ms": round(sql_ms, 3),
+                "sections_ms": {name: round(seconds * 1000, 3) for name, seconds in profile.sections.items()},
+                "time": datetime.now().isoformat(timespec="seconds"),
+                "samples": sum(samples.values()),
+                "stacks": [{"stack": stack, "count": count} for stack, count in samples.most_common(20)]
+            })
+            if len(self._slowest) >= self.slow_requests:
+                heapq.heapreplace(self._slowest, entry)
+            else:
+                heapq.heappush(self._slowest, entry)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            routes = {route: stats.summary() for route, stats in sorted(self.routes.items())}
+            slowest = [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+        return {
+            "buckets_ms": LATENCY_BUCKETS_MS,
+            "profiler_enabled": self.profiler is not None,
+            "routes": routes,
+            "slowest_requests": slowest
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.routes.clear()
+            self._slowest.clear()
+
+request_metrics = RequestMetrics(
+    window=settings.PROFILING_WINDOW_SIZE,
+    slow_requests=settings.PROFILING_SLOW_REQUESTS,
+    sampler_interval=settings.PROFILING_SAMPLER_INTERVAL
+)
+
+def server_timing(duration: float, profile: RequestProfile) -> str:
+    """构造 Server-Timing 响应头"""
+    parts = [
+        f"app;dur={duration * 1000:.3f}",
+        f'sql;dur={profile.sql_time * 1000:.3f};desc="{profile.sql_count} queries"'
+    ]
+    parts.extend(f"{name};dur={seconds * 1000:.3f}" for name, seconds in profile.sections.items())
+    return ", ".join(parts)
+
+class ProfilingMiddleware:
+    """记录每个请求的耗时和 SQL 统计
+
+    在响应头中添加 Server-Timing（app 为到返回响应头为止的总耗时，sql 为 SQL 执行耗时和语句数，
+    其余为 profile_section 记录的分段），并在请求结束后按路由模板计入 request_metrics。
+    流式响应在返回响应头之后继续执行的查询只计入 request_metrics。
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        profiler = self.metrics.profiler
+        request_id = self.metrics.next_id()
+        if profiler:
+            profiler.begin(request_id)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(time.perf_counter() - profile.started, profile).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration_ms = (time.perf_counter() - profile.started) * 1000
+            samples = profiler.end(request_id) if profiler else None
+            route = scope.get("route")
+            route_name = f"{scope['method']} {route.path}" if route is not None else f"{scope['method']} (unmatched)"
+            self.metrics.record(route_name, duration_ms, profile, status, samples)
+            _current_profile.reset(token)
@@ -0,0 +1,62 @@
+import gzip
+import logging
+from typing import Any, Mapping, Optional
+from fastapi.responses import ORJSONResponse
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只使用 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """根据 Accept-Encoding 选择压缩方式，优先 br，其次 gzip，q=0 表示不接受"""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson 序列化的 JSON 响应
+
+    orjson 直接序列化 numpy 数组、日期和 NaN（输出为 null），接口直接返回本类实例时
+    不再经过 jsonable_encoder。传入 accept_encoding 且响应体不小于 RESPONSE_COMPRESSION_MIN_SIZE 时，
+    按客户端支持的编码压缩响应体。
+    """
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        accept_encoding: Optional[str] = None,
+        **kwargs
+    ):
+        super().__init__(content, status_code=status_code, headers=headers, **kwargs)
+        self.headers["vary"] = "Accept-Encoding"
+        encoding = choose_encoding(accept_encoding)
+        if encoding and len(self.body) >= settings.RESPONSE_COMPRESSION_MIN_SIZE:
+            self.body = compress_body(self.body, encoding)
+            self.headers["content-encoding"] = encoding
+            self.headers["content-length"] = str(len(self.body))
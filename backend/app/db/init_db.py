@@ -1,7 +1,7 @@
 from sqlalchemy.orm import Session
 from app.models.base import Base
 from app.db.session import engine
-from app.db.migrations import migrate_add_update_time
+from app.db.migrations import migrate_add_update_time, migrate_add_trade_unique_index, migrate_add_trade_updated_at_index
 
 def init_db() -> None:
     """初始化数据库"""
@@ -12,6 +12,8 @@ def init_db() -> None:
         
         # 执行数据库迁移
         migrate_add_update_time()
+        migrate_add_trade_unique_index()
+        migrate_add_trade_updated_at_index()
         print("数据库迁移执行成功")
         
     except Exception as e:
@@ -34,4 +34,72 @@ def migrate_add_update_time():
                 
     except Exception as e:
         print(f"添加update_time字段失败：{str(e)}")
-        raise e 
\ No newline at end of file
+        raise e 
+
+def migrate_add_trade_unique_index():
+    """为stock_trades表添加(stock_id, trade_date)唯一索引，并清理重复数据"""
+    try:
+        with sqlite_engine.connect() as connection:
+            # 检查表是否存在
+            result = connection.execute(text("""
+                SELECT name FROM sqlite_master 
+                WHERE type='table' AND name='stock_trades'
+            """))
+            
+            if not result.fetchone():
+                print("stock_trades表不存在，跳过迁移")
+                return
+                
+            # 检查索引是否存在
+            result = connection.execute(text("""
+                SELECT name FROM sqlite_master 
+                WHERE type='index' AND name='uq_stock_trades_stock_id_trade_date'
+            """))
+            
+            if result.fetchone():
+                print("stock_trades唯一索引已存在")
+                return
+            
+            # 同一股票同一交易日只保留最新写入的一条记录
+            result = connection.execute(text("""
+                DELETE FROM stock_trades 
+                WHERE id NOT IN (
+                    SELECT MAX(id) FROM stock_trades 
+                    GROUP BY stock_id, trade_date
+                )
+            """))
+            print(f"清理重复交易数据{result.rowcount}条")
+            
+            connection.execute(text("""
+                CREATE UNIQUE INDEX uq_stock_trades_stock_id_trade_date 
+                ON stock_trades (stock_id, trade_date)
+            """))
+            connection.commit()
+            print("成功添加stock_trades唯一索引")
+                
+    except Exception as e:
+        print(f"添加stock_trades唯一索引失败：{str(e)}")
+        raise e
+
+def migrate_add_trade_updated_at_index():
+    """为stock_trades表添加(stock_id, updated_at)索引"""
+    try:
+        with sqlite_engine.connect() as connection:
+            result = connection.execute(text("""
+                SELECT name FROM sqlite_master 
+                WHERE type='table' AND name='stock_trades'
+            """))
+            
+            if not result.fetchone():
+                print("stock_trades表不存在，跳过迁移")
+                return
+            
+            connection.execute(text("""
+                CREATE INDEX IF NOT EXISTS ix_stock_trades_stock_id_updated_at 
+                ON stock_trades (stock_id, updated_at)
+            """))
+            connection.commit()
+                
+    except Exception as e:
+        print(f"添加stock_trades更新时间索引失败：{str(e)}")
+        raise e
@@ -1,16 +1,91 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.profiling import profile_section
 import os
 
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """按配置生成每个新连接需要执行的 PRAGMA 语句"""
+    pragmas = [
+        f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}",
+        f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}",
+        f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        # journal_mode 保存在数据库文件中，由写连接设置即可
+        pragmas.append(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        pragmas.append(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    return pragmas
+
+def apply_sqlite_pragmas(engine, read_only: bool = False):
+    """在引擎每次建立新连接时执行 PRAGMA"""
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    return engine
+
+def enable_sqlite_savepoints(engine):
+    """由 SQLAlchemy 发出 BEGIN，使 SAVEPOINT（Session.begin_nested）按预期工作
+
+    pysqlite 默认在第一条写语句前才隐式开始事务，事务由 SAVEPOINT 开启时，释放该保存点会直接提交。
+    这里关闭驱动自己的事务处理，改为在每个事务开始时显式执行 BEGIN。
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _emit_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
+
+def create_sqlite_engine(database_path: str, read_only: bool = False):
+    """创建 SQLite 引擎
+
+    写引擎只有一个连接，所有写入在进程内排队执行，避免多个写事务互相等待锁；
+    等待超过 SQLITE_WRITER_POOL_TIMEOUT 时抛出 PoolTimeoutError，接口返回 503。
+    只读引擎使用连接池并开启 query_only。WAL 模式下读取不会被进行中的写事务阻塞。
+    """
+    if read_only:
+        pool_options = {"pool_size": settings.SQLITE_READ_POOL_SIZE, "max_overflow": settings.SQLITE_READ_POOL_SIZE}
+    else:
+        pool_options = {"pool_size": 1, "max_overflow": 0, "pool_timeout": settings.SQLITE_WRITER_POOL_TIMEOUT}
+    engine = create_engine(
+        f"sqlite:///{database_path}",
+        connect_args={"check_same_thread": False},
+        poolclass=QueuePool,
+        **pool_options
+    )
+    enable_sqlite_savepoints(engine)
+    return apply_sqlite_pragmas(engine, read_only)
+
+# 等待数据库连接超时（如写连接被长时间的写入任务占用）时返回给客户端的提示
+DATABASE_BUSY_DETAIL = "数据库正在执行其他写入任务，请稍后重试"
+
 # SQLite 数据库连接（用于股票数据）
 SQLITE_DATABASE_URL = f"sqlite:///{settings.SQLITE_DATABASE_PATH}"
-sqlite_engine = create_engine(
-    SQLITE_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+sqlite_engine = create_sqlite_engine(settings.SQLITE_DATABASE_PATH)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
 
+# SQLite 只读连接（用于同步只读接口，如导出）
+sqlite_read_engine = create_sqlite_engine(settings.SQLITE_DATABASE_PATH, read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sqlite_read_engine)
+
 # PostgreSQL 数据库连接（用于 Celery）
 if settings.POSTGRES_DATABASE_URL:
     postgres_engine = create_engine(settings.POSTGRES_DATABASE_URL, pool_pre_ping=True)
@@ -22,6 +97,38 @@ else:
 # 为了保持兼容性，默认使用 SQLite 连接
 engine = sqlite_engine
 
+class ProfiledAsyncSession(AsyncSession):
+    """run_sync 的耗时记入 Server-Timing 的 db 分段
+
+    db 分段包含查询、ORM 对象构造和服务层中的 DataFrame 处理，与 sql 分段的差值即为查询以外的开销。
+    """
+
+    async def run_sync(self, fn, *args, **kwargs):
+        with profile_section("db"):
+            return await super().run_sync(fn, *args, **kwargs)
+
+# 异步 SQLite 连接（用于 async 只读接口）
+async_sqlite_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{settings.SQLITE_DATABASE_PATH}",
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.SQLITE_READ_POOL_SIZE,
+    max_overflow=settings.SQLITE_READ_POOL_SIZE
+)
+apply_sqlite_pragmas(async_sqlite_engine.sync_engine, read_only=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_sqlite_engine, class_=ProfiledAsyncSession, expire_on_commit=False)
+
+# 异步 PostgreSQL 连接，未安装 asyncpg 时不可用
+try:
+    async_postgres_engine = create_async_engine(
+        settings.POSTGRES_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1),
+        pool_pre_ping=True
+    ) if settings.POSTGRES_DATABASE_URL else None
+except ImportError:
+    async_postgres_engine = None
+AsyncPostgresSessionLocal = async_sessionmaker(
+    bind=async_postgres_engine, class_=ProfiledAsyncSession, expire_on_commit=False
+) if async_postgres_engine else None
+
 def get_db():
     db = SessionLocal()
     try:
@@ -29,6 +136,14 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """只读数据库会话"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
 def get_postgres_db():
     if not PostgresSessionLocal:
         raise Exception("PostgreSQL connection not configured")
@@ -36,4 +151,19 @@ def get_postgres_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
+
+async def get_async_db():
+    """异步数据库会话
+
+    服务层函数仍是同步实现，接口中通过 AsyncSession.run_sync 调用，
+    数据库 I/O 由异步驱动完成，不占用线程池。
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_postgres_db():
+    if not AsyncPostgresSessionLocal:
+        raise Exception("Async PostgreSQL connection not configured")
+    async with AsyncPostgresSessionLocal() as db:
+        yield db
@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+import math
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, request_metrics
 from app.api.v1.endpoints import stocks, analysis
 from app.db.init_db import init_db
+from app.db.session import DATABASE_BUSY_DETAIL, PoolTimeoutError, async_postgres_engine, async_sqlite_engine
 from app.api.v1.api import api_router
+from app.services.quotes import quote_refresher
 
 # 初始化数据库
 init_db()
@@ -27,6 +33,12 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+# 请求耗时和SQL统计，最后添加的中间件位于最外层，耗时包含其他中间件
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    if settings.PROFILING_SAMPLER_ENABLED:
+        request_metrics.enable_profiler(True)
+
 # 注册路由
 app.include_router(
     stocks.router,
@@ -42,6 +54,32 @@ app.include_router(
 )
 app.include_router(api_router, prefix="/api/v1")
 
+@app.exception_handler(PoolTimeoutError)
+async def database_busy_handler(request: Request, exc: PoolTimeoutError):
+    """等待数据库连接超时时返回 503，客户端可按 Retry-After 重试"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": DATABASE_BUSY_DETAIL},
+        headers={"Retry-After": str(math.ceil(settings.SQLITE_WRITER_POOL_TIMEOUT))}
+    )
+
+@app.on_event("startup")
+def start_quote_refresher():
+    """开启实时行情后台刷新"""
+    if settings.QUOTE_REFRESH_ENABLED:
+        quote_refresher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """停止实时行情后台刷新，并关闭异步引擎连接池中的连接
+
+    aiosqlite 的每个连接都有一个非守护线程，不关闭时进程在关闭流程结束后也无法退出。
+    """
+    await run_in_threadpool(quote_refresher.stop, timeout=5)
+    await async_sqlite_engine.dispose()
+    if async_postgres_engine is not None:
+        await async_postgres_engine.dispose()
+
 @app.get("/", tags=["root"])
 def read_root():
     """
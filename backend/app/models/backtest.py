@@ -0,0 +1,46 @@
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, Text
+from sqlalchemy.orm import relationship
+from app.models.base import BaseModel
+
+class BacktestSweep(BaseModel):
+    __tablename__ = "backtest_sweeps"
+
+    strategy = Column(String(20), nullable=False, comment="策略名称")
+    param_grid = Column(Text, nullable=False, comment="参数网格（JSON）")
+    codes = Column(Text, comment="股票代码列表（JSON），为空表示全部股票")
+    config = Column(Text, nullable=False, comment="费率、初始资金等回测参数（JSON）")
+    start_date = Column(String(10), comment="开始日期")
+    end_date = Column(String(10), comment="结束日期")
+    status = Column(String(20), nullable=False, default="PENDING", comment="状态：PENDING/RUNNING/SUCCESS/FAILURE")
+    total_jobs = Column(Integer, nullable=False, default=0, comment="股票数 × 参数组合数")
+    completed_jobs = Column(Integer, nullable=False, default=0, comment="已完成的回测数")
+    failed_jobs = Column(Integer, nullable=False, default=0, comment="失败的回测数")
+    error = Column(Text, comment="失败原因")
+    started_at = Column(DateTime, comment="开始时间")
+    finished_at = Column(DateTime, comment="结束时间")
+
+    # 关联关系
+    results = relationship("BacktestResult", back_populates="sweep", cascade="all, delete-orphan")
+
+class BacktestResult(BaseModel):
+    __tablename__ = "backtest_results"
+    __table_args__ = (
+        Index("ix_backtest_results_sweep_id_sharpe_ratio", "sweep_id", "sharpe_ratio"),
+    )
+
+    sweep_id = Column(Integer, ForeignKey("backtest_sweeps.id"), nullable=False)
+    stock_id = Column(Integer, ForeignKey("stock_basics.id"), nullable=False)
+    code = Column(String(10), nullable=False, comment="股票代码")
+    params = Column(Text, nullable=False, comment="策略参数（JSON）")
+    days = Column(Integer, comment="回测交易日数")
+    total_return = Column(Float, comment="总收益率")
+    annualized_return = Column(Float, comment="年化收益率")
+    max_drawdown = Column(Float, comment="最大回撤")
+    sharpe_ratio = Column(Float, comment="夏普比率")
+    trade_count = Column(Integer, comment="交易次数")
+    win_rate = Column(Float, comment="胜率")
+    exposure = Column(Float, comment="持仓时间占比")
+    benchmark_return = Column(Float, comment="同期买入持有收益率")
+
+    # 关联关系
+    sweep = relationship("BacktestSweep", back_populates="results")
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer, Text
+from sqlalchemy.orm import relationship
+from app.models.base import BaseModel
+
+class StockIndicatorState(BaseModel):
+    __tablename__ = "stock_indicator_states"
+    
+    stock_id = Column(Integer, ForeignKey("stock_basics.id"), unique=True, index=True, nullable=False)
+    trade_date = Column(Date, nullable=False, comment="状态对应的最新交易日期")
+    bar_count = Column(Integer, nullable=False, comment="已累计的交易日数")
+    state = Column(Text, nullable=False, comment="增量计算状态（JSON）")
+    close_price = Column(Float, comment="最新收盘价")
+    ma5 = Column(Float, comment="5日均线")
+    ma10 = Column(Float, comment="10日均线")
+    ma20 = Column(Float, comment="20日均线")
+    macd_line = Column(Float, comment="MACD线")
+    signal_line = Column(Float, comment="信号线")
+    macd_hist = Column(Float, comment="MACD柱")
+    rsi = Column(Float, comment="RSI")
+    bb_middle = Column(Float, comment="布林带中轨")
+    bb_upper = Column(Float, comment="布林带上轨")
+    bb_lower = Column(Float, comment="布林带下轨")
+    volume_ma = Column(Float, comment="成交量5日均线")
+    
+    # 关联关系
+    stock = relationship("StockBasic")
@@ -0,0 +1,30 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Index, Integer, String
+from sqlalchemy.orm import relationship
+from app.models.base import BaseModel
+
+class StockTradeRollup(BaseModel):
+    """周、月、季度K线
+
+    由日线聚合得到：开盘价取周期内第一个交易日，收盘价取最后一个交易日，最高、最低价取极值，
+    成交量和成交额求和。更新日线时只重算受影响的周期。
+    """
+    __tablename__ = "stock_trade_rollups"
+    __table_args__ = (
+        Index("uq_stock_trade_rollups_stock_id_period_start", "stock_id", "period", "period_start", unique=True),
+        Index("ix_stock_trade_rollups_stock_id_trade_date", "stock_id", "period", "trade_date"),
+    )
+
+    stock_id = Column(Integer, ForeignKey("stock_basics.id"), nullable=False)
+    period = Column(String(10), nullable=False, comment="周期：week/month/quarter")
+    period_start = Column(Date, nullable=False, comment="周期起始日期（周一、月初或季初）")
+    trade_date = Column(Date, nullable=False, comment="周期内最后一个交易日")
+    open_price = Column(Float, comment="开盘价")
+    high_price = Column(Float, comment="最高价")
+    low_price = Column(Float, comment="最低价")
+    close_price = Column(Float, comment="收盘价")
+    volume = Column(Integer, comment="成交量")
+    amount = Column(Float, comment="成交额")
+    bar_count = Column(Integer, nullable=False, comment="周期内的交易日数")
+
+    # 关联关系
+    stock = relationship("StockBasic")
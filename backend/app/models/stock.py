@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Date, Float, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, String, Date, Float, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from app.models.base import BaseModel
 
@@ -17,6 +17,11 @@ class StockBasic(BaseModel):
 
 class StockTrade(BaseModel):
     __tablename__ = "stock_trades"
+    __table_args__ = (
+        Index("uq_stock_trades_stock_id_trade_date", "stock_id", "trade_date", unique=True),
+        # 用于查询一只股票数据的最后更新时间（指标缓存的数据版本）
+        Index("ix_stock_trades_stock_id_updated_at", "stock_id", "updated_at"),
+    )
     
     stock_id = Column(Integer, ForeignKey("stock_basics.id"), nullable=False)
     trade_date = Column(Date, nullable=False, comment="交易日期")
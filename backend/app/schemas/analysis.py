@@ -1 +1,46 @@
- 
\ No newline at end of file
+from typing import Dict, List, Optional, Union
+from pydantic import BaseModel, Field
+
+class IndicatorBatchRequest(BaseModel):
+    """
+    批量技术指标请求模型
+    """
+    codes: List[str] = Field(..., min_length=1, description="股票代码列表")
+    start_date: Optional[str] = Field(None, description="开始日期（YYYY-MM-DD）")
+    end_date: Optional[str] = Field(None, description="结束日期（YYYY-MM-DD）")
+    indicators: Optional[List[str]] = Field(None, description="需要计算的指标，可选值与单只股票接口相同，默认为 analysis.DEFAULT_INDICATORS")
+
+class IndicatorBatchResponse(BaseModel):
+    """
+    批量技术指标响应模型
+    """
+    results: Dict[str, Dict]
+    errors: Dict[str, str]
+
+class BacktestOptions(BaseModel):
+    """
+    回测日期范围、资金和费率
+    """
+    start_date: Optional[str] = Field(None, description="开始日期（YYYY-MM-DD）")
+    end_date: Optional[str] = Field(None, description="结束日期（YYYY-MM-DD）")
+    initial_capital: float = Field(100000.0, gt=0, description="初始资金")
+    commission: float = Field(0.0003, ge=0, description="佣金费率")
+    stamp_duty: float = Field(0.0005, ge=0, description="印花税率，仅卖出时收取")
+    slippage: float = Field(0.0, ge=0, description="滑点比例")
+    price_limit: Optional[float] = Field(None, gt=0, description="涨跌幅限制，默认按市场和是否ST确定")
+
+class BacktestRequest(BacktestOptions):
+    """
+    回测请求模型
+    """
+    code: str = Field(..., description="股票代码")
+    strategy: str = Field(..., description="策略名称（ma_cross/rsi/bollinger）")
+    params: Dict[str, Union[int, float]] = Field(default_factory=dict, description="策略参数，如 {\"fast\": 5, \"slow\": 20}")
+
+class BacktestSweepRequest(BacktestOptions):
+    """
+    回测参数扫描请求模型
+    """
+    strategy: str = Field(..., description="策略名称（ma_cross/rsi/bollinger）")
+    param_grid: Dict[str, List[Union[int, float]]] = Field(..., description="各参数的候选值，如 {\"fast\": [5, 10], \"slow\": [20, 30]}")
+    codes: Optional[List[str]] = Field(None, min_length=1, description="股票代码列表，默认全部股票")
@@ -1,6 +1,6 @@
 from datetime import date, datetime
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Annotated, Optional, List, Union
 
 class StockBasicBase(BaseModel):
     code: str
@@ -65,20 +65,33 @@ class StockTrade(BaseModel):
     class Config:
         orm_mode = True
 
+class StockTradeRollup(StockTrade):
+    """
+    周期K线模型
+    
+    由日线聚合得到，trade_date 为周期内最后一个交易日
+    """
+    period: str
+    period_start: date
+    bar_count: int
+
 class StockBasicList(BaseModel):
     """
     股票基础信息列表响应模型
     """
-    total: int
+    total: Optional[int] = None
     items: List[StockBasic]
     skip: int
     limit: int
+    next_cursor: Optional[str] = None
 
 class StockTradeList(BaseModel):
     """
     股票交易数据列表响应模型
     """
-    total: int
-    items: List[StockTrade]
+    total: Optional[int] = None
+    # 周期K线包含 period 等额外字段，按顺序先尝试 StockTradeRollup
+    items: List[Annotated[Union[StockTradeRollup, StockTrade], Field(union_mode="left_to_right")]]
     skip: int
-    limit: int 
\ No newline at end of file
+    limit: int
+    next_cursor: Optional[str] = None 
\ No newline at end of file
@@ -1,16 +1,28 @@
+import base64
 import pandas as pd
 import numpy as np
-from typing import List, Dict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 def handle_nan(value):
     """处理NaN值，将其转换为None"""
     return None if pd.isna(value) else float(value)
 
+def nan_to_none(values) -> List[Optional[float]]:
+    """把数值序列转换为 float 列表，NaN 和无穷大转换为 None
+
+    先转换为 object 数组再按掩码整体赋值，避免对每个元素调用 handle_nan。
+    """
+    array = np.asarray(values, dtype="float64")
+    result = array.astype(object)
+    result[~np.isfinite(array)] = None
+    return result.tolist()
+
 def calculate_ma(prices: List[float], period: int) -> List[float]:
     """计算移动平均线"""
-    ma_values = pd.Series(prices).rolling(window=period).mean().tolist()
-    return [handle_nan(x) for x in ma_values]
+    ma_values = pd.Series(prices).rolling(window=period).mean()
+    return nan_to_none(ma_values)
 
 def calculate_macd(prices: List[float], fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Dict[str, List[float]]:
     """计算MACD指标"""
@@ -30,9 +42,9 @@ def calculate_macd(prices: List[float], fast_period: int = 12, slow_period: int
     macd_hist = macd_line - signal_line
     
     return {
-        "macd_line": [handle_nan(x) for x in macd_line.tolist()],
-        "signal_line": [handle_nan(x) for x in signal_line.tolist()],
-        "macd_hist": [handle_nan(x) for x in macd_hist.tolist()]
+        "macd_line": nan_to_none(macd_line),
+        "signal_line": nan_to_none(signal_line),
+        "macd_hist": nan_to_none(macd_hist)
     }
 
 def calculate_rsi(prices: List[float], period: int = 14) -> List[float]:
@@ -50,7 +62,7 @@ def calculate_rsi(prices: List[float], period: int = 14) -> List[float]:
     rs = gain / loss
     rsi = 100 - (100 / (1 + rs))
     
-    return [handle_nan(x) for x in rsi.tolist()]
+    return nan_to_none(rsi)
 
 def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: int = 2) -> Dict[str, List[float]]:
     """计算布林带"""
@@ -67,19 +79,19 @@ def calculate_bollinger_bands(prices: List[float], period: int = 20, std_dev: in
     lower_band = middle_band - (std * std_dev)
     
     return {
-        "middle_band": [handle_nan(x) for x in middle_band.tolist()],
-        "upper_band": [handle_nan(x) for x in upper_band.tolist()],
-        "lower_band": [handle_nan(x) for x in lower_band.tolist()]
+        "middle_band": nan_to_none(middle_band),
+        "upper_band": nan_to_none(upper_band),
+        "lower_band": nan_to_none(lower_band)
     }
 
 def calculate_volume_ma(volumes: List[int], period: int = 5) -> List[float]:
     """计算成交量移动平均"""
-    volume_ma = pd.Series(volumes).rolling(window=period).mean().tolist()
-    return [handle_nan(x) for x in volume_ma]
+    volume_ma = pd.Series(volumes).rolling(window=period).mean()
+    return nan_to_none(volume_ma)
 
 def calculate_price_change(prices: List[float]) -> Dict[str, float]:
     """计算价格变化"""
-    if not prices:
+    if prices is None or len(prices) == 0:
         return {"change": 0, "change_percent": 0}
     
     current_price = prices[-1]
@@ -94,4 +106,283 @@ def calculate_price_change(prices: List[float]) -> Dict[str, float]:
     return {
         "change": round(change, 2),
         "change_percent": round(change_percent, 2)
-    } 
\ No newline at end of file
+    }
+
+# ---------------------------------------------------------------------------
+# 指标注册表
+# ---------------------------------------------------------------------------
+
+# 指标可用的输入列
+INPUT_COLUMNS = ("close", "high", "low", "volume")
+
+def ema_warmup(alpha: float, tolerance: float = 0.01) -> int:
+    """指数平均的初始值权重衰减到 tolerance 以下所需的交易日数"""
+    return int(np.ceil(np.log(tolerance) / np.log(1 - alpha)))
+
+class IndicatorContext:
+    """单只股票的指标计算上下文
+
+    保存输入列，并缓存移动平均、指数平均、滚动标准差等中间结果，同一次请求中
+    多个指标用到相同的中间结果时只计算一次（如 ma20 与布林带中轨、KDJ 与威廉指标的最高最低价）。
+    skip 为开头预热数据的条数，累计型指标（如 OBV）以第 skip 条为起点，结果不受预热数据多少的影响。
+
+    输入列也可以是每列一只股票的 DataFrame（见 market_analysis.PriceMatrix），指标按列计算，
+    此时 skip 为每只股票返回区间第一行的位置，present 标记真实存在的交易，其余为补齐的空位。
+    """
+
+    def __init__(self, skip=0, present: Optional[pd.DataFrame] = None, **columns):
+        unknown = set(columns) - set(INPUT_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知的输入列：{', '.join(sorted(unknown))}")
+        self._columns: Dict[str, pd.Series] = {
+            name: values.astype("float64") if isinstance(values, pd.DataFrame) else pd.Series(values, dtype="float64")
+            for name, values in columns.items() if values is not None
+        }
+        self._cache: Dict[Tuple, pd.Series] = {}
+        self.skip = skip
+        self.present = present
+
+    def column(self, name: str) -> pd.Series:
+        """输入列或由 derive 生成的派生列"""
+        series = self._columns.get(name)
+        if series is None:
+            raise ValueError(f"缺少计算指标所需的数据列：{name}")
+        return series
+
+    def derive(self, name: str, func: Callable[[], pd.Series]) -> pd.Series:
+        """生成并缓存派生列，之后可以像输入列一样传给 rolling、ema"""
+        if name not in self._columns:
+            self._columns[name] = func()
+        return self._columns[name]
+
+    def mask_padding(self, values: pd.Series) -> pd.Series:
+        """把补齐的空位置为 NaN，避免被当作0参与滚动窗口；单只股票计算时原样返回"""
+        return values if self.present is None else values.where(self.present)
+
+    def _memo(self, key: Tuple, func: Callable[[], pd.Series]) -> pd.Series:
+        if key not in self._cache:
+            self._cache[key] = func()
+        return self._cache[key]
+
+    def rolling(self, column: str, window: int, how: str = "mean") -> pd.Series:
+        """滚动窗口统计，how 为 mean、std、max、min、sum"""
+        return self._memo(
+            ("rolling", column, window, how),
+            lambda: getattr(self.column(column).rolling(window=window), how)()
+        )
+
+    def ema(self, column: str, span: Optional[int] = None, alpha: Optional[float] = None) -> pd.Series:
+        """指数移动平均（adjust=False），span 与 alpha 二选一"""
+        return self._memo(
+            ("ema", column, span, alpha),
+            lambda: self.column(column).ewm(span=span, alpha=alpha, adjust=False).mean()
+        )
+
+@dataclass(frozen=True)
+class Indicator:
+    """注册的技术指标
+
+    Attributes:
+        inputs: 计算所需的输入列
+        lookback: 第一个结果稳定之前需要的历史交易日数
+        params: 计算参数，作为关键字参数传给 func，并参与结果缓存键
+        func: 接收 IndicatorContext 和参数，返回序列、{字段: 序列} 或标量字典
+    """
+    name: str
+    inputs: Tuple[str, ...]
+    lookback: int
+    params: Dict
+    func: Callable
+
+INDICATORS: Dict[str, Indicator] = {}
+
+# 未指定 indicators 时返回的指标，与原有接口的返回字段一致
+DEFAULT_INDICATORS = ["ma5", "ma10", "ma20", "macd", "rsi", "bollinger_bands", "volume_ma", "price_change"]
+
+def register_indicator(name: str, inputs: Tuple[str, ...], lookback: int, params: Optional[Dict] = None):
+    """注册技术指标的装饰器"""
+    def decorator(func: Callable) -> Callable:
+        if name in INDICATORS:
+            raise ValueError(f"指标 {name} 已注册")
+        INDICATORS[name] = Indicator(name, tuple(inputs), lookback, dict(params or {}), func)
+        return func
+    return decorator
+
+def resolve_indicators(names: Optional[List[str]] = None) -> List[Indicator]:
+    """按名称取出注册的指标，names 为空时返回默认指标，未知名称抛出 ValueError"""
+    names = names or DEFAULT_INDICATORS
+    unknown = [name for name in names if name not in INDICATORS]
+    if unknown:
+        raise ValueError(f"不支持的指标：{', '.join(unknown)}，可选值：{', '.join(INDICATORS)}")
+    return [INDICATORS[name] for name in dict.fromkeys(names)]
+
+def required_inputs(indicators: List[Indicator]) -> List[str]:
+    """指标所需输入列的并集"""
+    return [column for column in INPUT_COLUMNS if any(column in indicator.inputs for indicator in indicators)]
+
+def max_lookback(indicators: List[Indicator]) -> int:
+    return max((indicator.lookback for indicator in indicators), default=0)
+
+def _to_output(value, skip: int):
+    if isinstance(value, pd.Series):
+        return nan_to_none(value.to_numpy()[skip:])
+    if isinstance(value, dict):
+        return {key: _to_output(item, skip) for key, item in value.items()}
+    return value
+
+def calculate_indicators(columns: Dict[str, List[float]], indicators: Optional[List[str]] = None, skip: int = 0) -> Dict:
+    """只计算请求的指标，共用的中间结果只计算一次
+
+    Args:
+        columns: 输入列，键为 INPUT_COLUMNS 中的名称，只需提供所请求指标用到的列
+        indicators: 指标名称列表，默认为 DEFAULT_INDICATORS
+        skip: 前 skip 条为预热数据，只参与计算，不出现在返回的序列中
+    """
+    context = IndicatorContext(skip=skip, **columns)
+    return {
+        indicator.name: _to_output(indicator.func(context, **indicator.params), skip)
+        for indicator in resolve_indicators(indicators)
+    }
+
+def _ma(ctx: IndicatorContext, period: int) -> pd.Series:
+    return ctx.rolling("close", period)
+
+for _period in (5, 10, 20):
+    register_indicator(f"ma{_period}", inputs=("close",), lookback=_period - 1, params={"period": _period})(_ma)
+
+@register_indicator(
+    "macd", inputs=("close",),
+    lookback=ema_warmup(2 / 27) + ema_warmup(2 / 10),
+    params={"fast_period": 12, "slow_period": 26, "signal_period": 9}
+)
+def _macd(ctx: IndicatorContext, fast_period: int, slow_period: int, signal_period: int) -> Dict[str, pd.Series]:
+    macd_line = ctx.derive(
+        f"macd_line_{fast_period}_{slow_period}",
+        lambda: ctx.ema("close", span=fast_period) - ctx.ema("close", span=slow_period)
+    )
+    signal_line = ctx.ema(f"macd_line_{fast_period}_{slow_period}", span=signal_period)
+    return {
+        "macd_line": macd_line,
+        "signal_line": signal_line,
+        "macd_hist": macd_line - signal_line
+    }
+
+@register_indicator("rsi", inputs=("close",), lookback=14, params={"period": 14})
+def _rsi(ctx: IndicatorContext, period: int) -> pd.Series:
+    delta = ctx.derive("close_diff", lambda: ctx.column("close").diff())
+    ctx.derive("gain", lambda: ctx.mask_padding(delta.where(delta > 0, 0)))
+    ctx.derive("loss", lambda: ctx.mask_padding(-delta.where(delta < 0, 0)))
+    rs = ctx.rolling("gain", period) / ctx.rolling("loss", period)
+    return 100 - (100 / (1 + rs))
+
+@register_indicator("bollinger_bands", inputs=("close",), lookback=19, params={"period": 20, "std_dev": 2})
+def _bollinger_bands(ctx: IndicatorContext, period: int, std_dev: int) -> Dict[str, pd.Series]:
+    middle_band = ctx.rolling("close", period)
+    std = ctx.rolling("close", period, "std")
+    return {
+        "middle_band": middle_band,
+        "upper_band": middle_band + (std * std_dev),
+        "lower_band": middle_band - (std * std_dev)
+    }
+
+@register_indicator("volume_ma", inputs=("volume",), lookback=4, params={"period": 5})
+def _volume_ma(ctx: IndicatorContext, period: int) -> pd.Series:
+    return ctx.rolling("volume", period)
+
+@register_indicator("price_change", inputs=("close",), lookback=1)
+def _price_change(ctx: IndicatorContext) -> Dict[str, float]:
+    return calculate_price_change(ctx.column("close").tolist())
+
+@register_indicator(
+    "kdj", inputs=("high", "low", "close"),
+    lookback=8 + 2 * ema_warmup(1 / 3),
+    params={"period": 9, "k_period": 3, "d_period": 3}
+)
+def _kdj(ctx: IndicatorContext, period: int, k_period: int, d_period: int) -> Dict[str, pd.Series]:
+    """KDJ 随机指标，K、D 为 RSV 的 1/m 平滑（即 SMA(X, m, 1)），最高价等于最低价时 RSV 记为50"""
+    highest = ctx.rolling("high", period, "max")
+    lowest = ctx.rolling("low", period, "min")
+    price_range = highest - lowest
+    # 生成派生列，之后由 ema 按名称平滑
+    ctx.derive(
+        f"rsv_{period}",
+        lambda: ((ctx.column("close") - lowest) / price_range * 100).mask(price_range == 0, 50.0)
+    )
+    k = ctx.derive(f"kdj_k_{period}_{k_period}", lambda: ctx.ema(f"rsv_{period}", alpha=1 / k_period))
+    d = ctx.ema(f"kdj_k_{period}_{k_period}", alpha=1 / d_period)
+    return {"k": k, "d": d, "j": 3 * k - 2 * d}
+
+@register_indicator("atr", inputs=("high", "low", "close"), lookback=ema_warmup(1 / 14), params={"period": 14})
+def _atr(ctx: IndicatorContext, period: int) -> pd.Series:
+    """平均真实波幅，真实波幅按 Wilder 方法（alpha=1/period）平滑"""
+    def true_range() -> pd.Series:
+        high, low = ctx.column("high"), ctx.column("low")
+        previous_close = ctx.column("close").shift(1)
+        # fmax 忽略 NaN，第一天没有昨收时真实波幅为最高价减最低价
+        return np.fmax(np.fmax(high - low, (high - previous_close).abs()), (low - previous_close).abs())
+
+    ctx.derive("true_range", true_range)
+    return ctx.ema("true_range", alpha=1 / period)
+
+@register_indicator("obv", inputs=("close", "volume"), lookback=0)
+def _obv(ctx: IndicatorContext) -> pd.Series:
+    """能量潮，从返回区间的第一个交易日开始累计，第一天为0"""
+    delta = ctx.derive("close_diff", lambda: ctx.column("close").diff())
+    flows = np.sign(delta).fillna(0) * ctx.column("volume")
+    # 预热数据和返回区间第一天不计入，结果与请求中其他指标需要多少预热数据无关
+    positions = np.arange(len(flows))
+    if flows.ndim == 2:
+        positions = positions[:, None]
+    return flows.where(positions > np.asarray(ctx.skip), 0).cumsum()
+
+@register_indicator("cci", inputs=("high", "low", "close"), lookback=19, params={"period": 20})
+def _cci(ctx: IndicatorContext, period: int) -> pd.Series:
+    """顺势指标，平均绝对偏差用滑动窗口视图向量化计算"""
+    typical_price = ctx.derive(
+        "typical_price",
+        lambda: (ctx.column("high") + ctx.column("low") + ctx.column("close")) / 3
+    )
+    mean = ctx.rolling("typical_price", period)
+    deviation = typical_price * np.nan
+    if len(typical_price) >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(typical_price.to_numpy(), period, axis=0)
+        deviation.iloc[period - 1:] = np.abs(windows - windows.mean(axis=-1, keepdims=True)).mean(axis=-1)
+    return (typical_price - mean) / (0.015 * deviation)
+
+@register_indicator("williams_r", inputs=("high", "low", "close"), lookback=13, params={"period": 14})
+def _williams_r(ctx: IndicatorContext, period: int) -> pd.Series:
+    """威廉指标，取值范围 -100 ~ 0"""
+    highest = ctx.rolling("high", period, "max")
+    lowest = ctx.rolling("low", period, "min")
+    return (highest - ctx.column("close")) / (highest - lowest) * -100
+
+# ---------------------------------------------------------------------------
+# 列式格式
+# ---------------------------------------------------------------------------
+
+def _typed_array(array: np.ndarray) -> Dict[str, str]:
+    """把数组编码为小端字节序的 base64 字符串，前端可直接构造 Float64Array / Int32Array"""
+    array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder("<"))
+    return {"dtype": array.dtype.name, "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+def indicators_to_columnar(results: Dict) -> Dict:
+    """把技术指标结果转换为列式格式
+
+    所有指标共享一个日期轴，日期编码为自 1970-01-01 起的天数（int32），序列指标编码为 float64，
+    缺失值保留为 NaN；嵌套指标的列名为 "指标.字段"。每列为 {"dtype", "data"}，data 为小端字节序的
+    base64 字符串。price_change 等非序列结果原样放在顶层。
+    """
+    days = np.array(results["dates"], dtype="datetime64[D]").astype("int32")
+    columns = {}
+    output = {"format": "columnar", "length": len(days), "dates": _typed_array(days), "columns": columns}
+    for name, value in results.items():
+        if name == "dates":
+            continue
+        if isinstance(value, list):
+            columns[name] = _typed_array(np.array(value, dtype="float64"))
+        elif isinstance(value, dict) and all(isinstance(item, list) for item in value.values()):
+            for key, item in value.items():
+                columns[f"{name}.{key}"] = _typed_array(np.array(item, dtype="float64"))
+        else:
+            output[name] = value
+    return output
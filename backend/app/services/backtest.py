@@ -0,0 +1,292 @@
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.stock import StockBasic, StockTrade
+from app.services.analysis import calculate_bollinger_bands, calculate_ma, calculate_rsi, nan_to_none
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS_PER_YEAR = 252
+
+# 各市场的涨跌幅限制，未列出的市场为10%
+MARKET_PRICE_LIMITS = {
+    "创业板": 0.2,
+    "科创板": 0.2,
+    "北交所": 0.3,
+}
+DEFAULT_PRICE_LIMIT = 0.1
+ST_PRICE_LIMIT = 0.05
+
+# 判断开盘价是否处于涨跌停时的容差，价格精确到分
+LIMIT_PRICE_TOLERANCE = 1e-6
+
+@dataclass
+class BacktestConfig:
+    """回测参数
+
+    费率均为成交金额的比例。price_limit 为 None 时按股票所属市场和是否 ST 确定。
+    """
+    initial_capital: float = 100000.0
+    commission: float = 0.0003
+    stamp_duty: float = 0.0005  # 印花税，仅卖出时收取
+    slippage: float = 0.0
+    price_limit: Optional[float] = None
+
+def price_limit_for(market: Optional[str], name: Optional[str] = None) -> float:
+    """股票的涨跌幅限制比例"""
+    if name and "ST" in name.upper():
+        return ST_PRICE_LIMIT
+    return MARKET_PRICE_LIMITS.get(market, DEFAULT_PRICE_LIMIT)
+
+def _as_array(values) -> np.ndarray:
+    return np.asarray(values, dtype="float64")
+
+def _latch(enter: np.ndarray, exit: np.ndarray) -> np.ndarray:
+    """进入条件成立后保持持仓，直到退出条件成立"""
+    state = np.full(len(enter), np.nan)
+    state[exit] = 0.0
+    state[enter] = 1.0
+    return pd.Series(state).ffill().fillna(0.0).to_numpy()
+
+def ma_cross_signal(close: np.ndarray, fast: int = 5, slow: int = 20) -> np.ndarray:
+    """均线交叉：快线在慢线之上时持仓"""
+    if fast >= slow:
+        raise ValueError("快线周期必须小于慢线周期")
+    fast_ma = _as_array(calculate_ma(close, fast))
+    slow_ma = _as_array(calculate_ma(close, slow))
+    return (fast_ma > slow_ma).astype("float64")
+
+def rsi_signal(close: np.ndarray, period: int = 14, lower: float = 30, upper: float = 70) -> np.ndarray:
+    """RSI 阈值：RSI 低于 lower 时买入，高于 upper 时卖出"""
+    if lower >= upper:
+        raise ValueError("RSI 买入阈值必须小于卖出阈值")
+    rsi = _as_array(calculate_rsi(close, period))
+    return _latch(rsi < lower, rsi > upper)
+
+def bollinger_signal(close: np.ndarray, period: int = 20, std_dev: float = 2) -> np.ndarray:
+    """布林带突破：收盘价突破上轨时买入，跌破中轨时卖出"""
+    bands = calculate_bollinger_bands(close, period, std_dev)
+    close = _as_array(close)
+    return _latch(close > _as_array(bands["upper_band"]), close < _as_array(bands["middle_band"]))
+
+# 策略名称与信号函数，信号函数返回每个交易日收盘后的目标持仓（0 或 1）
+STRATEGIES: Dict[str, Callable[..., np.ndarray]] = {
+    "ma_cross": ma_cross_signal,
+    "rsi": rsi_signal,
+    "bollinger": bollinger_signal,
+}
+
+def strategy_signal(strategy: str, close: np.ndarray, params: Optional[Dict] = None) -> np.ndarray:
+    """按策略名称计算目标持仓"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"不支持的策略：{strategy}")
+    try:
+        return STRATEGIES[strategy](close, **(params or {}))
+    except TypeError as e:
+        raise ValueError(f"策略 {strategy} 参数错误：{str(e)}")
+
+def simulate_positions(
+    target: np.ndarray,
+    open_prices: np.ndarray,
+    close_prices: np.ndarray,
+    price_limit: float
+) -> np.ndarray:
+    """根据目标持仓和涨跌停限制计算实际持仓
+
+    第 t 日的目标持仓来自第 t-1 日收盘后的信号，在第 t 日开盘执行。开盘即涨停时买单无法成交，
+    开盘即跌停时卖单无法成交，此时保持前一日的持仓。由于每个交易日只在开盘执行一次，
+    当日买入的股票最早在下一交易日卖出，满足 T+1 规则。
+
+    实际持仓只在订单可以成交的交易日跟随目标持仓变化，因此可以写成“可成交日取目标值、
+    其余日期沿用前值”的前向填充，不需要逐日循环。
+    """
+    prev_close = np.concatenate([[np.nan], close_prices[:-1]])
+    with np.errstate(invalid="ignore"):
+        limit_up = open_prices >= np.round(prev_close * (1 + price_limit), 2) - LIMIT_PRICE_TOLERANCE
+        limit_down = open_prices <= np.round(prev_close * (1 - price_limit), 2) + LIMIT_PRICE_TOLERANCE
+    fillable = ((target == 1) & ~limit_up) | ((target == 0) & ~limit_down)
+    return pd.Series(np.where(fillable, target, np.nan)).ffill().fillna(0.0).to_numpy()
+
+def _simulate(
+    open_prices: np.ndarray,
+    close_prices: np.ndarray,
+    strategy: str,
+    params: Optional[Dict],
+    config: BacktestConfig,
+    price_limit: float
+) -> Dict:
+    """计算逐日持仓、买卖点和净值，返回各数组"""
+    signal = strategy_signal(strategy, close_prices, params)
+    # 收盘后产生信号，下一交易日开盘执行
+    target = np.concatenate([[0.0], signal[:-1]])
+    position = simulate_positions(target, open_prices, close_prices, price_limit)
+    prev_position = np.concatenate([[0.0], position[:-1]])
+
+    # 每日收益拆分为隔夜（前收盘到开盘）和日内（开盘到收盘）两段：
+    # 隔夜收益属于前一日的持仓，日内收益属于开盘调仓后的持仓
+    prev_close = np.concatenate([[close_prices[0]], close_prices[:-1]])
+    overnight = open_prices / prev_close - 1
+    intraday = close_prices / open_prices - 1
+
+    buys = position > prev_position
+    sells = position < prev_position
+    buy_cost = config.commission + config.slippage
+    sell_cost = config.commission + config.stamp_duty + config.slippage
+    costs = buys * buy_cost + sells * sell_cost
+
+    factor = (1 + prev_position * overnight) * (1 + position * intraday) * (1 - costs)
+    return {
+        "target": target,
+        "position": position,
+        "buys": buys,
+        "sells": sells,
+        "buy_cost": buy_cost,
+        "sell_cost": sell_cost,
+        "daily_returns": factor - 1,
+        "equity": config.initial_capital * np.cumprod(factor)
+    }
+
+def _trade_returns(open_prices, close_prices, buys, sells, buy_cost, sell_cost) -> Dict:
+    """按买卖点配对计算每笔交易的收益
+
+    回测结束时仍持有的交易按最后收盘价计算浮动盈亏，不计卖出费用。
+    """
+    entries = np.flatnonzero(buys)
+    exits = np.flatnonzero(sells)
+    # 持仓只在0和1之间切换，买卖点交替出现，卖出次数等于买入次数或少一次
+    closed = np.arange(len(entries)) < len(exits)
+    exit_index = np.append(exits, len(close_prices) - 1)[:len(entries)]
+    entry_price = open_prices[entries]
+    exit_price = np.where(closed, open_prices[exit_index], close_prices[-1])
+    net = exit_price * np.where(closed, 1 - sell_cost, 1) / (entry_price * (1 + buy_cost)) - 1
+    return {
+        "entries": entries,
+        "exits": exit_index,
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "closed": closed,
+        "returns": net
+    }
+
+def run_backtest(
+    bars: pd.DataFrame,
+    strategy: str,
+    params: Optional[Dict] = None,
+    config: Optional[BacktestConfig] = None
+) -> Dict:
+    """对一只股票的日线数据执行回测
+
+    Args:
+        bars: 按交易日期升序的日线数据，包含 trade_date、open_price、close_price 列
+        strategy: 策略名称，见 STRATEGIES
+        params: 策略参数
+        config: 费率、初始资金和涨跌幅限制
+
+    Returns:
+        Dict: equity_curve（日期、净值、持仓）、trades（逐笔交易）和 summary（汇总统计）
+    """
+    config = config or BacktestConfig()
+    price_limit = config.price_limit if config.price_limit is not None else DEFAULT_PRICE_LIMIT
+
+    open_prices = bars["open_price"].to_numpy(dtype="float64")
+    close_prices = bars["close_price"].to_numpy(dtype="float64")
+    dates = pd.to_datetime(bars["trade_date"]).dt.strftime('%Y-%m-%d').tolist()
+
+    sim = _simulate(open_prices, close_prices, strategy, params, config, price_limit)
+    trades = _trade_returns(open_prices, close_prices, sim["buys"], sim["sells"], sim["buy_cost"], sim["sell_cost"])
+
+    return {
+        "equity_curve": {
+            "dates": dates,
+            "equity": nan_to_none(sim["equity"]),
+            "position": sim["position"].astype(int).tolist()
+        },
+        "trades": _format_trades(dates, trades),
+        "summary": _summarize(sim, trades, close_prices, config.initial_capital)
+    }
+
+def backtest_summary(
+    open_prices: np.ndarray,
+    close_prices: np.ndarray,
+    strategy: str,
+    params: Optional[Dict] = None,
+    config: Optional[BacktestConfig] = None
+) -> Dict:
+    """只计算汇总统计的回测，用于参数扫描等不需要净值曲线和交易明细的场景"""
+    config = config or BacktestConfig()
+    price_limit = config.price_limit if config.price_limit is not None else DEFAULT_PRICE_LIMIT
+    sim = _simulate(open_prices, close_prices, strategy, params, config, price_limit)
+    trades = _trade_returns(open_prices, close_prices, sim["buys"], sim["sells"], sim["buy_cost"], sim["sell_cost"])
+    return _summarize(sim, trades, close_prices, config.initial_capital)
+
+def _format_trades(dates: List[str], trades: Dict) -> List[Dict]:
+    return [
+        {
+            "entry_date": dates[entry],
+            "entry_price": float(entry_price),
+            "exit_date": dates[exit_index] if closed else None,
+            "exit_price": float(exit_price),
+            "holding_days": int(exit_index - entry),
+            "return": float(net)
+        }
+        for entry, exit_index, entry_price, exit_price, closed, net in zip(
+            trades["entries"], trades["exits"], trades["entry_price"],
+            trades["exit_price"], trades["closed"], trades["returns"]
+        )
+    ]
+
+def _summarize(sim: Dict, trades: Dict, close_prices: np.ndarray, initial_capital: float) -> Dict:
+    equity = sim["equity"]
+    daily_returns = sim["daily_returns"]
+    days = len(equity)
+    total_return = equity[-1] / initial_capital - 1
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+    std = daily_returns.std(ddof=1) if days > 1 else 0.0
+    closed = trades["returns"][trades["closed"]]
+    return {
+        "days": days,
+        "initial_capital": initial_capital,
+        "final_equity": float(equity[-1]),
+        "total_return": float(total_return),
+        "annualized_return": float((1 + total_return) ** (TRADING_DAYS_PER_YEAR / days) - 1),
+        "max_drawdown": float(drawdown.min()),
+        "sharpe_ratio": float(daily_returns.mean() / std * np.sqrt(TRADING_DAYS_PER_YEAR)) if std > 0 else None,
+        "trade_count": len(trades["entries"]),
+        "win_rate": float(np.mean(closed > 0)) if len(closed) else None,
+        "exposure": float(sim["position"].mean()),
+        "blocked_orders": int(np.count_nonzero(sim["position"] != sim["target"])),
+        "benchmark_return": float(close_prices[-1] / close_prices[0] - 1)
+    }
+
+def load_backtest_bars(
+    db: Session,
+    stock_code: str,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Optional[Dict]:
+    """读取回测所需的日线数据和股票信息，股票不存在时返回 None"""
+    stock = db.execute(
+        select(StockBasic.id, StockBasic.name, StockBasic.market).where(StockBasic.code == stock_code)
+    ).one_or_none()
+    if stock is None:
+        return None
+
+    query = (
+        select(StockTrade.trade_date, StockTrade.open_price, StockTrade.close_price)
+        .where(StockTrade.stock_id == stock.id)
+        .order_by(StockTrade.trade_date)
+    )
+    if start_date:
+        query = query.where(StockTrade.trade_date >= start_date)
+    if end_date:
+        query = query.where(StockTrade.trade_date <= end_date)
+
+    bars = pd.DataFrame(db.execute(query).all(), columns=["trade_date", "open_price", "close_price"])
+    # 停牌或数据缺失的交易日不参与回测
+    bars = bars.dropna(subset=["open_price", "close_price"]).reset_index(drop=True)
+    return {"bars": bars, "price_limit": price_limit_for(stock.market, stock.name)}
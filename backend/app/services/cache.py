@@ -0,0 +1,173 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REDIS_KEY_PREFIX = "indicator-cache"
+
+class IndicatorCache:
+    """技术指标结果缓存
+
+    进程内 LRU 缓存，按条目数限制大小并设置过期时间，可选使用 Redis 作为二级缓存。
+    缓存键包含调用方从数据库读取的数据版本（该股票交易数据的最后更新时间），
+    任何进程（包括 Celery worker）写入新数据后旧结果都不会再被命中，不依赖 Redis。
+    本进程写入时还会调用 invalidate 立即清除该股票的缓存条目。
+
+    get/set 在配置 Redis 时会进行网络 I/O，async 接口应使用 aget/aset 在线程池中执行。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: int = 3600, redis_client=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.redis = redis_client
+        self._entries: "OrderedDict[Tuple, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.redis_errors = 0
+
+    def _version(self, code: str) -> int:
+        if self.redis is not None:
+            try:
+                value = self.redis.get(f"{REDIS_KEY_PREFIX}:version:{code}")
+                return int(value) if value else 0
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"读取指标缓存版本号失败：{str(e)}")
+        with self._lock:
+            return self._versions.get(code, 0)
+
+    @staticmethod
+    def _params_key(params: Dict[str, Hashable]) -> str:
+        return json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, code: str, params: Dict[str, Hashable], data_version: Optional[str] = None) -> Optional[Any]:
+        """查询缓存，未命中时返回 None"""
+        key = (code, self._params_key(params), self._version(code), data_version)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self._redis_key(key))
+                if raw is not None:
+                    value = json.loads(raw)
+                    self._store(key, value)
+                    with self._lock:
+                        self.hits += 1
+                    return value
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"读取Redis指标缓存失败：{str(e)}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, code: str, params: Dict[str, Hashable], value: Any, data_version: Optional[str] = None) -> None:
+        """写入缓存"""
+        key = (code, self._params_key(params), self._version(code), data_version)
+        self._store(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"写入Redis指标缓存失败：{str(e)}")
+
+    async def aget(self, code: str, params: Dict[str, Hashable], data_version: Optional[str] = None) -> Optional[Any]:
+        """供 async 接口调用的 get，使用 Redis 时在线程池中执行，避免阻塞事件循环"""
+        if self.redis is None:
+            return self.get(code, params, data_version)
+        return await run_in_threadpool(self.get, code, params, data_version)
+
+    async def aset(self, code: str, params: Dict[str, Hashable], value: Any, data_version: Optional[str] = None) -> None:
+        """供 async 接口调用的 set"""
+        if self.redis is None:
+            return self.set(code, params, value, data_version)
+        await run_in_threadpool(self.set, code, params, value, data_version)
+
+    def _store(self, key: Tuple, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    @staticmethod
+    def _redis_key(key: Tuple) -> str:
+        code, params, version, data_version = key
+        return f"{REDIS_KEY_PREFIX}:{code}:{version}:{data_version}:{params}"
+
+    def invalidate(self, code: str) -> None:
+        """股票数据变化后使其全部缓存失效"""
+        with self._lock:
+            self._versions[code] = self._versions.get(code, 0) + 1
+            stale = [key for key in self._entries if key[0] == code]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += 1
+        if self.redis is not None:
+            try:
+                self.redis.incr(f"{REDIS_KEY_PREFIX}:version:{code}")
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"更新指标缓存版本号失败：{str(e)}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "redis" if self.redis is not None else "memory",
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "redis_errors": self.redis_errors
+            }
+
+def _create_indicator_cache() -> Optional[IndicatorCache]:
+    if not settings.INDICATOR_CACHE_ENABLED:
+        return None
+
+    redis_client = None
+    if settings.INDICATOR_CACHE_REDIS_URL:
+        try:
+            import redis
+            redis_client = redis.Redis.from_url(settings.INDICATOR_CACHE_REDIS_URL)
+        except Exception as e:
+            logger.warning(f"连接Redis指标缓存失败，使用进程内缓存：{str(e)}")
+
+    return IndicatorCache(
+        max_entries=settings.INDICATOR_CACHE_MAX_ENTRIES,
+        ttl=settings.INDICATOR_CACHE_TTL,
+        redis_client=redis_client
+    )
+
+indicator_cache = _create_indicator_cache()
@@ -0,0 +1,274 @@
+import logging
+import os
+import shutil
+import tempfile
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.stock import StockBasic, StockTrade
+
+logger = logging.getLogger(__name__)
+
+# 列式存储中的列及其数据类型，trade_date 以 datetime64[D] 存储；
+# 成交量用 float64 存储，数据库中为空的成交量保留为 NaN，与数据库路径读取的结果一致
+COLUMN_DTYPES = {
+    "trade_date": "datetime64[D]",
+    "open_price": "float64",
+    "high_price": "float64",
+    "low_price": "float64",
+    "close_price": "float64",
+    "volume": "float64",
+    "amount": "float64",
+}
+
+# 每次 IN 查询的股票数
+SYNC_BATCH_SIZE = 500
+
+# 指向当前版本目录的指针文件
+POINTER_FILE = "CURRENT"
+
+# 读取期间版本目录被替换并删除时重新解析指针的次数
+READ_RETRIES = 3
+
+class ColumnarStore:
+    """按股票分目录存储的列式日线行情
+
+    目录结构为 root/<generation>/<code>/<version>/<column>.npy，root 和每只股票目录下的 CURRENT
+    文件分别指向当前的 generation 和 version。写入时先生成新的版本目录，再通过 os.replace 原子替换
+    指针文件；读取时只解析一次指针，所有列都来自同一个不再修改的版本目录，不会混合新旧数据。
+    rebuild 在新的 generation 中重建后整体切换。
+
+    读取时通过 numpy.memmap 映射，按日期区间切片返回的是内存映射上的视图，不产生数据拷贝。
+    数据库中的 stock_trades 仍是唯一数据源，列式存储可随时通过 rebuild 重建。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def _read_pointer(directory: str) -> Optional[str]:
+        try:
+            with open(os.path.join(directory, POINTER_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _swap_pointer(directory: str, target: str) -> None:
+        """原子地将 directory 下的指针文件指向 target"""
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{POINTER_FILE}-", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(target)
+            os.replace(tmp_path, os.path.join(directory, POINTER_FILE))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _generation(self, create: bool = False) -> Optional[str]:
+        generation = self._read_pointer(self.root)
+        if generation is None and create:
+            os.makedirs(self.root, exist_ok=True)
+            generation = os.path.basename(tempfile.mkdtemp(prefix="gen-", dir=self.root))
+            self._swap_pointer(self.root, generation)
+        return generation
+
+    def _version_dir(self, code: str, generation: Optional[str] = None) -> Optional[str]:
+        generation = generation or self._generation()
+        if generation is None:
+            return None
+        symbol_dir = os.path.join(self.root, generation, code)
+        version = self._read_pointer(symbol_dir)
+        return os.path.join(symbol_dir, version) if version else None
+
+    @staticmethod
+    def _load_columns(version_dir: str) -> Dict[str, np.ndarray]:
+        return {
+            column: np.load(os.path.join(version_dir, f"{column}.npy"), mmap_mode="r")
+            for column in COLUMN_DTYPES
+        }
+
+    def _load_symbol(self, code: str, generation: Optional[str] = None) -> Optional[Dict[str, np.ndarray]]:
+        """读取一只股票当前版本的全部列，不存在时返回 None
+
+        解析指针之后、打开文件之前该版本可能被新写入替换并删除，此时重新解析指针。
+        """
+        for _ in range(READ_RETRIES):
+            version_dir = self._version_dir(code, generation)
+            if version_dir is None:
+                return None
+            try:
+                return self._load_columns(version_dir)
+            except FileNotFoundError:
+                continue
+        logger.warning(f"列式存储中股票 {code} 的数据在读取期间被连续替换，回退到数据库")
+        return None
+
+    def has_symbol(self, code: str) -> bool:
+        return self._version_dir(code) is not None
+
+    @staticmethod
+    def _to_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        arrays = {}
+        for column, dtype in COLUMN_DTYPES.items():
+            if column == "trade_date":
+                arrays[column] = pd.to_datetime(df[column]).to_numpy(dtype="datetime64[D]")
+            else:
+                arrays[column] = df[column].to_numpy(dtype=dtype, na_value=np.nan)
+        return arrays
+
+    def _write_arrays(self, code: str, arrays: Dict[str, np.ndarray], generation: str) -> None:
+        symbol_dir = os.path.join(self.root, generation, code)
+        os.makedirs(symbol_dir, exist_ok=True)
+        version_dir = tempfile.mkdtemp(prefix="v-", dir=symbol_dir)
+        try:
+            for column in COLUMN_DTYPES:
+                np.save(os.path.join(version_dir, f"{column}.npy"), arrays[column])
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        # 只删除被本次写入替换的版本，正在读取旧版本的请求打开文件失败时会重新解析指针
+        previous = self._read_pointer(symbol_dir)
+        self._swap_pointer(symbol_dir, os.path.basename(version_dir))
+        if previous:
+            shutil.rmtree(os.path.join(symbol_dir, previous), ignore_errors=True)
+
+    def write_symbol(self, code: str, df: pd.DataFrame) -> None:
+        """整体替换一只股票的列式数据，df 需按 trade_date 升序"""
+        self._write_arrays(code, self._to_arrays(df), self._generation(create=True))
+
+    def remove_symbol(self, code: str) -> None:
+        generation = self._generation()
+        if generation:
+            shutil.rmtree(os.path.join(self.root, generation, code), ignore_errors=True)
+
+    def read_range(
+        self,
+        code: str,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        limit: Optional[int] = None,
+        lookback: int = 0
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """读取一只股票指定日期区间的数据
+
+        返回各列在内存映射上的切片视图；limit 指定时只保留区间内最近的 limit 条，
+        lookback 指定时在前面多返回最多 lookback 条区间之前的数据（用于指标计算的预热）。
+        股票不存在时返回 None。
+        """
+        columns = self._load_symbol(code)
+        if columns is None:
+            return None
+
+        dates = columns["trade_date"]
+        lo = np.searchsorted(dates, np.datetime64(start_date, "D"), side="left") if start_date else 0
+        hi = np.searchsorted(dates, np.datetime64(end_date, "D"), side="right") if end_date else len(dates)
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        lo = max(lo - lookback, 0)
+        return {column: values[lo:hi] for column, values in columns.items()}
+
+    @staticmethod
+    def _query_trades(db: Session, *conditions) -> pd.DataFrame:
+        query = (
+            select(StockTrade.stock_id, *[getattr(StockTrade, c) for c in COLUMN_DTYPES])
+            .where(*conditions)
+            .order_by(StockTrade.stock_id, StockTrade.trade_date)
+        )
+        return pd.DataFrame(db.execute(query).all(), columns=["stock_id"] + list(COLUMN_DTYPES))
+
+    def sync_symbols(
+        self,
+        db: Session,
+        stock_ids: Iterable[int],
+        since: Optional[Dict[int, date]] = None,
+        generation: Optional[str] = None
+    ) -> int:
+        """将指定股票在数据库中的日线同步到列式存储，返回同步的股票数
+
+        since 给出一只股票本次写入的最早交易日时，只从数据库读取该日期及之后的日线，
+        与存储中该日期之前的数据拼接成新版本；存储中还没有该股票或未给出日期时导出全部历史。
+        """
+        generation = generation or self._generation(create=True)
+        since = since or {}
+        stock_ids = list(stock_ids)
+        synced = 0
+        for start in range(0, len(stock_ids), SYNC_BATCH_SIZE):
+            batch = stock_ids[start:start + SYNC_BATCH_SIZE]
+            codes = dict(db.execute(select(StockBasic.id, StockBasic.code).where(StockBasic.id.in_(batch))).all())
+            existing = {}
+            for stock_id in batch:
+                if stock_id in since and stock_id in codes:
+                    columns = self._load_symbol(codes[stock_id], generation)
+                    if columns is not None:
+                        existing[stock_id] = columns
+
+            frames = []
+            full_ids = [stock_id for stock_id in codes if stock_id not in existing]
+            if full_ids:
+                frames.append(self._query_trades(db, StockTrade.stock_id.in_(full_ids)))
+            if existing:
+                frames.append(self._query_trades(
+                    db,
+                    StockTrade.stock_id.in_(list(existing)),
+                    StockTrade.trade_date >= min(since[stock_id] for stock_id in existing)
+                ))
+
+            for df in frames:
+                for stock_id, group in df.groupby("stock_id", sort=False):
+                    arrays = self._to_arrays(group)
+                    if stock_id in existing:
+                        # 同一批次中各股票的起始日期不同，按本股票的起始日期截取后接在旧数据之后
+                        first = np.datetime64(since[stock_id], "D")
+                        old, new_from = existing[stock_id], np.searchsorted(arrays["trade_date"], first)
+                        keep = np.searchsorted(old["trade_date"], first)
+                        arrays = {
+                            column: np.concatenate([old[column][:keep], values[new_from:]])
+                            for column, values in arrays.items()
+                        }
+                    self._write_arrays(codes[stock_id], arrays, generation)
+                    synced += 1
+        return synced
+
+    def rebuild(self, db: Session) -> int:
+        """从数据库重建全部股票的列式数据，返回导出的股票数
+
+        在新的 generation 目录中导出全部股票后再切换根目录的指针，重建期间读取请求仍使用旧数据，
+        切换后删除旧的 generation。重建期间其他进程同步到旧 generation 的数据会丢失，
+        应在停止行情采集时执行。
+        """
+        os.makedirs(self.root, exist_ok=True)
+        generation = os.path.basename(tempfile.mkdtemp(prefix="gen-", dir=self.root))
+        try:
+            stock_ids = [stock_id for (stock_id,) in db.execute(select(StockTrade.stock_id).distinct()).all()]
+            exported = self.sync_symbols(db, stock_ids, generation=generation)
+        except Exception:
+            shutil.rmtree(os.path.join(self.root, generation), ignore_errors=True)
+            raise
+
+        self._swap_pointer(self.root, generation)
+        # 清理旧的 generation 和旧版目录结构留下的股票目录，以 . 开头的是其他写入的临时文件
+        for entry in os.listdir(self.root):
+            if entry in (generation, POINTER_FILE) or entry.startswith("."):
+                continue
+            path = os.path.join(self.root, entry)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+        logger.info(f"列式存储重建完成，共导出{exported}只股票")
+        return exported
+
+def get_columnar_store() -> Optional[ColumnarStore]:
+    """返回已启用的列式存储，未启用时返回 None"""
+    if not settings.COLUMNAR_STORE_ENABLED:
+        return None
+    return ColumnarStore(settings.COLUMNAR_STORE_PATH)
+
+def dates_to_strings(dates: np.ndarray) -> List[str]:
+    """将 datetime64[D] 数组转换为 YYYY-MM-DD 字符串列表"""
+    return np.datetime_as_string(dates, unit="D").tolist()
@@ -1,72 +1,277 @@
+import csv
+import io
+import json
+import zlib
+from itertools import islice
 import pandas as pd
-from typing import List, Dict
-from datetime import datetime
-from app.schemas.stock import StockBasic, StockTrade
-
-def export_stock_basics_to_csv(stocks: List[StockBasic], filename: str = None) -> str:
-    """导出股票基础数据为CSV格式"""
-    if not filename:
-        filename = f"stock_basics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    
-    # 转换为DataFrame
-    df = pd.DataFrame([stock.dict() for stock in stocks])
-    
-    # 保存为CSV
-    df.to_csv(filename, index=False, encoding='utf-8-sig')
-    
-    return filename
-
-def export_stock_basics_to_excel(stocks: List[StockBasic], filename: str = None) -> str:
-    """导出股票基础数据为Excel格式"""
-    if not filename:
-        filename = f"stock_basics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
-    # 转换为DataFrame
-    df = pd.DataFrame([stock.dict() for stock in stocks])
-    
-    # 保存为Excel
-    df.to_excel(filename, index=False)
-    
-    return filename
-
-def export_stock_trades_to_csv(trades: List[StockTrade], filename: str = None) -> str:
-    """导出股票交易数据为CSV格式"""
-    if not filename:
-        filename = f"stock_trades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    
-    # 转换为DataFrame
-    df = pd.DataFrame([trade.dict() for trade in trades])
-    
-    # 保存为CSV
-    df.to_csv(filename, index=False, encoding='utf-8-sig')
-    
-    return filename
-
-def export_stock_trades_to_excel(trades: List[StockTrade], filename: str = None) -> str:
-    """导出股票交易数据为Excel格式"""
-    if not filename:
-        filename = f"stock_trades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
-    # 转换为DataFrame
-    df = pd.DataFrame([trade.dict() for trade in trades])
-    
-    # 保存为Excel
-    df.to_excel(filename, index=False)
-    
-    return filename
-
-def export_analysis_results(results: Dict, filename: str = None) -> str:
-    """导出分析结果为Excel格式"""
-    if not filename:
-        filename = f"analysis_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
-    # 创建Excel写入器
-    with pd.ExcelWriter(filename) as writer:
-        # 将每个分析结果写入不同的sheet
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from datetime import date, datetime
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.stock import StockBasic, StockTrade
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # 未安装 pyarrow 时不支持 Arrow/Parquet 导出
+    pa = None
+
+# 每次从数据库游标读取的行数
+STREAM_BATCH_SIZE = 1000
+
+# 每个输出块的目标字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Arrow 记录批次 / Parquet 行组的行数
+ARROW_BATCH_SIZE = 65536
+
+STOCK_BASIC_COLUMNS = ["id", "code", "name", "industry", "market", "list_date", "update_time", "created_at", "updated_at"]
+STOCK_TRADE_COLUMNS = ["id", "stock_id", "trade_date", "open_price", "high_price", "low_price", "close_price", "volume", "amount", "created_at", "updated_at"]
+BULK_TRADE_COLUMNS = ["code", "trade_date", "open_price", "high_price", "low_price", "close_price", "volume", "amount"]
+
+# 各导出列的 Arrow 类型
+ARROW_COLUMN_TYPES = {
+    "id": "int64",
+    "stock_id": "int64",
+    "code": "string",
+    "name": "string",
+    "industry": "string",
+    "market": "string",
+    "list_date": "date32",
+    "update_time": "timestamp[us]",
+    "created_at": "timestamp[us]",
+    "updated_at": "timestamp[us]",
+    "trade_date": "date32",
+    "open_price": "double",
+    "high_price": "double",
+    "low_price": "double",
+    "close_price": "double",
+    "volume": "int64",
+    "amount": "double",
+}
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+    "excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FILE_EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "arrow": "arrows", "parquet": "parquet", "excel": "xlsx"}
+
+def arrow_available() -> bool:
+    """是否支持 Arrow/Parquet 导出"""
+    return pa is not None
+
+def export_filename(prefix: str, format: str) -> str:
+    """生成导出文件名"""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{FILE_EXTENSIONS[format]}"
+
+def _format_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def iter_stock_basics_rows(db: Session) -> Iterator[Sequence]:
+    """通过服务端游标逐批读取股票基础数据"""
+    stmt = select(*[getattr(StockBasic, c) for c in STOCK_BASIC_COLUMNS]).order_by(StockBasic.code)
+    yield from _iter_rows(db, stmt)
+
+def iter_stock_trades_rows(db: Session, stock_code: str, start_date: date = None, end_date: date = None) -> Iterator[Sequence]:
+    """通过服务端游标逐批读取一只股票的交易数据，按交易日期升序"""
+    stmt = (
+        select(*[getattr(StockTrade, c) for c in STOCK_TRADE_COLUMNS])
+        .join(StockBasic, StockBasic.id == StockTrade.stock_id)
+        .where(StockBasic.code == stock_code)
+        .order_by(StockTrade.trade_date)
+    )
+    if start_date:
+        stmt = stmt.where(StockTrade.trade_date >= start_date)
+    if end_date:
+        stmt = stmt.where(StockTrade.trade_date <= end_date)
+    yield from _iter_rows(db, stmt)
+
+def iter_bulk_trades_rows(
+    db: Session,
+    stock_codes: List[str],
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> Iterator[Sequence]:
+    """一次查询读取多只股票的交易数据，按股票代码和交易日期排序
+
+    只查询需要的列并直接返回元组，不构造 ORM 对象。
+    """
+    stmt = (
+        select(*[getattr(StockBasic if c == "code" else StockTrade, c) for c in BULK_TRADE_COLUMNS])
+        .join(StockBasic, StockBasic.id == StockTrade.stock_id)
+        .where(StockBasic.code.in_(stock_codes))
+        .order_by(StockBasic.code, StockTrade.trade_date)
+    )
+    if start_date:
+        stmt = stmt.where(StockTrade.trade_date >= start_date)
+    if end_date:
+        stmt = stmt.where(StockTrade.trade_date <= end_date)
+    yield from _iter_rows(db, stmt, batch_size=ARROW_BATCH_SIZE)
+
+def _iter_rows(db: Session, stmt, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Sequence]:
+    result = db.execute(stmt.execution_options(stream_results=True, yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield from partition
+    finally:
+        result.close()
+
+def iter_csv(rows: Iterable[Sequence], columns: List[str]) -> Iterator[bytes]:
+    """将行数据编码为CSV字节块，首块带 UTF-8 BOM 以便 Excel 正确识别中文"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_format_value(v) for v in row])
+        if buffer.tell() >= STREAM_CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+def iter_ndjson(rows: Iterable[Sequence], columns: List[str]) -> Iterator[bytes]:
+    """将行数据编码为每行一个JSON对象的字节块"""
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps({c: _format_value(v) for c, v in zip(columns, row)}, ensure_ascii=False)
+        lines.append(line)
+        size += len(line)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+            size = 0
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """以gzip格式流式压缩字节块"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+class _ChunkSink:
+    """只追加的输出流，已写入的数据可以随时取走
+
+    tell() 返回累计写入的字节数，Parquet 写入器据此计算行组偏移量。
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def arrow_schema(columns: List[str]):
+    """按列名生成 Arrow schema"""
+    if pa is None:
+        raise RuntimeError("未安装 pyarrow，无法导出 Arrow/Parquet 格式")
+    return pa.schema([(column, pa.type_for_alias(ARROW_COLUMN_TYPES[column])) for column in columns])
+
+def rows_to_record_batch(rows: List[Sequence], schema):
+    """将一批行数据按列转换为 Arrow 记录批次"""
+    columns = list(zip(*rows)) if rows else [[] for _ in schema]
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+def _iter_record_batches(rows: Iterable[Sequence], schema) -> Iterator:
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, ARROW_BATCH_SIZE))
+        if not batch:
+            return
+        yield rows_to_record_batch(batch, schema)
+
+def iter_arrow_stream(rows: Iterable[Sequence], columns: List[str]) -> Iterator[bytes]:
+    """将行数据编码为 Arrow IPC 流，每个记录批次输出一块"""
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    with pa_ipc.new_stream(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for batch in _iter_record_batches(rows, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+def iter_parquet(rows: Iterable[Sequence], columns: List[str], compression: str = "zstd") -> Iterator[bytes]:
+    """将行数据编码为 Parquet 文件，每个行组写完后输出一块，文件尾在最后输出"""
+    schema = arrow_schema(columns)
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema, compression=compression) as writer:
+        for batch in _iter_record_batches(rows, schema):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+def rows_to_parquet(rows: Iterable[Sequence], columns: List[str], compression: str = "zstd") -> bytes:
+    """将行数据写入内存中的 Parquet 文件"""
+    return b"".join(iter_parquet(rows, columns, compression))
+
+def encode_rows(rows: Iterable[Sequence], columns: List[str], format: str) -> Iterator[bytes]:
+    """按格式将行数据编码为字节块"""
+    if format == "csv":
+        return iter_csv(rows, columns)
+    if format == "ndjson":
+        return iter_ndjson(rows, columns)
+    if format == "arrow":
+        return iter_arrow_stream(rows, columns)
+    if format == "parquet":
+        return iter_parquet(rows, columns)
+    raise ValueError(f"不支持的流式导出格式：{format}")
+
+def rows_to_excel(rows: Iterable[Sequence], columns: List[str]) -> bytes:
+    """将行数据写入内存中的Excel文件
+
+    xlsx 格式需要完整写出后才能读取，因此无法流式输出，适合数据量较小的导出。
+    """
+    buffer = io.BytesIO()
+    df = pd.DataFrame([[_format_value(v) for v in row] for row in rows], columns=columns)
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+def export_analysis_results(results: Dict) -> bytes:
+    """导出分析结果为Excel格式，每个分析结果写入不同的sheet"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
         for sheet_name, data in results.items():
             if isinstance(data, pd.DataFrame):
-                data.to_excel(writer, sheet_name=sheet_name, index=False)
+                df = data
+            elif isinstance(data, dict) and data and not isinstance(next(iter(data.values())), list):
+                # 标量结果（如价格变化）写成一行
+                df = pd.DataFrame([data])
             else:
-                pd.DataFrame(data).to_excel(writer, sheet_name=sheet_name, index=False)
-    
-    return filename 
\ No newline at end of file
+                df = pd.DataFrame(data)
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,264 @@
+import json
+import logging
+import math
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.indicator import StockIndicatorState
+from app.models.stock import StockBasic, StockTrade
+
+logger = logging.getLogger(__name__)
+
+# 与 /analysis/indicators 默认参数一致
+MA_PERIODS = (5, 10, 20)
+MACD_PERIODS = (12, 26, 9)
+RSI_PERIOD = 14
+BOLLINGER_PERIOD = 20
+BOLLINGER_STD_DEV = 2
+VOLUME_MA_PERIOD = 5
+
+# 需要保留的收盘价窗口长度
+CLOSE_WINDOW = max(max(MA_PERIODS), BOLLINGER_PERIOD)
+
+LATEST_COLUMNS = [
+    "close_price", "ma5", "ma10", "ma20", "macd_line", "signal_line", "macd_hist",
+    "rsi", "bb_middle", "bb_upper", "bb_lower", "volume_ma"
+]
+
+def _alpha(span: int) -> float:
+    return 2.0 / (span + 1)
+
+def _ema_step(previous: Optional[float], value: float, span: int) -> float:
+    """按 pandas ewm(adjust=False) 的方式推进一步EMA"""
+    if previous is None:
+        return value
+    alpha = _alpha(span)
+    old_weight = 1 - alpha
+    return (old_weight * previous + alpha * value) / (old_weight + alpha)
+
+def _window_mean(window, period: int) -> Optional[float]:
+    if len(window) < period:
+        return None
+    return float(np.mean(window[-period:]))
+
+def initial_state() -> Dict:
+    """空的增量计算状态"""
+    return {
+        "count": 0,
+        "prev_close": None,
+        "fast_ema": None,
+        "slow_ema": None,
+        "signal_ema": None,
+        "closes": [],
+        "volumes": [],
+        "gains": [],
+        "losses": []
+    }
+
+def advance_state(state: Dict, close: float, volume: float) -> Dict:
+    """用一根新的日线推进状态，原状态不会被修改
+
+    收盘价缺失的交易日不参与计算。
+    """
+    if close is None or (isinstance(close, float) and math.isnan(close)):
+        return state
+
+    fast_period, slow_period, signal_period = MACD_PERIODS
+    fast_ema = _ema_step(state["fast_ema"], close, fast_period)
+    slow_ema = _ema_step(state["slow_ema"], close, slow_period)
+    signal_ema = _ema_step(state["signal_ema"], fast_ema - slow_ema, signal_period)
+
+    # 与 calculate_rsi 一致，第一根日线的涨跌记为0
+    delta = close - state["prev_close"] if state["prev_close"] is not None else 0.0
+    volume = float(volume) if volume is not None else float("nan")
+
+    return {
+        "count": state["count"] + 1,
+        "prev_close": close,
+        "fast_ema": fast_ema,
+        "slow_ema": slow_ema,
+        "signal_ema": signal_ema,
+        "closes": (state["closes"] + [close])[-CLOSE_WINDOW:],
+        "volumes": (state["volumes"] + [volume])[-VOLUME_MA_PERIOD:],
+        "gains": (state["gains"] + [max(delta, 0.0)])[-RSI_PERIOD:],
+        "losses": (state["losses"] + [max(-delta, 0.0)])[-RSI_PERIOD:]
+    }
+
+def latest_values(state: Dict) -> Dict[str, Optional[float]]:
+    """由状态得到最新一个交易日的指标值"""
+    if state["count"] == 0:
+        return {column: None for column in LATEST_COLUMNS}
+
+    closes = state["closes"]
+    macd_line = state["fast_ema"] - state["slow_ema"]
+
+    rsi = None
+    if len(state["gains"]) >= RSI_PERIOD:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = np.float64(np.mean(state["gains"])) / np.float64(np.mean(state["losses"]))
+            value = 100 - (100 / (1 + rs))
+        rsi = None if np.isnan(value) else float(value)
+
+    bb_middle = _window_mean(closes, BOLLINGER_PERIOD)
+    bb_upper = bb_lower = None
+    if bb_middle is not None:
+        std = float(np.std(closes[-BOLLINGER_PERIOD:], ddof=1))
+        bb_upper = bb_middle + std * BOLLINGER_STD_DEV
+        bb_lower = bb_middle - std * BOLLINGER_STD_DEV
+
+    volume_ma = _window_mean(state["volumes"], VOLUME_MA_PERIOD)
+    if volume_ma is not None and math.isnan(volume_ma):
+        volume_ma = None
+
+    ma_fast, ma_mid, ma_slow = MA_PERIODS
+    return {
+        "close_price": state["prev_close"],
+        "ma5": _window_mean(closes, ma_fast),
+        "ma10": _window_mean(closes, ma_mid),
+        "ma20": _window_mean(closes, ma_slow),
+        "macd_line": macd_line,
+        "signal_line": state["signal_ema"],
+        "macd_hist": macd_line - state["signal_ema"],
+        "rsi": rsi,
+        "bb_middle": bb_middle,
+        "bb_upper": bb_upper,
+        "bb_lower": bb_lower,
+        "volume_ma": volume_ma
+    }
+
+def build_state(bars: Iterable[Tuple[float, float]]) -> Dict:
+    """由完整历史 (close, volume) 序列构造状态"""
+    state = initial_state()
+    for close, volume in bars:
+        state = advance_state(state, close, volume)
+    return state
+
+def _save_state(db: Session, record: Optional[StockIndicatorState], stock_id: int, trade_date, state: Dict) -> None:
+    if record is None:
+        record = StockIndicatorState(stock_id=stock_id)
+        db.add(record)
+    record.trade_date = trade_date
+    record.bar_count = state["count"]
+    record.state = json.dumps(state)
+    for column, value in latest_values(state).items():
+        setattr(record, column, value)
+
+def rebuild_indicator_state(db: Session, stock_id: int) -> None:
+    """从数据库中的完整历史重建一只股票的指标状态"""
+    rows = db.execute(
+        select(StockTrade.trade_date, StockTrade.close_price, StockTrade.volume)
+        .where(StockTrade.stock_id == stock_id)
+        .order_by(StockTrade.trade_date)
+    ).all()
+    record = db.query(StockIndicatorState).filter(StockIndicatorState.stock_id == stock_id).first()
+    if not rows:
+        if record is not None:
+            db.delete(record)
+        return
+    state = build_state((close, volume) for _, close, volume in rows)
+    _save_state(db, record, stock_id, rows[-1][0], state)
+
+def _same_value(a, b) -> bool:
+    a_missing = a is None or (isinstance(a, float) and math.isnan(a))
+    b_missing = b is None or (isinstance(b, float) and math.isnan(b))
+    if a_missing or b_missing:
+        return a_missing and b_missing
+    return math.isclose(float(a), float(b), rel_tol=1e-9, abs_tol=1e-12)
+
+def overlap_differs(db: Session, stock_id: int, df: pd.DataFrame) -> bool:
+    """判断新数据中不晚于已保存状态日期的日线，其收盘价或成交量是否与数据库中的不同
+
+    需要在写入新数据之前调用。全量刷新（如 days=30）每次都会覆盖最近的历史日线，
+    只有这些日线确实变化（例如复权价格调整）时才需要从完整历史重建状态。
+    没有状态时返回 True。
+    """
+    if df.empty:
+        return False
+    state_date = db.execute(
+        select(StockIndicatorState.trade_date).where(StockIndicatorState.stock_id == stock_id)
+    ).scalar_one_or_none()
+    if state_date is None:
+        return True
+
+    trade_dates = pd.to_datetime(df["trade_date"]).dt.date
+    in_overlap = (trade_dates <= state_date).to_numpy()
+    if not in_overlap.any():
+        return False
+    overlap, overlap_dates = df[in_overlap], trade_dates[in_overlap]
+    stored = {
+        trade_date: (close, volume)
+        for trade_date, close, volume in db.execute(
+            select(StockTrade.trade_date, StockTrade.close_price, StockTrade.volume)
+            .where(StockTrade.stock_id == stock_id)
+            .where(StockTrade.trade_date.between(overlap_dates.min(), state_date))
+        ).all()
+    }
+    for trade_date, close, volume in zip(overlap_dates.tolist(), overlap["close_price"].tolist(), overlap["volume"].tolist()):
+        if trade_date not in stored:
+            return True
+        stored_close, stored_volume = stored[trade_date]
+        if not _same_value(close, stored_close) or not _same_value(volume, stored_volume):
+            return True
+    return False
+
+def update_indicator_state(db: Session, stock_id: int, df: pd.DataFrame, overlap_changed: Optional[bool] = None) -> str:
+    """在写入一只股票的新日线后更新其指标状态
+
+    新数据中晚于已保存状态日期的日线逐根推进状态，只需 O(新增日线数)。
+    没有状态，或新数据覆盖的历史日线发生了变化时，从完整历史重建。
+
+    Args:
+        overlap_changed: 写入前由 overlap_differs 得到的结果；为 None 时无法判断，
+            只要新数据覆盖了历史日线就重建
+
+    Returns:
+        str: "advanced"、"rebuilt" 或 "unchanged"
+    """
+    if df.empty:
+        return "unchanged"
+
+    bars = df.sort_values("trade_date")
+    trade_dates = pd.to_datetime(bars["trade_date"]).dt.date
+    record = db.query(StockIndicatorState).filter(StockIndicatorState.stock_id == stock_id).first()
+
+    if record is None or (overlap_changed is not False and trade_dates.iloc[0] <= record.trade_date):
+        db.flush()
+        rebuild_indicator_state(db, stock_id)
+        return "rebuilt"
+
+    # 覆盖的历史日线未变化，只推进之后的日线
+    new_bars = (trade_dates > record.trade_date).to_numpy()
+    if not new_bars.any():
+        return "unchanged"
+    state = json.loads(record.state)
+    for close, volume in zip(bars["close_price"][new_bars].tolist(), bars["volume"][new_bars].tolist()):
+        state = advance_state(state, close, volume)
+    _save_state(db, record, stock_id, trade_dates.iloc[-1], state)
+    return "advanced"
+
+def rebuild_indicator_states(db: Session, stock_ids: Optional[Iterable[int]] = None) -> int:
+    """从完整历史重建指定股票（默认全部有交易数据的股票）的指标状态，返回处理的股票数"""
+    if stock_ids is None:
+        stock_ids = db.execute(select(StockTrade.stock_id).distinct()).scalars().all()
+    count = 0
+    for stock_id in stock_ids:
+        rebuild_indicator_state(db, stock_id)
+        count += 1
+    return count
+
+def get_latest_indicators(db: Session, code: str) -> Optional[Dict]:
+    """按股票代码查询最新指标值"""
+    row = db.execute(
+        select(StockIndicatorState)
+        .join(StockBasic, StockBasic.id == StockIndicatorState.stock_id)
+        .where(StockBasic.code == code)
+    ).scalar_one_or_none()
+    if row is None:
+        return None
+
+    result = {"code": code, "trade_date": row.trade_date.strftime('%Y-%m-%d'), "bar_count": row.bar_count}
+    for column in LATEST_COLUMNS:
+        result[column] = getattr(row, column)
+    return result
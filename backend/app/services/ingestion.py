@@ -0,0 +1,232 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import akshare as ak
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# akshare 历史行情列名与数据库字段的对应关系
+TRADE_COLUMN_MAPPING = {
+    "日期": "trade_date",
+    "开盘": "open_price",
+    "最高": "high_price",
+    "最低": "low_price",
+    "收盘": "close_price",
+    "成交量": "volume",
+    "成交额": "amount"
+}
+
+TRADE_COLUMNS = ["trade_date", "open_price", "high_price", "low_price", "close_price", "volume", "amount"]
+
+class TradeDataProvider:
+    """日线行情数据源
+
+    子类实现 fetch_daily，返回列名为 TRADE_COLUMNS 的 DataFrame，
+    trade_date 列为 datetime 类型。fetch_daily 会在多个线程中被并发调用。
+    """
+
+    name = "base"
+
+    def fetch_daily(self, code: str, start_date: date, end_date: date) -> pd.DataFrame:
+        raise NotImplementedError
+
+class AkshareTradeProvider(TradeDataProvider):
+    """基于 akshare 东方财富接口的日线行情数据源"""
+
+    name = "akshare"
+
+    def __init__(self, adjust: str = "qfq"):
+        self.adjust = adjust
+
+    def fetch_daily(self, code: str, start_date: date, end_date: date) -> pd.DataFrame:
+        df = ak.stock_zh_a_hist(
+            symbol=code,
+            period="daily",
+            start_date=start_date.strftime("%Y%m%d"),
+            end_date=end_date.strftime("%Y%m%d"),
+            adjust=self.adjust
+        )
+        if df.empty:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+
+        df = df.rename(columns=TRADE_COLUMN_MAPPING)
+        df["trade_date"] = pd.to_datetime(df["trade_date"])
+        return df[TRADE_COLUMNS]
+
+class TokenBucket:
+    """令牌桶限流器
+
+    以 rate 个/秒的速度补充令牌，最多累积 capacity 个。rate 小于等于0时不限流。
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """获取一个令牌，令牌不足时阻塞等待"""
+        if self.rate <= 0:
+            return
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+@dataclass
+class PipelineStats:
+    """数据采集流水线的运行统计"""
+    total: int = 0
+    fetched: int = 0
+    empty: int = 0
+    written_rows: int = 0
+    fetch_errors: int = 0
+    write_errors: int = 0
+    elapsed: float = 0.0
+    failed_codes: List[str] = field(default_factory=list)
+
+    @property
+    def processed(self) -> int:
+        return self.fetched + self.fetch_errors
+
+    def as_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "processed": self.processed,
+            "fetched": self.fetched,
+            "empty": self.empty,
+            "written_rows": self.written_rows,
+            "fetch_errors": self.fetch_errors,
+            "write_errors": self.write_errors,
+            "elapsed": round(self.elapsed, 3),
+            "failed_codes": self.failed_codes
+        }
+
+# 写入回调：参数为 (stock_id, stock_code, DataFrame)，返回写入的记录数
+TradeWriter = Callable[[int, str, pd.DataFrame], int]
+
+# 进度回调：每处理完一只股票调用一次
+ProgressCallback = Callable[[PipelineStats], None]
+
+# 采集任务：(stock_id, stock_code, start_date, end_date)
+FetchJob = Tuple[int, str, date, date]
+
+# 采集线程向已满队列写入时，每隔多少秒检查一次是否已取消
+QUEUE_PUT_TIMEOUT = 0.1
+
+def _write_result(stats: PipelineStats, writer: TradeWriter, stock_id: int, code: str, df, error) -> None:
+    """处理单只股票的采集结果并更新统计"""
+    if error is not None:
+        stats.fetch_errors += 1
+        stats.failed_codes.append(code)
+        logger.error(f"获取股票 {code} 交易数据失败：{str(error)}")
+        return
+
+    stats.fetched += 1
+    if df is None or df.empty:
+        stats.empty += 1
+        logger.warning(f"股票 {code} 没有交易数据")
+        return
+
+    try:
+        stats.written_rows += writer(stock_id, code, df)
+        logger.debug(f"股票 {code} 的交易数据写入成功")
+    except Exception as e:
+        stats.write_errors += 1
+        stats.failed_codes.append(code)
+        logger.error(f"写入股票 {code} 交易数据时出错：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
+
+def run_trade_pipeline(
+    jobs: Sequence[FetchJob],
+    provider: TradeDataProvider,
+    writer: TradeWriter,
+    max_workers: int = 8,
+    rate_limit: float = 0,
+    queue_size: int = 64,
+    progress_callback: Optional[ProgressCallback] = None
+) -> PipelineStats:
+    """并发采集日线行情并交由单一写入者落库
+
+    采集在有界线程池中进行，每次请求前从令牌桶获取令牌；采集结果通过有界队列
+    交给调用线程，由调用线程串行执行 writer，从而使网络等待与数据库写入重叠。
+    writer 只在调用线程中执行，可以安全地使用调用方的数据库会话。
+
+    Args:
+        jobs: 采集任务列表
+        provider: 行情数据源
+        writer: 写入回调
+        max_workers: 采集线程数
+        rate_limit: 每秒最多请求次数，0表示不限流
+        queue_size: 待写入队列长度，队列满时采集线程会等待
+        progress_callback: 进度回调，在调用线程中执行
+
+    Returns:
+        PipelineStats: 运行统计
+    """
+    stats = PipelineStats(total=len(jobs))
+    if not jobs:
+        return stats
+
+    started = time.perf_counter()
+    bucket = TokenBucket(rate_limit)
+    results: "queue.Queue" = queue.Queue(maxsize=max(queue_size, 1))
+    # 调用线程中的写入或进度回调出错时通知采集线程退出，否则采集线程会一直阻塞在已满的队列上
+    cancelled = threading.Event()
+
+    def put(item) -> None:
+        while not cancelled.is_set():
+            try:
+                results.put(item, timeout=QUEUE_PUT_TIMEOUT)
+                return
+            except queue.Full:
+                continue
+
+    def fetch(job: FetchJob) -> None:
+        if cancelled.is_set():
+            return
+        stock_id, code, start_date, end_date = job
+        try:
+            bucket.acquire()
+            df = provider.fetch_daily(code, start_date, end_date)
+            put((stock_id, code, df, None))
+        except Exception as e:
+            put((stock_id, code, None, e))
+
+    executor = ThreadPoolExecutor(max_workers=max(max_workers, 1), thread_name_prefix="trade-fetch")
+    try:
+        for job in jobs:
+            executor.submit(fetch, job)
+
+        for _ in range(len(jobs)):
+            stock_id, code, df, error = results.get()
+            _write_result(stats, writer, stock_id, code, df, error)
+            stats.elapsed = time.perf_counter() - started
+            if progress_callback:
+                progress_callback(stats)
+    finally:
+        cancelled.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    stats.elapsed = time.perf_counter() - started
+    logger.info(
+        f"交易数据采集完成：共{stats.total}只股票，成功{stats.fetched}只，"
+        f"失败{stats.fetch_errors + stats.write_errors}只，写入{stats.written_rows}条记录，耗时{stats.elapsed:.2f}秒"
+    )
+    return stats
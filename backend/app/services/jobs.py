@@ -0,0 +1,71 @@
+import logging
+from typing import Dict
+from celery.result import AsyncResult
+from app.worker import celery
+
+logger = logging.getLogger(__name__)
+
+def _chunk_status(index: int, task_id: str, size: int) -> Dict:
+    """获取单个分批任务的状态"""
+    result = AsyncResult(task_id, app=celery)
+    info = result.info if isinstance(result.info, dict) else {}
+    status = {
+        "chunk_index": index,
+        "task_id": task_id,
+        "state": result.state,
+        "total": size,
+        "processed": info.get("processed", 0),
+        "written_rows": info.get("written_rows", 0),
+        "errors": info.get("errors", 0),
+        "failed_codes": info.get("failed_codes", []),
+        "elapsed": info.get("elapsed"),
+        "throughput": info.get("throughput")
+    }
+    if info.get("error"):
+        status["error"] = info["error"]
+    elif result.state == "FAILURE":
+        status["error"] = str(result.info)
+    return status
+
+def get_job_status(job_id: str) -> Dict:
+    """获取后台任务状态
+
+    对全市场交易数据刷新任务，额外汇总各分批任务的进度、吞吐量和失败情况。
+    """
+    result = AsyncResult(job_id, app=celery)
+    status = {"job_id": job_id, "state": result.state}
+    info = result.info
+
+    if result.state == "FAILURE":
+        status["error"] = str(info)
+        return status
+
+    if not isinstance(info, dict) or "chunk_ids" not in info:
+        if result.state == "SUCCESS":
+            status["result"] = result.result
+        return status
+
+    chunks = [
+        _chunk_status(index, task_id, size)
+        for index, (task_id, size) in enumerate(zip(info["chunk_ids"], info["chunk_sizes"]))
+    ]
+    summary = AsyncResult(info["callback_id"], app=celery)
+    finished = summary.state == "SUCCESS" or not chunks
+
+    processed = sum(c["processed"] for c in chunks)
+    elapsed = max((c["elapsed"] or 0 for c in chunks), default=0)
+    status.update({
+        "state": "SUCCESS" if finished else "PROGRESS",
+        "total": info["total"],
+        "processed": processed,
+        "progress": round(processed / info["total"], 4) if info["total"] else 1.0,
+        "written_rows": sum(c["written_rows"] for c in chunks),
+        "errors": sum(c["errors"] for c in chunks),
+        "completed_chunks": sum(1 for c in chunks if c["state"] == "SUCCESS"),
+        "failed_chunks": sum(1 for c in chunks if c.get("error")),
+        "throughput": round(processed / elapsed, 2) if elapsed else None,
+        "chunks": chunks
+    })
+    if finished and chunks:
+        status["result"] = summary.result
+    return status
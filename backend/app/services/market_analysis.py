@@ -0,0 +1,214 @@
+import logging
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.models.stock import StockBasic, StockTrade
+from app.services.analysis import IndicatorContext, calculate_indicators, nan_to_none, resolve_indicators
+
+logger = logging.getLogger(__name__)
+
+# 返回单个结果而不是序列的指标，在拆分结果时逐只股票计算
+PER_SYMBOL_INDICATORS = {"price_change"}
+
+# 计算技术指标所需的最少交易日数
+MIN_INDICATOR_BARS = 30
+
+@dataclass
+class PriceMatrix:
+    """全市场价格矩阵
+
+    行为交易序号，列为股票代码。每只股票的交易数据按时间顺序右对齐，
+    最后一行是各股票最近一个交易日；较短的序列在前面补 NaN，present 标记真实存在的交易。
+    停牌日不占用行，因此每一列与单只股票计算时的序列完全一致，批量结果可与
+    逐只计算的结果逐项对应。high、low 只在加载时请求了才有。
+    """
+    close: pd.DataFrame
+    volume: pd.DataFrame
+    dates: pd.DataFrame
+    present: pd.DataFrame
+    high: Optional[pd.DataFrame] = None
+    low: Optional[pd.DataFrame] = None
+
+    @property
+    def codes(self) -> List[str]:
+        return self.close.columns.tolist()
+
+    def inputs(self) -> Dict[str, pd.DataFrame]:
+        """指标计算的输入列，键与 analysis.INPUT_COLUMNS 一致"""
+        columns = {"close": self.close, "volume": self.volume, "high": self.high, "low": self.low}
+        return {name: frame for name, frame in columns.items() if frame is not None}
+
+def build_price_matrix(trades: pd.DataFrame) -> PriceMatrix:
+    """由长表构造价格矩阵
+
+    Args:
+        trades: 包含 code、trade_date、close_price、volume 列（可选 high_price、low_price 列）的长表
+    """
+    trades = trades.sort_values(["code", "trade_date"], kind="stable")
+    counts = trades.groupby("code", sort=True).size()
+    length = int(counts.max()) if len(counts) else 0
+
+    # 每只股票的交易序号右对齐到矩阵末尾
+    position_in_code = trades.groupby("code", sort=True).cumcount().to_numpy()
+    offset = (length - counts).reindex(trades["code"]).to_numpy()
+    rows = position_in_code + offset
+    cols = pd.Index(counts.index).get_indexer(trades["code"])
+
+    def layout(values: np.ndarray, dtype, fill) -> pd.DataFrame:
+        matrix = np.full((length, len(counts)), fill, dtype=dtype)
+        matrix[rows, cols] = values
+        return pd.DataFrame(matrix, columns=counts.index)
+
+    present = np.zeros((length, len(counts)), dtype=bool)
+    present[rows, cols] = True
+
+    def prices(column: str) -> Optional[pd.DataFrame]:
+        if column not in trades:
+            return None
+        return layout(trades[column].to_numpy(dtype="float64", na_value=np.nan), "float64", np.nan)
+
+    return PriceMatrix(
+        close=prices("close_price"),
+        volume=prices("volume"),
+        dates=layout(pd.to_datetime(trades["trade_date"]).to_numpy(dtype="datetime64[D]"), "datetime64[D]", np.datetime64("NaT")),
+        present=pd.DataFrame(present, columns=counts.index),
+        high=prices("high_price"),
+        low=prices("low_price")
+    )
+
+def load_price_matrix(
+    db: Session,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    stock_codes: Optional[List[str]] = None,
+    per_symbol_limit: Optional[int] = None,
+    lookback: int = 0,
+    inputs: Sequence[str] = ("close", "volume")
+) -> PriceMatrix:
+    """一次查询加载全市场（或指定股票）的收盘价和成交量矩阵
+
+    Args:
+        per_symbol_limit: 每只股票只保留日期范围内最近的若干个交易日
+        lookback: 指定 start_date 时，每只股票再多取 start_date 之前最近的 lookback 个交易日作为预热数据
+        inputs: 指标所需的输入列，包含 high、low 时同时加载最高价和最低价
+    """
+    fields = ["trade_date", "close_price", "volume"] + [f"{name}_price" for name in ("high", "low") if name in inputs]
+    base = (
+        select(StockBasic.code, *[getattr(StockTrade, field) for field in fields])
+        .join(StockBasic, StockBasic.id == StockTrade.stock_id)
+    )
+    if end_date:
+        base = base.where(StockTrade.trade_date <= end_date)
+    if stock_codes is not None:
+        base = base.where(StockBasic.code.in_(stock_codes))
+
+    def latest(query, limit: int):
+        # 用窗口函数在同一条查询中截取每只股票最近的交易日
+        ranked = query.add_columns(
+            func.row_number().over(
+                partition_by=StockTrade.stock_id,
+                order_by=StockTrade.trade_date.desc()
+            ).label("row_number")
+        ).subquery()
+        return (
+            select(ranked.c.code, *[ranked.c[field] for field in fields])
+            .where(ranked.c.row_number <= limit)
+        )
+
+    query = base.where(StockTrade.trade_date >= start_date) if start_date else base
+    if per_symbol_limit is not None:
+        query = latest(query, per_symbol_limit)
+    if start_date and lookback:
+        query = query.union_all(latest(base.where(StockTrade.trade_date < start_date), lookback))
+
+    trades = pd.DataFrame(db.execute(query).all(), columns=["code"] + fields)
+    logger.info(f"加载价格矩阵：{trades['code'].nunique()}只股票，{len(trades)}条交易数据")
+    return build_price_matrix(trades)
+
+def returned_rows(matrix: PriceMatrix, start_date: Optional[date] = None, last: Optional[int] = None) -> np.ndarray:
+    """标记每只股票返回区间内的行，预热数据和补齐的空位为 False
+
+    矩阵中 start_date 之前（未指定时为最近 last 个交易日之前）的行是预热数据，只参与计算，不返回。
+    """
+    mask = matrix.present.to_numpy().copy()
+    if start_date:
+        mask &= matrix.dates.to_numpy() >= np.datetime64(start_date, "D")
+    if last is not None:
+        # 从末尾往前计数，每只股票只保留最后 last 行
+        mask &= np.cumsum(mask[::-1], axis=0)[::-1] <= last
+    return mask
+
+def calculate_market_indicators(
+    matrix: PriceMatrix,
+    indicators: Optional[List[str]] = None,
+    start_date: Optional[date] = None,
+    last: Optional[int] = None
+) -> Dict[str, object]:
+    """一次性计算全市场的技术指标，返回与单只股票接口同名的矩阵
+
+    每列一只股票，直接在矩阵上调用 analysis 注册表中的指标函数，所有注册的指标都可以批量计算，
+    结果与逐只计算一致。start_date、last 与 symbol_results 相同，用于确定累计型指标的起点。
+
+    Args:
+        indicators: 需要计算的指标，默认为 analysis.DEFAULT_INDICATORS；price_change 不在此计算
+    """
+    returned = returned_rows(matrix, start_date, last)
+    skip = np.where(returned.any(axis=0), returned.argmax(axis=0), len(returned))
+    context = IndicatorContext(skip=skip, present=matrix.present, **matrix.inputs())
+    return {
+        indicator.name: indicator.func(context, **indicator.params)
+        for indicator in resolve_indicators(indicators)
+        if indicator.name not in PER_SYMBOL_INDICATORS
+    }
+
+def extract_symbol(matrix: PriceMatrix, frame: pd.DataFrame, code: str, mask: Optional[np.ndarray] = None) -> List[Optional[float]]:
+    """取出单只股票的指标序列，去掉补齐的空位（mask 指定时只取 mask 标记的行）并将 NaN 转换为 None"""
+    if mask is None:
+        mask = matrix.present[code].to_numpy()
+    return nan_to_none(frame[code].to_numpy()[mask])
+
+def symbol_results(
+    matrix: PriceMatrix,
+    computed: Dict[str, object],
+    indicators: List[str],
+    start_date: Optional[date] = None,
+    last: Optional[int] = None,
+    lookback: int = 0
+) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+    """将批量计算结果按股票拆分为与 /analysis/indicators 相同结构的结果
+
+    返回区间见 returned_rows。
+
+    Returns:
+        (results, errors)：预热数据不足 lookback 且交易日不足 MIN_INDICATOR_BARS 的股票放入 errors，
+        区间内没有交易数据的股票不在结果中
+    """
+    results = {}
+    errors = {}
+    returned = returned_rows(matrix, start_date, last)
+    for position, code in enumerate(matrix.codes):
+        present = matrix.present[code].to_numpy()
+        dates = matrix.dates[code].to_numpy()
+        mask = returned[:, position]
+        warmup = int(present.sum() - mask.sum())
+        if not mask.any():
+            continue
+        if warmup < lookback and present.sum() < MIN_INDICATOR_BARS:
+            errors[code] = f"股票 {code} 的交易数据不足{MIN_INDICATOR_BARS}天，无法计算技术指标"
+            continue
+
+        result = {"dates": np.datetime_as_string(dates[mask], unit="D").tolist()}
+        for name in indicators:
+            if name in PER_SYMBOL_INDICATORS:
+                closes = matrix.close[code].to_numpy()[present]
+                result[name] = calculate_indicators({"close": closes}, [name])[name]
+            elif isinstance(computed[name], dict):
+                result[name] = {key: extract_symbol(matrix, frame, code, mask) for key, frame in computed[name].items()}
+            else:
+                result[name] = extract_symbol(matrix, computed[name], code, mask)
+        results[code] = result
+    return results, errors
@@ -0,0 +1,406 @@
+import asyncio
+import glob
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence
+import akshare as ak
+import numpy as np
+import orjson
+import pandas as pd
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# akshare 实时行情列名与快照字段的对应关系，缺失的列记为空
+SPOT_COLUMN_MAPPING = {
+    "最新价": "price",
+    "涨跌幅": "change_pct",
+    "涨跌额": "change",
+    "成交量": "volume",
+    "成交额": "amount",
+    "振幅": "amplitude",
+    "最高": "high",
+    "最低": "low",
+    "今开": "open",
+    "昨收": "prev_close",
+    "量比": "volume_ratio",
+    "换手率": "turnover_rate",
+    "市盈率-动态": "pe",
+    "市净率": "pb",
+    "总市值": "total_market_value",
+    "流通市值": "float_market_value"
+}
+
+QUOTE_FIELDS = list(SPOT_COLUMN_MAPPING.values())
+
+class QuoteSnapshot:
+    """某一时刻的全市场实时行情，创建后不再修改
+
+    数值字段按行存放在一个 (股票数, 字段数) 的 float64 数组中，同一只股票的字段在内存中连续，
+    按代码查询时经字典定位行号后一次取出整行。刷新时生成新快照后整体替换引用，读取不需要加锁。
+    """
+
+    def __init__(self, codes: np.ndarray, names: np.ndarray, values: np.ndarray, version: int, updated_at: datetime):
+        self.codes = codes
+        self.names = names
+        self.values = values
+        self.version = version
+        self.updated_at = updated_at
+        self.index: Dict[str, int] = dict(zip(codes.tolist(), range(len(codes))))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, version: int, updated_at: Optional[datetime] = None) -> "QuoteSnapshot":
+        """由 akshare 实时行情 DataFrame 构建快照
+
+        新浪接口的代码带有 sh/sz/bj 前缀，统一取后6位；重复代码保留第一条。
+        """
+        codes = df["代码"].astype(str).str[-6:]
+        keep = ~codes.duplicated().to_numpy()
+        values = np.full((int(keep.sum()), len(QUOTE_FIELDS)), np.nan)
+        for position, (column, field) in enumerate(SPOT_COLUMN_MAPPING.items()):
+            if column in df:
+                values[:, position] = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype="float64")[keep]
+        names = df["名称"].to_numpy(dtype=object)[keep] if "名称" in df else np.full(int(keep.sum()), None, dtype=object)
+        return cls(codes.to_numpy(dtype=object)[keep], names, values, version, updated_at or datetime.now())
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def quote(self, code: str) -> Optional[Dict]:
+        row = self.index.get(code)
+        if row is None:
+            return None
+        return {"code": code, "name": self.names[row], **dict(zip(QUOTE_FIELDS, self.values[row].tolist()))}
+
+    def quotes(self, codes: Iterable[str], fields: Optional[Sequence[str]] = None) -> Dict:
+        """查询多只股票的行情，数值为 NaN 的字段由 orjson 序列化为 null
+
+        Returns:
+            Dict: items 为找到的股票行情，missing 为快照中不存在的代码
+        """
+        rows, found, missing = [], [], []
+        for code in codes:
+            row = self.index.get(code)
+            if row is None:
+                missing.append(code)
+            else:
+                rows.append(row)
+                found.append(code)
+
+        if fields is None:
+            fields = QUOTE_FIELDS
+            matrix = self.values[rows]
+        else:
+            matrix = self.values[np.ix_(rows, [QUOTE_FIELDS.index(field) for field in fields])]
+        names = self.names[rows].tolist()
+        items = [
+            {"code": code, "name": name, **dict(zip(fields, values))}
+            for code, name, values in zip(found, names, matrix.tolist())
+        ]
+        return {"version": self.version, "updated_at": self.updated_at, "items": items, "missing": missing}
+
+def diff_snapshots(old: Optional[QuoteSnapshot], new: QuoteSnapshot) -> Dict:
+    """计算两个快照之间的增量
+
+    changed 只包含值发生变化的字段（新出现的股票包含名称和全部字段），两边都为空的字段视为未变化；
+    removed 为新快照中不再出现的代码。
+    """
+    changed: Dict[str, Dict] = {}
+    if old is None or len(old) == 0:
+        positions = np.full(len(new), -1)
+    else:
+        positions = pd.Index(old.codes).get_indexer(new.codes)
+
+    matched = np.flatnonzero(positions >= 0)
+    old_values = old.values[positions[matched]] if len(matched) else np.empty((0, len(QUOTE_FIELDS)))
+    new_values = new.values[matched]
+    differs = (old_values != new_values) & ~(np.isnan(old_values) & np.isnan(new_values))
+    rows, columns = np.nonzero(differs)
+    if len(rows):
+        codes = new.codes[matched[rows]].tolist()
+        values = new_values[rows, columns].tolist()
+        for code, column, value in zip(codes, columns.tolist(), values):
+            changed.setdefault(code, {})[QUOTE_FIELDS[column]] = value
+
+    for row in np.flatnonzero(positions < 0).tolist():
+        code = new.codes[row]
+        changed[code] = {"name": new.names[row], **dict(zip(QUOTE_FIELDS, new.values[row].tolist()))}
+
+    removed = []
+    if old is not None and len(old):
+        removed = [code for code in old.codes.tolist() if code not in new.index]
+    return {"version": new.version, "updated_at": new.updated_at, "changed": changed, "removed": removed}
+
+def filter_delta(delta: Dict, codes: Optional[set]) -> Dict:
+    """只保留订阅的股票，codes 为 None 表示订阅全部"""
+    if codes is None:
+        return delta
+    changed = delta["changed"]
+    if len(codes) < len(changed):
+        subset = {code: changed[code] for code in codes if code in changed}
+    else:
+        subset = {code: fields for code, fields in changed.items() if code in codes}
+    return {**delta, "changed": subset, "removed": [code for code in delta["removed"] if code in codes]}
+
+class QuoteStore:
+    """保存最新行情快照和最近的增量，并在刷新后通知订阅者
+
+    刷新在后台线程中进行，订阅者是各自事件循环中的 asyncio.Event，通过 call_soon_threadsafe 唤醒。
+    订阅者被唤醒后按自己已发送的版本号读取之后的增量，消费慢或断线重连的订阅者不会丢失数据，
+    落后超过 QUOTE_DELTA_HISTORY 次刷新时改为发送完整快照。
+    """
+
+    def __init__(self, history: int = settings.QUOTE_DELTA_HISTORY):
+        self.snapshot: Optional[QuoteSnapshot] = None
+        self._deltas = deque(maxlen=history)
+        self._subscribers: Dict[asyncio.Event, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version if self.snapshot else 0
+
+    def update(self, df: pd.DataFrame, updated_at: Optional[datetime] = None) -> Optional[Dict]:
+        """用新的实时行情替换快照，行情有变化时返回增量并通知订阅者"""
+        with self._lock:
+            previous = self.snapshot
+            snapshot = QuoteSnapshot.from_frame(df, self.version + 1, updated_at)
+            delta = diff_snapshots(previous, snapshot)
+            if not delta["changed"] and not delta["removed"]:
+                # 行情未变化时只更新时间，不增加版本号
+                snapshot.version = self.version
+                self.snapshot = snapshot
+                return None
+            self.snapshot = snapshot
+            self._deltas.append(delta)
+            subscribers = list(self._subscribers.items())
+
+        for event, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # 事件循环已关闭
+                self._subscribers.pop(event, None)
+        return delta
+
+    def deltas_since(self, version: int) -> Optional[List[Dict]]:
+        """返回版本号大于 version 的增量，所需增量已不在保留范围内时返回 None"""
+        deltas = list(self._deltas)
+        if version == self.version:
+            return []
+        # 版本号大于当前版本说明服务已重启，同样需要完整快照
+        if version > self.version or not deltas or deltas[0]["version"] > version + 1:
+            return None
+        return [delta for delta in deltas if delta["version"] > version]
+
+    def subscribe(self) -> asyncio.Event:
+        """在当前事件循环中注册订阅者，快照更新时 set 返回的事件"""
+        event = asyncio.Event()
+        self._subscribers[event] = asyncio.get_running_loop()
+        return event
+
+    def unsubscribe(self, event: asyncio.Event) -> None:
+        self._subscribers.pop(event, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.snapshot = None
+            self._deltas.clear()
+
+class QuoteSource:
+    """实时行情数据源
+
+    子类实现 fetch_snapshot，返回与 ak.stock_zh_a_spot_em 列名一致的全市场行情 DataFrame。
+    """
+
+    name = "base"
+
+    def fetch_snapshot(self) -> pd.DataFrame:
+        raise NotImplementedError
+
+class AkshareQuoteSource(QuoteSource):
+    """基于 akshare 东方财富接口的实时行情数据源"""
+
+    name = "akshare"
+
+    def fetch_snapshot(self) -> pd.DataFrame:
+        return ak.stock_zh_a_spot_em()
+
+class ReplayQuoteSource(QuoteSource):
+    """按顺序回放录制好的行情快照，用于测试和本地开发
+
+    每次 fetch_snapshot 返回下一个快照，回放完后 loop 为 True 时从头开始，否则一直返回最后一个。
+    """
+
+    name = "replay"
+
+    def __init__(self, frames: Sequence[pd.DataFrame], loop: bool = False):
+        if not frames:
+            raise ValueError("回放数据为空")
+        self.frames = list(frames)
+        self.loop = loop
+        self.position = 0
+
+    @classmethod
+    def from_path(cls, path: str, loop: bool = True) -> "ReplayQuoteSource":
+        """按文件名顺序读取目录下的 CSV 或 Parquet 快照文件"""
+        files = sorted(glob.glob(os.path.join(path, "*.csv")) + glob.glob(os.path.join(path, "*.parquet")))
+        frames = [
+            pd.read_parquet(file) if file.endswith(".parquet") else pd.read_csv(file, dtype={"代码": str})
+            for file in files
+        ]
+        logger.info(f"加载回放行情：{len(frames)}个快照，目录：{path}")
+        return cls(frames, loop=loop)
+
+    def fetch_snapshot(self) -> pd.DataFrame:
+        frame = self.frames[self.position]
+        if self.position + 1 < len(self.frames):
+            self.position += 1
+        elif self.loop:
+            self.position = 0
+        return frame
+
+def default_quote_source() -> QuoteSource:
+    if settings.QUOTE_REPLAY_PATH:
+        return ReplayQuoteSource.from_path(settings.QUOTE_REPLAY_PATH)
+    return AkshareQuoteSource()
+
+class QuoteRefresher:
+    """后台线程定时从数据源获取实时行情并更新 QuoteStore，获取失败时记录错误并在下个周期重试"""
+
+    def __init__(self, store: QuoteStore, source: Optional[QuoteSource] = None, interval: float = settings.QUOTE_REFRESH_INTERVAL):
+        self.store = store
+        self.source = source
+        self.interval = interval
+        self.refreshes = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_refresh_at: Optional[datetime] = None
+        self.last_duration_ms: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def refresh_once(self) -> Optional[Dict]:
+        """获取一次行情并更新快照，返回增量"""
+        if self.source is None:
+            self.source = default_quote_source()
+        started = time.perf_counter()
+        try:
+            df = self.source.fetch_snapshot()
+            if df.empty:
+                raise ValueError("实时行情数据为空")
+            delta = self.store.update(df)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.error(f"刷新实时行情失败：{str(e)}")
+            logger.error("错误详情：", exc_info=True)
+            raise e
+        self.refreshes += 1
+        self.last_refresh_at = datetime.now()
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        changed = len(delta["changed"]) if delta else 0
+        logger.debug(f"实时行情刷新完成：{len(self.store.snapshot)}只股票，{changed}只变化，耗时{self.last_duration_ms:.1f}ms")
+        return delta
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh_once()
+            except Exception:
+                pass
+            self._stop.wait(self.interval)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="quote-refresher", daemon=True)
+        self._thread.start()
+        logger.info(f"实时行情后台刷新已启动，数据源：{(self.source or default_quote_source()).name}，间隔{self.interval}秒")
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> Dict:
+        snapshot = self.store.snapshot
+        return {
+            "running": self.running,
+            "source": self.source.name if self.source else None,
+            "interval": self.interval,
+            "version": self.store.version,
+            "stocks": len(snapshot) if snapshot else 0,
+            "updated_at": snapshot.updated_at if snapshot else None,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_refresh_at": self.last_refresh_at,
+            "last_duration_ms": round(self.last_duration_ms, 3) if self.last_duration_ms is not None else None,
+            "subscribers": self.store.subscriber_count
+        }
+
+def format_event(event: str, data: Dict, event_id: Optional[int] = None) -> bytes:
+    """编码一条 Server-Sent Events 消息"""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + orjson.dumps(data) + b"\n\n"
+
+async def stream_quote_events(
+    store: QuoteStore,
+    codes: Optional[set] = None,
+    last_version: Optional[int] = None,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    heartbeat: float = settings.QUOTE_STREAM_HEARTBEAT
+) -> AsyncIterator[bytes]:
+    """生成推送给一个订阅者的 SSE 消息
+
+    先发送订阅股票的完整快照（snapshot 事件），之后每次刷新只发送变化的字段（delta 事件），
+    消息 id 为快照版本号。客户端带 Last-Event-ID 重连时补发之后的增量，无法补齐时重新发送完整快照。
+    长时间没有变化时发送注释行保持连接。
+    """
+    event = store.subscribe()
+    try:
+        version = last_version
+        while True:
+            pending = store.deltas_since(version) if version is not None else None
+            if pending is None:
+                snapshot = store.snapshot
+                if snapshot is not None:
+                    data = snapshot.quotes(codes if codes is not None else snapshot.codes.tolist())
+                    yield format_event("snapshot", data, snapshot.version)
+                    version = snapshot.version
+            else:
+                for delta in pending:
+                    delta = filter_delta(delta, codes)
+                    if delta["changed"] or delta["removed"]:
+                        yield format_event("delta", delta, delta["version"])
+                    version = delta["version"]
+
+            while True:
+                if is_disconnected is not None and await is_disconnected():
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=heartbeat)
+                    break
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+            event.clear()
+    finally:
+        store.unsubscribe(event)
+
+quote_store = QuoteStore()
+quote_refresher = QuoteRefresher(quote_store)
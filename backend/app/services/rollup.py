@@ -0,0 +1,207 @@
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.models.rollup import StockTradeRollup
+from app.models.stock import StockTrade
+
+logger = logging.getLogger(__name__)
+
+# 支持的聚合周期，day 表示直接读取日线
+PERIODS = ("week", "month", "quarter")
+
+# 重建时每批处理的股票数
+REBUILD_BATCH_SIZE = 200
+
+# 聚合时读取的日线字段
+DAILY_COLUMNS = ["trade_date", "open_price", "high_price", "low_price", "close_price", "volume", "amount"]
+
+def period_starts(trade_dates, period: str) -> np.ndarray:
+    """计算每个交易日所在周期的起始日期：周一、月初或季初"""
+    if period not in PERIODS:
+        raise ValueError(f"不支持的周期：{period}，可选值：{', '.join(PERIODS)}")
+    days = np.asarray(trade_dates, dtype="datetime64[D]")
+    if period == "week":
+        # 1970-01-01 是周四，(天数 + 3) % 7 即为周一为0的星期序号
+        return days - ((days.astype("int64") + 3) % 7).astype("timedelta64[D]")
+    months = days.astype("datetime64[M]")
+    if period == "quarter":
+        months = months - (months.astype("int64") % 3).astype("timedelta64[M]")
+    return months.astype("datetime64[D]")
+
+def _aggregate(columns: Dict[str, np.ndarray], period: str) -> Dict[str, np.ndarray]:
+    """按周期聚合已按 (stock_id, trade_date) 排序的日线数组
+
+    每个周期是连续的一段，用 ufunc.reduceat 按段求极值与求和，避免 groupby 在单只股票
+    少量日线上的固定开销（增量更新时每只股票只有一个季度左右的数据）。
+    """
+    dates = np.asarray(columns["trade_date"], dtype="datetime64[D]")
+    starts = period_starts(dates, period)
+    stock_ids = np.asarray(columns["stock_id"])
+    boundary = (starts[1:] != starts[:-1]) | (stock_ids[1:] != stock_ids[:-1])
+    first = np.concatenate([[0], np.flatnonzero(boundary) + 1]) if len(dates) else np.array([], dtype=int)
+    last = np.concatenate([first[1:], [len(dates)]]) - 1
+
+    def float_column(name: str) -> np.ndarray:
+        # 数据库读出的空值为 None，转换为 NaN
+        values = columns[name]
+        if values.dtype == object:
+            values = np.where(values == None, np.nan, values)  # noqa: E711
+        return values.astype("float64")
+
+    def segment_sum(values: np.ndarray) -> np.ndarray:
+        # 与 sum(min_count=1) 一致，整段为空时结果为空
+        counts = np.add.reduceat(~np.isnan(values), first) if len(first) else np.array([])
+        sums = np.add.reduceat(np.nan_to_num(values), first) if len(first) else np.array([])
+        return np.where(counts > 0, sums, np.nan)
+
+    with np.errstate(invalid="ignore"):
+        return {
+            "stock_id": stock_ids[first],
+            "period_start": starts[first],
+            "trade_date": dates[last],
+            "open_price": float_column("open_price")[first],
+            "high_price": np.fmax.reduceat(float_column("high_price"), first) if len(first) else np.array([]),
+            "low_price": np.fmin.reduceat(float_column("low_price"), first) if len(first) else np.array([]),
+            "close_price": float_column("close_price")[last],
+            "volume": segment_sum(float_column("volume")),
+            "amount": segment_sum(float_column("amount")),
+            "bar_count": last - first + 1
+        }
+
+def resample_bars(trades: pd.DataFrame, period: str) -> pd.DataFrame:
+    """把日线聚合为周期K线
+
+    Args:
+        trades: 包含 DAILY_COLUMNS 的日线，可以包含 stock_id 列以同时聚合多只股票
+    Returns:
+        按 (stock_id, period_start) 排序的K线，开盘价取周期内第一个交易日，收盘价取最后一个交易日，
+        最高、最低价取极值，成交量和成交额求和（全部为空时为空）
+    """
+    if "stock_id" not in trades:
+        trades = trades.assign(stock_id=0)
+    trades = trades.sort_values(["stock_id", "trade_date"], kind="stable")
+    columns = {name: trades[name].to_numpy() for name in ["stock_id"] + DAILY_COLUMNS}
+    columns["trade_date"] = pd.to_datetime(trades["trade_date"]).to_numpy(dtype="datetime64[D]")
+    return pd.DataFrame(_aggregate(columns, period))
+
+def _rollup_records(bars: Dict[str, np.ndarray], period: str) -> List[dict]:
+    """把 _aggregate 的结果转换为写入数据库的记录"""
+    now = datetime.utcnow()
+
+    def nullable(values: np.ndarray) -> List[Optional[float]]:
+        return np.where(np.isnan(values), None, values).tolist()
+
+    volumes = np.where(np.isnan(bars["volume"]), None, np.round(bars["volume"]))
+    records = zip(
+        bars["stock_id"].tolist(),
+        bars["period_start"].astype(date).tolist(),
+        bars["trade_date"].astype(date).tolist(),
+        nullable(bars["open_price"]),
+        nullable(bars["high_price"]),
+        nullable(bars["low_price"]),
+        nullable(bars["close_price"]),
+        [None if volume is None else int(volume) for volume in volumes.tolist()],
+        nullable(bars["amount"]),
+        bars["bar_count"].tolist()
+    )
+    return [
+        {
+            "stock_id": stock_id,
+            "period": period,
+            "period_start": period_start,
+            "trade_date": trade_date,
+            "open_price": open_price,
+            "high_price": high_price,
+            "low_price": low_price,
+            "close_price": close_price,
+            "volume": volume,
+            "amount": amount,
+            "bar_count": bar_count,
+            "created_at": now,
+            "updated_at": now
+        }
+        for stock_id, period_start, trade_date, open_price, high_price, low_price, close_price, volume, amount, bar_count
+        in records
+    ]
+
+def _upsert_statement():
+    """构造按 (stock_id, period, period_start) 冲突时更新K线的插入语句"""
+    stmt = sqlite_insert(StockTradeRollup.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=[StockTradeRollup.stock_id, StockTradeRollup.period, StockTradeRollup.period_start],
+        set_={
+            column: stmt.excluded[column]
+            for column in DAILY_COLUMNS + ["bar_count", "updated_at"]
+        }
+    )
+
+def _load_daily(db: Session, stock_ids: List[int], since: Optional[date] = None) -> Dict[str, np.ndarray]:
+    """读取日线，按 (stock_id, trade_date) 排序后返回各列数组"""
+    query = (
+        select(StockTrade.stock_id, *[getattr(StockTrade, column) for column in DAILY_COLUMNS])
+        .where(StockTrade.stock_id.in_(stock_ids))
+        .order_by(StockTrade.stock_id, StockTrade.trade_date)
+    )
+    if since is not None:
+        query = query.where(StockTrade.trade_date >= since)
+    rows = db.execute(query).all()
+    names = ["stock_id"] + DAILY_COLUMNS
+    if not rows:
+        return {}
+    columns = dict(zip(names, (np.array(values, dtype=object) for values in zip(*rows))))
+    columns["stock_id"] = columns["stock_id"].astype("int64")
+    columns["trade_date"] = columns["trade_date"].astype("datetime64[D]")
+    return columns
+
+def refresh_rollups(db: Session, stock_id: int, since: date) -> int:
+    """重算一只股票 since 所在周期及之后的周期K线
+
+    只读取最早受影响周期（since 所在季度）起的日线，每次增量更新的读取量不超过一个季度加上新增的日线。
+
+    Returns:
+        int: 写入的K线条数
+    """
+    starts = {period: period_starts([since], period)[0] for period in PERIODS}
+    daily = _load_daily(db, [stock_id], since=min(starts.values()).astype(date))
+    if not daily:
+        return 0
+
+    records = []
+    for period in PERIODS:
+        bars = _aggregate(daily, period)
+        keep = bars["period_start"] >= starts[period]
+        records.extend(_rollup_records({name: values[keep] for name, values in bars.items()}, period))
+    if records:
+        db.execute(_upsert_statement(), records)
+    return len(records)
+
+def update_rollups(db: Session, stock_id: int, df: pd.DataFrame) -> int:
+    """写入一只股票的新日线后更新其周期K线"""
+    if df.empty:
+        return 0
+    since = pd.to_datetime(df["trade_date"]).min().date()
+    return refresh_rollups(db, stock_id, since)
+
+def rebuild_rollups(db: Session, stock_ids: Optional[Iterable[int]] = None, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """从日线重建指定股票（默认全部）的周期K线，返回写入的K线条数"""
+    if stock_ids is None:
+        stock_ids = db.execute(select(StockTrade.stock_id).distinct()).scalars().all()
+    stock_ids = list(stock_ids)
+    written = 0
+    for start in range(0, len(stock_ids), batch_size):
+        batch = stock_ids[start:start + batch_size]
+        db.execute(delete(StockTradeRollup).where(StockTradeRollup.stock_id.in_(batch)))
+        daily = _load_daily(db, batch)
+        if not daily:
+            continue
+        for period in PERIODS:
+            records = _rollup_records(_aggregate(daily, period), period)
+            db.execute(StockTradeRollup.__table__.insert(), records)
+            written += len(records)
+        logger.info(f"周期K线重建进度：{min(start + batch_size, len(stock_ids))}/{len(stock_ids)}只股票")
+    return written
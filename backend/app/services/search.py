@@ -0,0 +1,161 @@
+import bisect
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.stock import StockBasic
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # 未安装 pypinyin 时不索引拼音首字母
+    lazy_pinyin = None
+
+logger = logging.getLogger(__name__)
+
+# 匹配类型及其排序优先级，数值越小越靠前
+RANK_CODE_EXACT = 0
+RANK_CODE_PREFIX = 1
+RANK_NAME_PREFIX = 2
+RANK_PINYIN_PREFIX = 3
+RANK_NAME_SUBSTRING = 4
+
+def pinyin_initials(name: str) -> str:
+    """返回名称的拼音首字母，如“平安银行”返回“payh”"""
+    if not lazy_pinyin or not name:
+        return ""
+    return "".join(lazy_pinyin(name, style=Style.FIRST_LETTER)).lower()
+
+class StockSearchIndex:
+    """股票代码、名称和拼音首字母的内存前缀索引
+
+    所有检索键（代码、名称的每个后缀、拼音首字母）放在一个有序数组中，
+    查询时二分定位到第一个不小于查询词的键，再顺序扫描以查询词开头的键，
+    因此名称的任意子串也可以通过后缀的前缀匹配得到。重建时生成新数组后整体替换，
+    查询过程中不需要加锁。
+    """
+
+    def __init__(self):
+        self._keys: List[str] = []
+        self._postings: List[Tuple[int, str]] = []
+        self._stocks: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._stale = True
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> int:
+        return len(self._stocks)
+
+    def build(self, rows: Iterable[Tuple[str, str, Optional[str], Optional[str]]]) -> None:
+        """由 (code, name, industry, market) 记录构建索引"""
+        entries = []
+        stocks = {}
+        for code, name, industry, market in rows:
+            stocks[code] = (name, industry, market)
+            entries.append((code.lower(), RANK_CODE_PREFIX, code))
+            lowered = (name or "").lower()
+            for start in range(len(lowered)):
+                rank = RANK_NAME_PREFIX if start == 0 else RANK_NAME_SUBSTRING
+                entries.append((lowered[start:], rank, code))
+            initials = pinyin_initials(name)
+            if initials:
+                entries.append((initials, RANK_PINYIN_PREFIX, code))
+
+        entries.sort()
+        keys = [key for key, _, _ in entries]
+        postings = [(rank, code) for _, rank, code in entries]
+        # 整体替换引用，正在进行的查询仍使用旧数组
+        self._keys, self._postings, self._stocks = keys, postings, stocks
+        logger.info(f"股票搜索索引构建完成：{len(stocks)}只股票，{len(keys)}个检索键")
+
+    def search(
+        self,
+        term: str,
+        industry: Optional[str] = None,
+        market: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> List[Tuple[str, int]]:
+        """按匹配程度排序返回 (code, rank) 列表"""
+        term = (term or "").strip().lower()
+        if not term:
+            return []
+
+        keys, postings, stocks = self._keys, self._postings, self._stocks
+        best: Dict[str, int] = {}
+        position = bisect.bisect_left(keys, term)
+        while position < len(keys) and keys[position].startswith(term):
+            rank, code = postings[position]
+            if rank == RANK_CODE_PREFIX and keys[position] == term:
+                rank = RANK_CODE_EXACT
+            if rank < best.get(code, RANK_NAME_SUBSTRING + 1):
+                best[code] = rank
+            position += 1
+
+        matches = [
+            (code, rank) for code, rank in best.items()
+            if (not industry or stocks[code][1] == industry) and (not market or stocks[code][2] == market)
+        ]
+        matches.sort(key=lambda item: (item[1], item[0]))
+        return matches[:limit] if limit is not None else matches
+
+    def describe(self, code: str) -> Dict:
+        name, industry, market = self._stocks[code]
+        return {"code": code, "name": name, "industry": industry, "market": market}
+
+    def invalidate(self) -> None:
+        """标记索引需要重建，下次查询时从数据库重新加载"""
+        self._stale = True
+
+    def clear(self) -> None:
+        """清空索引，回到冷启动状态，下次查询时必须等待加载完成，不会使用旧索引"""
+        with self._lock:
+            self._keys, self._postings, self._stocks = [], [], {}
+            self._signature = None
+            self._checked_at = 0.0
+            self._stale = True
+
+    def ensure_fresh(self, db: Session) -> None:
+        """必要时从数据库重建索引
+
+        本进程内更新股票基础数据后会立即重建；其他进程（如 Celery worker）的更新
+        通过定期比较记录数和最大更新时间发现。
+
+        async 接口通过 run_sync 在事件循环线程上调用本方法，查询期间事件循环会切换到其他请求，
+        因此查询时不能持有会阻塞等待的锁。同一时间只有一个请求刷新，其余请求继续使用旧索引；
+        冷启动时还没有可用的索引，各请求自行加载。
+        """
+        now = time.monotonic()
+        # 刷新开始时就清除了 _stale，首次加载完成前不能据此跳过
+        loaded = self._signature is not None
+        if loaded and not self._stale and now - self._checked_at < settings.SEARCH_INDEX_REFRESH_INTERVAL:
+            return
+
+        if not self._lock.acquire(blocking=False):
+            if self._signature is not None:
+                return
+            self._refresh(db, now)
+            return
+        try:
+            self._refresh(db, now)
+        finally:
+            self._lock.release()
+
+    def _refresh(self, db: Session, now: float) -> None:
+        # 先清除标记，刷新期间再次失效时保留标记，下次查询重新加载
+        stale, self._stale = self._stale, False
+        try:
+            signature = tuple(db.execute(select(func.count(StockBasic.id), func.max(StockBasic.updated_at))).one())
+            if stale or signature != self._signature:
+                rows = db.execute(select(StockBasic.code, StockBasic.name, StockBasic.industry, StockBasic.market)).all()
+                self.build(rows)
+                self._signature = signature
+        except Exception:
+            self._stale = True
+            raise
+        self._checked_at = now
+
+stock_search_index = StockSearchIndex()
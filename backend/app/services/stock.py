@@ -1,14 +1,133 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import base64
+import json
 import logging
+import time
 import akshare as ak
+import numpy as np
 import pandas as pd
+from typing import Dict, List, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.core.config import settings
+from app.models.rollup import StockTradeRollup
 from app.models.stock import StockBasic, StockTrade
 from app.schemas.stock import StockBasicCreate, StockTradeCreate
+from app.services.cache import indicator_cache
+from app.services.columnar import get_columnar_store
+from app.services.indicator_state import overlap_differs, update_indicator_state
+from app.services.rollup import update_rollups
+from app.services.quotes import quote_store
+from app.services.search import stock_search_index
+from app.services.ingestion import (
+    AkshareTradeProvider, ProgressCallback, TradeDataProvider, TRADE_COLUMNS, run_trade_pipeline
+)
 
 logger = logging.getLogger(__name__)
 
+# 股票代码前缀与市场类型的对应关系，按顺序匹配，未匹配的归为中小板
+MARKET_PREFIXES = [
+    (('600', '601', '603', '605'), '主板'),
+    (('300',), '创业板'),
+    (('688',), '科创板'),
+    (('8',), '北交所'),
+]
+DEFAULT_MARKET = '中小板'
+
+# 批量写入时每批的记录数
+BULK_UPSERT_BATCH_SIZE = 500
+
+# 判断股票基础数据是否变化时比较的字段
+STOCK_BASIC_COMPARE_COLUMNS = ['name', 'industry', 'market']
+
+def classify_market(codes: pd.Series) -> pd.Series:
+    """根据股票代码前缀批量判断市场类型"""
+    codes = codes.astype(str)
+    conditions = [codes.str.startswith(prefixes) for prefixes, _ in MARKET_PREFIXES]
+    choices = [market for _, market in MARKET_PREFIXES]
+    return pd.Series(
+        np.select(conditions, choices, default=DEFAULT_MARKET),
+        index=codes.index
+    )
+
+def _normalize_nullable(series: pd.Series) -> pd.Series:
+    """将NaN统一转换为None，便于比较和写入数据库"""
+    return series.astype(object).where(series.notna(), None)
+
+def bulk_upsert_stock_basics(db: Session, stock_df: pd.DataFrame, batch_size: int = BULK_UPSERT_BATCH_SIZE) -> Dict[str, int]:
+    """批量写入股票基础数据
+    
+    一次查询取出已有记录与传入数据做差异比较，跳过未变化的记录，
+    其余记录按批次通过 INSERT ... ON CONFLICT(code) DO UPDATE 写入。
+    
+    Args:
+        db (Session): 数据库会话
+        stock_df (pd.DataFrame): 包含 code、name、industry、market、update_time 列的数据
+        batch_size (int, optional): 每批写入的记录数
+    
+    Returns:
+        Dict[str, int]: 新增、更新和未变化的记录数
+    """
+    columns = ['code'] + STOCK_BASIC_COMPARE_COLUMNS + ['update_time']
+    incoming = stock_df[columns].drop_duplicates(subset='code', keep='last').copy()
+    incoming['code'] = incoming['code'].astype(str)
+    for column in STOCK_BASIC_COMPARE_COLUMNS:
+        incoming[column] = _normalize_nullable(incoming[column])
+    
+    # 一次性读取已有记录
+    existing_rows = db.execute(
+        select(StockBasic.code, *[getattr(StockBasic, c) for c in STOCK_BASIC_COMPARE_COLUMNS])
+    ).all()
+    existing = pd.DataFrame(existing_rows, columns=['code'] + STOCK_BASIC_COMPARE_COLUMNS)
+    for column in STOCK_BASIC_COMPARE_COLUMNS:
+        existing[column] = _normalize_nullable(existing[column])
+    
+    merged = incoming.merge(existing, on='code', how='left', suffixes=('', '_old'), indicator=True)
+    is_new = (merged['_merge'] == 'left_only').to_numpy()
+    
+    changed = np.zeros(len(merged), dtype=bool)
+    for column in STOCK_BASIC_COMPARE_COLUMNS:
+        new_values = merged[column]
+        old_values = merged[f"{column}_old"]
+        both_null = new_values.isna() & old_values.isna()
+        changed |= ~((new_values == old_values) | both_null).to_numpy()
+    
+    is_updated = ~is_new & changed
+    is_unchanged = ~is_new & ~changed
+    
+    pending = merged.loc[is_new | is_updated, columns]
+    records = pending.to_dict(orient='records')
+    logger.info(f"股票基础数据差异比较完成：新增{int(is_new.sum())}条，更新{int(is_updated.sum())}条，未变化{int(is_unchanged.sum())}条")
+    
+    if records:
+        now = datetime.utcnow()
+        for record in records:
+            record['created_at'] = now
+            record['updated_at'] = now
+        
+        stmt = sqlite_insert(StockBasic.__table__)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[StockBasic.code],
+            set_={
+                'name': stmt.excluded.name,
+                'industry': stmt.excluded.industry,
+                'market': stmt.excluded.market,
+                'update_time': stmt.excluded.update_time,
+                'updated_at': stmt.excluded.updated_at,
+            }
+        )
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            db.execute(stmt, batch)
+            logger.debug(f"已写入第{start + 1}-{start + len(batch)}条股票基础数据")
+    
+    return {
+        "inserted_count": int(is_new.sum()),
+        "updated_count": int(is_updated.sum()),
+        "unchanged_count": int(is_unchanged.sum())
+    }
+
 def update_stock_basics(db: Session):
     """更新股票基础数据"""
     try:
@@ -34,6 +153,12 @@ def update_stock_basics(db: Session):
             raise ValueError("获取股票列表失败：数据为空")
             
         logger.info(f"成功获取股票列表，共{len(stock_df)}条记录")
+        
+        # 股票列表本身就是一份全市场实时行情，同时更新内存中的行情快照
+        try:
+            quote_store.update(stock_df)
+        except Exception as e:
+            logger.warning(f"更新实时行情快照失败：{str(e)}")
         logger.debug(f"股票列表数据示例：\n{stock_df.head()}")
         logger.debug(f"股票列表列名：{stock_df.columns.tolist()}")
         
@@ -79,13 +204,7 @@ def update_stock_basics(db: Session):
         
         # 添加市场信息
         logger.info("正在添加市场信息...")
-        merged_df['market'] = merged_df['code'].apply(
-            lambda x: '主板' if x.startswith(('600', '601', '603', '605')) 
-            else '创业板' if x.startswith('300')
-            else '科创板' if x.startswith('688')
-            else '北交所' if x.startswith('8')
-            else '中小板'
-        )
+        merged_df['market'] = classify_market(merged_df['code'])
         logger.debug(f"市场信息分布：\n{merged_df['market'].value_counts()}")
         
         # 添加更新时间
@@ -93,41 +212,13 @@ def update_stock_basics(db: Session):
         merged_df['update_time'] = datetime.now()
         
         # 更新数据库
-        logger.info("开始更新数据库...")
-        updated_count = 0
-        error_count = 0
-        
-        for index, row in merged_df.iterrows():
-            try:
-                stock_data = {
-                    'code': row['code'],
-                    'name': row['name'],
-                    'industry': row['industry'],
-                    'market': row['market'],
-                    'update_time': row['update_time']
-                }
-                
-                logger.debug(f"正在处理第{index + 1}条数据：{stock_data}")
-                
-                db_stock = db.query(StockBasic).filter(StockBasic.code == stock_data['code']).first()
-                if db_stock:
-                    logger.debug(f"更新已存在的股票数据：{stock_data['code']}")
-                    for key, value in stock_data.items():
-                        setattr(db_stock, key, value)
-                    updated_count += 1
-                else:
-                    logger.debug(f"添加新的股票数据：{stock_data['code']}")
-                    db_stock = StockBasic(**stock_data)
-                    db.add(db_stock)
-                    updated_count += 1
-                    
-            except Exception as e:
-                error_count += 1
-                logger.error(f"处理股票{row['code']}数据失败：{str(e)}")
-                logger.error(f"错误详情：", exc_info=True)
-                continue
+        logger.info("开始批量更新数据库...")
+        result = bulk_upsert_stock_basics(db, merged_df)
         
-        logger.info(f"数据库更新完成，成功更新{updated_count}条记录，失败{error_count}条记录")
+        logger.info(
+            f"数据库更新完成，新增{result['inserted_count']}条记录，"
+            f"更新{result['updated_count']}条记录，未变化{result['unchanged_count']}条记录"
+        )
         
         try:
             db.commit()
@@ -137,8 +228,16 @@ def update_stock_basics(db: Session):
             logger.error("错误详情：", exc_info=True)
             db.rollback()
             raise e
+        
+        stock_search_index.invalidate()
             
-        return {"message": "股票基础数据更新成功", "updated_count": updated_count, "error_count": error_count}
+        return {
+            "message": "股票基础数据更新成功",
+            "inserted_count": result["inserted_count"],
+            "updated_count": result["updated_count"],
+            "unchanged_count": result["unchanged_count"],
+            "error_count": 0  # 整批写入，失败时整体回滚并抛出异常，保留该字段兼容原有响应
+        }
         
     except Exception as e:
         logger.error(f"更新股票基础数据失败：{str(e)}")
@@ -146,17 +245,42 @@ def update_stock_basics(db: Session):
         db.rollback()
         raise e
 
+def encode_cursor(kind: str, values: Dict) -> str:
+    """将分页位置编码为不透明的游标字符串"""
+    payload = json.dumps({"k": kind, **values}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(kind: str, cursor: str) -> Dict:
+    """解析游标字符串，游标无效时抛出 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except Exception:
+        raise ValueError("无效的分页游标")
+    if not isinstance(values, dict) or values.pop("k", None) != kind:
+        raise ValueError("无效的分页游标")
+    return values
+
 def get_stock_basics(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     industry: str = None,
     market: str = None,
-    search: str = None
+    search: str = None,
+    cursor: str = None,
+    include_total: bool = True
 ):
-    """获取股票基础数据列表"""
+    """获取股票基础数据列表
+    
+    按股票代码排序。传入 cursor 时使用键集分页（code > 游标位置），不再使用 skip；
+    每页返回的 next_cursor 可用于获取下一页。include_total 为 False 时跳过总数统计。
+    """
     try:
-        logger.info(f"开始获取股票基础数据，参数：skip={skip}, limit={limit}, industry={industry}, market={market}, search={search}")
+        logger.info(f"开始获取股票基础数据，参数：skip={skip}, limit={limit}, industry={industry}, market={market}, search={search}, cursor={cursor}")
+        
+        if search:
+            return _search_stock_basics(db, search, skip, limit, industry, market, cursor)
         
         query = db.query(StockBasic)
         
@@ -166,27 +290,31 @@ def get_stock_basics(
         if market:
             logger.debug(f"添加市场筛选条件：{market}")
             query = query.filter(StockBasic.market == market)
-        if search:
-            logger.debug(f"添加搜索条件：{search}")
-            search_pattern = f"%{search}%"
-            query = query.filter(
-                or_(
-                    StockBasic.code.like(search_pattern),
-                    StockBasic.name.like(search_pattern)
-                )
-            )
-            
-        total = query.count()
-        logger.info(f"符合条件的记录总数：{total}")
         
-        items = query.offset(skip).limit(limit).all()
+        total = None
+        if include_total:
+            total = query.count()
+            logger.info(f"符合条件的记录总数：{total}")
+        
+        if cursor:
+            position = decode_cursor("basics", cursor)
+            query = query.filter(StockBasic.code > position["code"])
+            skip = 0
+        
+        # 多取一条判断是否还有下一页，最后一页恰好取满时不返回游标
+        items = query.order_by(StockBasic.code).offset(skip).limit(limit + 1).all()
+        has_more = len(items) > limit
+        items = items[:limit]
         logger.info(f"成功获取{len(items)}条记录")
         
+        next_cursor = encode_cursor("basics", {"code": items[-1].code}) if has_more else None
+        
         return {
             "total": total,
             "items": items,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
@@ -194,39 +322,100 @@ def get_stock_basics(
         logger.error("错误详情：", exc_info=True)
         raise e
 
+def _search_stock_basics(db: Session, search: str, skip: int, limit: int, industry: str, market: str, cursor: str):
+    """通过内存搜索索引查询股票，按匹配程度排序"""
+    logger.debug(f"使用搜索索引查询：{search}")
+    stock_search_index.ensure_fresh(db)
+    matches = stock_search_index.search(search, industry=industry, market=market)
+    
+    if cursor:
+        skip = decode_cursor("basics-search", cursor)["offset"]
+    page_codes = [code for code, _ in matches[skip:skip + limit]]
+    
+    stocks = {s.code: s for s in db.query(StockBasic).filter(StockBasic.code.in_(page_codes)).all()} if page_codes else {}
+    items = [stocks[code] for code in page_codes if code in stocks]
+    logger.info(f"搜索到{len(matches)}条记录，返回{len(items)}条")
+    
+    next_offset = skip + limit
+    return {
+        "total": len(matches),
+        "items": items,
+        "skip": skip,
+        "limit": limit,
+        "next_cursor": encode_cursor("basics-search", {"offset": next_offset}) if next_offset < len(matches) else None
+    }
+
+def search_stocks(db: Session, q: str, limit: int = 10):
+    """股票输入联想，直接从内存搜索索引返回排序后的匹配结果"""
+    stock_search_index.ensure_fresh(db)
+    matches = stock_search_index.search(q, limit=limit)
+    return [{**stock_search_index.describe(code), "rank": rank} for code, rank in matches]
+
 def get_stock_trades(
     db: Session,
     stock_code: str,
     start_date: str = None,
     end_date: str = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: str = None,
+    include_total: bool = True,
+    period: str = "day"
 ):
-    """获取股票交易数据"""
+    """获取股票交易数据
+    
+    按 (trade_date, id) 倒序排列。传入 cursor 时使用键集分页，不再使用 skip；
+    每页返回的 next_cursor 可用于获取下一页。include_total 为 False 时跳过总数统计。
+    period 为 week、month、quarter 时读取预先聚合的周期K线，trade_date 为周期内最后一个交易日。
+    """
     try:
-        logger.info(f"开始获取股票{stock_code}的交易数据，参数：start_date={start_date}, end_date={end_date}, skip={skip}, limit={limit}")
+        logger.info(f"开始获取股票{stock_code}的交易数据，参数：start_date={start_date}, end_date={end_date}, skip={skip}, limit={limit}, cursor={cursor}, period={period}")
         
-        query = db.query(StockTrade).join(StockBasic).filter(StockBasic.code == stock_code)
+        model, cursor_kind = (StockTrade, "trades") if period == "day" else (StockTradeRollup, f"trades_{period}")
+        query = db.query(model).join(StockBasic, StockBasic.id == model.stock_id).filter(StockBasic.code == stock_code)
+        if model is StockTradeRollup:
+            query = query.filter(StockTradeRollup.period == period)
         
         if start_date:
             logger.debug(f"添加开始日期筛选条件：{start_date}")
-            query = query.filter(StockTrade.trade_date >= datetime.strptime(start_date, '%Y-%m-%d'))
+            query = query.filter(model.trade_date >= datetime.strptime(start_date, '%Y-%m-%d').date())
         if end_date:
             logger.debug(f"添加结束日期筛选条件：{end_date}")
-            query = query.filter(StockTrade.trade_date <= datetime.strptime(end_date, '%Y-%m-%d'))
-            
-        total = query.count()
-        logger.info(f"符合条件的记录总数：{total}")
+            query = query.filter(model.trade_date <= datetime.strptime(end_date, '%Y-%m-%d').date())
+        
+        total = None
+        if include_total:
+            total = query.count()
+            logger.info(f"符合条件的记录总数：{total}")
+        
+        if cursor:
+            position = decode_cursor(cursor_kind, cursor)
+            cursor_date = datetime.strptime(position["trade_date"], '%Y-%m-%d').date()
+            query = query.filter(
+                or_(
+                    model.trade_date < cursor_date,
+                    and_(model.trade_date == cursor_date, model.id < position["id"])
+                )
+            )
+            skip = 0
         
         # 按时间倒序获取最近的数据
-        items = query.order_by(StockTrade.trade_date.desc()).offset(skip).limit(limit).all()
+        items = query.order_by(model.trade_date.desc(), model.id.desc()).offset(skip).limit(limit + 1).all()
+        has_more = len(items) > limit
+        items = items[:limit]
         logger.info(f"成功获取{len(items)}条记录")
         
+        next_cursor = None
+        if has_more:
+            last = items[-1]
+            next_cursor = encode_cursor(cursor_kind, {"trade_date": last.trade_date.strftime('%Y-%m-%d'), "id": last.id})
+        
         return {
             "total": total,
             "items": items,
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
@@ -234,6 +423,51 @@ def get_stock_trades(
         logger.error("错误详情：", exc_info=True)
         raise e
 
+def get_trade_window(
+    db: Session,
+    stock_id: int,
+    columns: List[str],
+    start_date: date = None,
+    end_date: date = None,
+    lookback: int = 0,
+    default_bars: int = 100,
+    period: str = "day"
+) -> Tuple[List[tuple], int]:
+    """读取一只股票指定区间的交易数据，并在前面多取 lookback 条作为指标计算的预热数据
+
+    指定 start_date 时返回区间内全部交易日，预热数据用 trade_date < start_date 倒序 LIMIT lookback
+    在 (stock_id, trade_date) 索引上定位；未指定时返回 end_date 之前最近的 default_bars 条。
+    period 不为 day 时读取周期K线，条数均按K线计。
+
+    Returns:
+        (rows, warmup)：按日期升序的 (trade_date, *columns) 行，以及其中预热数据的条数
+    """
+    model = StockTrade if period == "day" else StockTradeRollup
+    fields = [model.trade_date] + [getattr(model, column) for column in columns]
+    conditions = [model.stock_id == stock_id]
+    if model is StockTradeRollup:
+        conditions.append(StockTradeRollup.period == period)
+    query = select(*fields).where(*conditions)
+    if end_date:
+        query = query.where(model.trade_date <= end_date)
+
+    if start_date is None:
+        rows = db.execute(
+            query.order_by(model.trade_date.desc()).limit(default_bars + lookback)
+        ).all()[::-1]
+        return rows, max(len(rows) - default_bars, 0)
+
+    rows = db.execute(
+        query.where(model.trade_date >= start_date).order_by(model.trade_date)
+    ).all()
+    warmup = db.execute(
+        select(*fields)
+        .where(*conditions, model.trade_date < start_date)
+        .order_by(model.trade_date.desc())
+        .limit(lookback)
+    ).all()[::-1] if lookback else []
+    return warmup + rows, len(warmup)
+
 def get_stock_basic(db: Session, code: str):
     """获取单个股票基础数据"""
     try:
@@ -253,120 +487,216 @@ def get_stock_basic(db: Session, code: str):
         logger.error("错误详情：", exc_info=True)
         raise e
 
-def update_stock_trades(db: Session, stock_code: str = None, days: int = 30):
+def get_existing_codes(db: Session, codes: List[str]) -> List[str]:
+    """返回给定代码中数据库已存在的股票代码"""
+    return db.execute(select(StockBasic.code).where(StockBasic.code.in_(codes))).scalars().all()
+
+def _write_stock_trades(db: Session, stock_id: int, df: pd.DataFrame) -> int:
+    """将单只股票的交易数据通过一次 executemany upsert 写入数据库，返回写入的记录数"""
+    trades = df[TRADE_COLUMNS].drop_duplicates(subset="trade_date", keep="last").copy()
+    trades["trade_date"] = pd.to_datetime(trades["trade_date"]).dt.date
+    trades = trades.astype(object).where(trades.notna(), None)
+    trades["stock_id"] = stock_id
+    now = datetime.utcnow()
+    trades["created_at"] = now
+    trades["updated_at"] = now
+    records = trades.to_dict(orient="records")
+    
+    if records:
+        db.execute(_trade_upsert_statement(), records)
+    return len(records)
+
+def _trade_upsert_statement():
+    """构造按(stock_id, trade_date)冲突时更新行情的插入语句"""
+    stmt = sqlite_insert(StockTrade.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=[StockTrade.stock_id, StockTrade.trade_date],
+        set_={
+            column: stmt.excluded[column]
+            for column in TRADE_COLUMNS[1:] + ["updated_at"]
+        }
+    )
+
+def _sync_columnar_store(db: Session, stock_ids: List[int], since: Dict[int, date] = None) -> None:
+    """将新写入的交易数据同步到列式存储，同步失败不影响数据库中的数据
+
+    since 为每只股票本次写入的最早交易日，只追加该日期之后的日线
+    """
+    store = get_columnar_store()
+    if not store or not stock_ids:
+        return
+    try:
+        exported = store.sync_symbols(db, stock_ids, since=since)
+        logger.info(f"列式存储同步完成，共{exported}只股票")
+    except Exception as e:
+        logger.error(f"列式存储同步失败，可执行 scripts/rebuild_columnar_store.py 重建：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
+
+def get_trade_watermarks(db: Session, stock_ids: List[int] = None) -> Dict[int, date]:
+    """按股票分组查询已入库的最新交易日期"""
+    query = select(StockTrade.stock_id, func.max(StockTrade.trade_date)).group_by(StockTrade.stock_id)
+    if stock_ids is not None:
+        query = query.where(StockTrade.stock_id.in_(stock_ids))
+    return {stock_id: last_date for stock_id, last_date in db.execute(query).all() if last_date}
+
+def get_trade_data_version(db: Session, code: str) -> str:
+    """一只股票交易数据的版本，即最后一次写入的时间，用于技术指标缓存键
+
+    只有一个聚合时 SQLite 直接在 (stock_id, updated_at) 索引上定位最大值，不扫描该股票的全部日线。
+    """
+    stock_id = select(StockBasic.id).where(StockBasic.code == code).scalar_subquery()
+    updated_at = db.execute(
+        select(func.max(StockTrade.updated_at)).where(StockTrade.stock_id == stock_id)
+    ).scalar()
+    return updated_at.isoformat() if updated_at else ""
+
+def _next_business_day(day: date) -> date:
+    """返回指定日期之后的第一个工作日"""
+    return np.busday_offset(np.datetime64(day + timedelta(days=1), 'D'), 0, roll='forward').astype(date)
+
+def update_stock_trades(
+    db: Session,
+    stock_code: str = None,
+    days: int = 30,
+    incremental: bool = False,
+    provider: TradeDataProvider = None,
+    max_workers: int = None,
+    rate_limit: float = None,
+    stock_codes: List[str] = None,
+    progress_callback: ProgressCallback = None
+):
     """更新股票交易数据
     
+    行情采集在有界线程池中并发执行并受令牌桶限流，采集结果经队列交给当前线程串行写入数据库。
+    每写入 TRADE_WRITE_COMMIT_SIZE 只股票或距本批第一次写入超过 TRADE_WRITE_COMMIT_INTERVAL 秒时提交一次，
+    缩短持有 SQLite 写锁的时间，其他进程的写入不会等到超时。
+    
+    增量模式下一次分组查询出每只股票已入库的最新交易日期，只采集该日期之后的数据，
+    已是最新的股票直接跳过；尚无数据的股票仍按 days 采集。
+    
     Args:
         db (Session): 数据库会话
         stock_code (str, optional): 股票代码。如果不指定，则更新所有股票
         days (int, optional): 要获取的天数。默认30天
+        incremental (bool, optional): 是否只采集最新交易日期之后的数据
+        provider (TradeDataProvider, optional): 行情数据源，默认使用 akshare
+        max_workers (int, optional): 采集线程数，默认读取配置 TRADE_FETCH_WORKERS
+        rate_limit (float, optional): 每秒最多请求次数，默认读取配置 TRADE_FETCH_RATE_LIMIT
+        stock_codes (List[str], optional): 要更新的股票代码列表，用于分批任务
+        progress_callback (ProgressCallback, optional): 每处理完一只股票时调用的进度回调
     """
     try:
-        logger.info(f"开始更新股票交易数据：stock_code={stock_code}, days={days}")
+        logger.info(f"开始更新股票交易数据：stock_code={stock_code}, days={days}, incremental={incremental}")
+        
+        provider = provider or AkshareTradeProvider()
+        max_workers = max_workers if max_workers is not None else settings.TRADE_FETCH_WORKERS
+        rate_limit = rate_limit if rate_limit is not None else settings.TRADE_FETCH_RATE_LIMIT
         
         # 确定要更新的股票列表
+        query = db.query(StockBasic.id, StockBasic.code)
         if stock_code:
-            stocks = db.query(StockBasic).filter(StockBasic.code == stock_code).all()
-        else:
-            stocks = db.query(StockBasic).all()
+            query = query.filter(StockBasic.code == stock_code)
+        if stock_codes is not None:
+            query = query.filter(StockBasic.code.in_(stock_codes))
+        stocks = query.all()
             
         if not stocks:
             logger.warning(f"没有找到需要更新的股票")
             return {"message": "没有找到需要更新的股票", "updated_count": 0}
-            
-        total_updated = 0
-        error_count = 0
         
-        for stock in stocks:
+        end_date = datetime.now().date()
+        start_date = end_date - timedelta(days=days)
+        
+        if incremental:
+            scoped = stock_code or stock_codes is not None
+            watermarks = get_trade_watermarks(db, [stock_id for stock_id, _ in stocks] if scoped else None)
+            jobs = []
+            for stock_id, code in stocks:
+                last_date = watermarks.get(stock_id)
+                job_start = _next_business_day(last_date) if last_date else start_date
+                if job_start <= end_date:
+                    jobs.append((stock_id, code, job_start, end_date))
+            skipped_count = len(stocks) - len(jobs)
+            logger.info(f"增量更新：{len(jobs)}只股票需要采集，{skipped_count}只股票已是最新")
+        else:
+            jobs = [(stock_id, code, start_date, end_date) for stock_id, code in stocks]
+            skipped_count = 0
+        
+        pending_stock_ids = []
+        pending_codes = []
+        pending_since = {}
+        batch_started = [None]
+        
+        def writer(stock_id, code, df):
+            # 一只股票的日线、指标状态和周期K线放在同一个保存点中，任一步失败时整只股票回滚，
+            # 不会在之后的提交中留下只写了一部分的数据
+            with db.begin_nested():
+                # 必须在覆盖历史日线之前比较
+                overlap_changed = overlap_differs(db, stock_id, df)
+                written = _write_stock_trades(db, stock_id, df)
+                update_indicator_state(db, stock_id, df, overlap_changed=overlap_changed)
+                update_rollups(db, stock_id, df)
+            pending_stock_ids.append(stock_id)
+            pending_codes.append(code)
+            if not df.empty:
+                first_date = pd.to_datetime(df["trade_date"]).min().date()
+                pending_since[stock_id] = min(first_date, pending_since.get(stock_id, first_date))
+            if batch_started[0] is None:
+                batch_started[0] = time.monotonic()
+            return written
+        
+        def commit_pending():
+            """提交已写入的股票，再同步列式存储并使指标缓存失效"""
             try:
-                logger.info(f"正在获取股票 {stock.code} 的交易数据...")
-                
-                # 使用 akshare 获取股票历史数据
-                try:
-                    # 尝试使用东方财富接口
-                    df = ak.stock_zh_a_hist(symbol=stock.code, period="daily", 
-                                          start_date=(datetime.now() - timedelta(days=days)).strftime("%Y%m%d"),
-                                          end_date=datetime.now().strftime("%Y%m%d"),
-                                          adjust="qfq")
-                    logger.info(f"使用东方财富接口获取 {stock.code} 交易数据成功")
-                except Exception as e:
-                    logger.error(f"获取股票 {stock.code} 交易数据失败：{str(e)}")
-                    error_count += 1
-                    continue
-                
-                if df.empty:
-                    logger.warning(f"股票 {stock.code} 没有交易数据")
-                    continue
-                    
-                # 重命名列
-                df = df.rename(columns={
-                    "日期": "trade_date",
-                    "开盘": "open_price",
-                    "最高": "high_price",
-                    "最低": "low_price",
-                    "收盘": "close_price",
-                    "成交量": "volume",
-                    "成交额": "amount"
-                })
-                
-                # 转换日期格式
-                df["trade_date"] = pd.to_datetime(df["trade_date"])
-                
-                # 更新数据库
-                for _, row in df.iterrows():
-                    # 检查是否已存在该日期的数据
-                    existing = db.query(StockTrade).filter(
-                        StockTrade.stock_id == stock.id,
-                        StockTrade.trade_date == row["trade_date"]
-                    ).first()
-                    
-                    trade_data = {
-                        "stock_id": stock.id,
-                        "trade_date": row["trade_date"],
-                        "open_price": row["open_price"],
-                        "high_price": row["high_price"],
-                        "low_price": row["low_price"],
-                        "close_price": row["close_price"],
-                        "volume": row["volume"],
-                        "amount": row["amount"]
-                    }
-                    
-                    if existing:
-                        # 更新现有记录
-                        for key, value in trade_data.items():
-                            setattr(existing, key, value)
-                    else:
-                        # 创建新记录
-                        db_trade = StockTrade(**trade_data)
-                        db.add(db_trade)
-                    
-                    total_updated += 1
-                
-                logger.info(f"股票 {stock.code} 的交易数据更新成功")
-                
+                db.commit()
             except Exception as e:
-                error_count += 1
-                logger.error(f"处理股票 {stock.code} 交易数据时出错：{str(e)}")
+                logger.error(f"数据库事务提交失败：{str(e)}")
                 logger.error("错误详情：", exc_info=True)
-                continue
+                db.rollback()
+                raise e
+            _sync_columnar_store(db, pending_stock_ids, pending_since)
+            if indicator_cache:
+                for code in pending_codes:
+                    indicator_cache.invalidate(code)
+            pending_stock_ids.clear()
+            pending_codes.clear()
+            pending_since.clear()
+            batch_started[0] = None
         
-        try:
-            db.commit()
-            logger.info("数据库事务提交成功")
-        except Exception as e:
-            logger.error(f"数据库事务提交失败：{str(e)}")
-            logger.error("错误详情：", exc_info=True)
-            db.rollback()
-            raise e
+        def on_progress(stats):
+            # 按批提交，写事务不会在整个采集过程中持有 SQLite 写锁
+            if pending_stock_ids and (
+                len(pending_stock_ids) >= settings.TRADE_WRITE_COMMIT_SIZE
+                or time.monotonic() - batch_started[0] >= settings.TRADE_WRITE_COMMIT_INTERVAL
+            ):
+                commit_pending()
+            if progress_callback:
+                progress_callback(stats)
+        
+        stats = run_trade_pipeline(
+            jobs,
+            provider=provider,
+            writer=writer,
+            max_workers=max_workers,
+            rate_limit=rate_limit,
+            queue_size=settings.TRADE_WRITE_QUEUE_SIZE,
+            progress_callback=on_progress
+        )
+        
+        commit_pending()
+        logger.info("数据库事务提交成功")
         
         return {
             "message": "股票交易数据更新成功",
-            "updated_count": total_updated,
-            "error_count": error_count
+            "updated_count": stats.written_rows,
+            "error_count": stats.fetch_errors + stats.write_errors,
+            "skipped_count": skipped_count,
+            "failed_codes": stats.failed_codes,
+            "elapsed": round(stats.elapsed, 3)
         }
         
     except Exception as e:
         logger.error(f"更新股票交易数据失败：{str(e)}")
         logger.error("错误详情：", exc_info=True)
         db.rollback()
-        raise e 
\ No newline at end of file
+        raise e
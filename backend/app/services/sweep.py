@@ -0,0 +1,359 @@
+import itertools
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, replace
+from datetime import date, datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.backtest import BacktestResult, BacktestSweep
+from app.models.stock import StockBasic, StockTrade
+from app.services.backtest import BacktestConfig, STRATEGIES, backtest_summary, price_limit_for, strategy_signal
+
+logger = logging.getLogger(__name__)
+
+# 排行榜可排序的指标，均为越大越好（最大回撤为负数）
+LEADERBOARD_METRICS = ["sharpe_ratio", "total_return", "annualized_return", "max_drawdown", "win_rate"]
+
+# 写入排行榜的汇总字段
+RESULT_FIELDS = [
+    "days", "total_return", "annualized_return", "max_drawdown", "sharpe_ratio",
+    "trade_count", "win_rate", "exposure", "benchmark_return"
+]
+
+def expand_param_grid(param_grid: Dict[str, List]) -> List[Dict]:
+    """把参数网格展开为全部参数组合，如 {"fast": [5, 10], "slow": [20]} 展开为两组"""
+    if not param_grid:
+        return [{}]
+    for name, values in param_grid.items():
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"参数 {name} 的取值必须是非空列表")
+    names = sorted(param_grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+
+def validate_param_sets(strategy: str, param_sets: List[Dict]) -> None:
+    """提交前检查每组参数，避免参数错误的组合在所有股票上重复失败"""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"不支持的策略：{strategy}")
+    probe = np.linspace(10, 11, 60)
+    for params in param_sets:
+        strategy_signal(strategy, probe, params)
+
+def create_sweep(
+    db: Session,
+    strategy: str,
+    param_grid: Dict[str, List],
+    codes: Optional[List[str]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    config: Optional[BacktestConfig] = None
+) -> BacktestSweep:
+    """创建参数扫描任务记录
+
+    Args:
+        codes: 股票代码列表，为空时扫描全部股票
+
+    Raises:
+        ValueError: 策略或参数无效，或回测数超过 BACKTEST_SWEEP_MAX_JOBS
+    """
+    param_sets = expand_param_grid(param_grid)
+    validate_param_sets(strategy, param_sets)
+
+    symbol_count = len(codes) if codes else db.scalar(select(func.count()).select_from(StockBasic))
+    total_jobs = symbol_count * len(param_sets)
+    if total_jobs > settings.BACKTEST_SWEEP_MAX_JOBS:
+        raise ValueError(f"回测数 {total_jobs} 超过上限 {settings.BACKTEST_SWEEP_MAX_JOBS}")
+
+    sweep = BacktestSweep(
+        strategy=strategy,
+        param_grid=json.dumps(param_grid, sort_keys=True),
+        codes=json.dumps(codes) if codes else None,
+        config=json.dumps(asdict(config or BacktestConfig())),
+        start_date=start_date.isoformat() if start_date else None,
+        end_date=end_date.isoformat() if end_date else None,
+        status="PENDING",
+        total_jobs=total_jobs
+    )
+    db.add(sweep)
+    db.commit()
+    db.refresh(sweep)
+    return sweep
+
+@dataclass
+class SweepPrices:
+    """参与扫描的股票及其拼接后的价格序列
+
+    第 i 只股票的价格为 open_prices[offsets[i]:offsets[i + 1]]，收盘价同理。
+    """
+    stock_ids: List[int]
+    codes: List[str]
+    price_limits: List[float]
+    offsets: np.ndarray
+    open_prices: np.ndarray
+    close_prices: np.ndarray
+
+def load_sweep_prices(
+    db: Session,
+    codes: Optional[List[str]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None
+) -> SweepPrices:
+    """一次查询读取全部股票的开盘价和收盘价，交易数据少于2天的股票不参与扫描"""
+    query = (
+        select(StockTrade.stock_id, StockTrade.open_price, StockTrade.close_price)
+        .where(StockTrade.open_price.is_not(None), StockTrade.close_price.is_not(None))
+        .order_by(StockTrade.stock_id, StockTrade.trade_date)
+    )
+    stocks_query = select(StockBasic.id, StockBasic.code, StockBasic.name, StockBasic.market)
+    if codes:
+        query = query.join(StockBasic, StockBasic.id == StockTrade.stock_id).where(StockBasic.code.in_(codes))
+        stocks_query = stocks_query.where(StockBasic.code.in_(codes))
+    if start_date:
+        query = query.where(StockTrade.trade_date >= start_date)
+    if end_date:
+        query = query.where(StockTrade.trade_date <= end_date)
+
+    trades = pd.DataFrame(db.execute(query).all(), columns=["stock_id", "open_price", "close_price"])
+    counts = trades.groupby("stock_id", sort=False).size()
+    stocks = {row.id: row for row in db.execute(stocks_query)}
+
+    # 按 stock_id 排序后各股票的数据是连续的，由行数累加得到每只股票的起止位置
+    keep = counts[counts >= 2]
+    trades = trades[trades["stock_id"].isin(keep.index)]
+    offsets = np.concatenate([[0], np.cumsum(keep.to_numpy())])
+    return SweepPrices(
+        stock_ids=[int(stock_id) for stock_id in keep.index],
+        codes=[stocks[stock_id].code for stock_id in keep.index],
+        price_limits=[price_limit_for(stocks[stock_id].market, stocks[stock_id].name) for stock_id in keep.index],
+        offsets=offsets,
+        open_prices=trades["open_price"].to_numpy(dtype="float64"),
+        close_prices=trades["close_price"].to_numpy(dtype="float64")
+    )
+
+class SharedPriceArrays:
+    """存放在共享内存中的价格数组
+
+    形状为 (2, length) 的 float64 数组，第0行为开盘价、第1行为收盘价。子进程按名称映射同一块内存，
+    每个任务只需传递起止位置，价格数据不会随任务序列化。由创建者负责释放共享内存。
+    """
+
+    def __init__(self, open_prices: np.ndarray, close_prices: np.ndarray):
+        self.length = len(open_prices)
+        self._memory = shared_memory.SharedMemory(create=True, size=max(self.length * 2 * 8, 1))
+        prices = np.ndarray((2, self.length), dtype="float64", buffer=self._memory.buf)
+        prices[0] = open_prices
+        prices[1] = close_prices
+        del prices
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def close(self) -> None:
+        self._memory.close()
+        self._memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# 子进程中映射的共享内存和价格数组
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+_worker_prices: Optional[np.ndarray] = None
+
+def _attach_shared_prices(name: str, length: int) -> None:
+    """子进程初始化：按名称映射共享内存中的价格数组"""
+    global _worker_memory, _worker_prices
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_prices = np.ndarray((2, length), dtype="float64", buffer=_worker_memory.buf)
+
+def _run_jobs(
+    start: int,
+    stop: int,
+    strategy: str,
+    param_sets: List[Dict],
+    config: BacktestConfig
+) -> List[Tuple[Dict, Optional[Dict], Optional[str]]]:
+    """在子进程中对一只股票依次回测多组参数，返回 (参数, 汇总统计, 错误信息) 列表"""
+    open_prices = _worker_prices[0, start:stop]
+    close_prices = _worker_prices[1, start:stop]
+    results = []
+    for params in param_sets:
+        try:
+            results.append((params, backtest_summary(open_prices, close_prices, strategy, params, config), None))
+        except Exception as e:
+            results.append((params, None, str(e)))
+    return results
+
+def _flush_results(db: Session, sweep: BacktestSweep, rows: List[Dict], completed: int, failed: int) -> None:
+    if rows:
+        db.execute(insert(BacktestResult), rows)
+        rows.clear()
+    sweep.completed_jobs = completed
+    sweep.failed_jobs = failed
+    db.commit()
+
+def run_sweep(db: Session, sweep_id: int, max_workers: Optional[int] = None) -> Dict:
+    """执行参数扫描
+
+    每个（股票 × 一批参数组合）作为一个任务提交到进程池，价格数据通过共享内存传递。
+    主进程按完成顺序收集结果，每 BACKTEST_SWEEP_COMMIT_SIZE 条写入一次排行榜并更新进度，
+    扫描过程中即可查询已完成部分的排名。
+    """
+    sweep = db.get(BacktestSweep, sweep_id)
+    if sweep is None:
+        raise ValueError(f"参数扫描任务 {sweep_id} 不存在")
+
+    max_workers = max_workers or settings.BACKTEST_SWEEP_WORKERS or os.cpu_count()
+    sweep.status = "RUNNING"
+    sweep.started_at = datetime.now()
+    db.commit()
+
+    try:
+        param_sets = expand_param_grid(json.loads(sweep.param_grid))
+        config = BacktestConfig(**json.loads(sweep.config))
+        prices = load_sweep_prices(
+            db,
+            json.loads(sweep.codes) if sweep.codes else None,
+            date.fromisoformat(sweep.start_date) if sweep.start_date else None,
+            date.fromisoformat(sweep.end_date) if sweep.end_date else None
+        )
+        # 不存在或交易数据不足的股票直接计为失败
+        completed = 0
+        failed = max(sweep.total_jobs - len(prices.codes) * len(param_sets), 0)
+        logger.info(
+            f"开始参数扫描 {sweep_id}：{len(prices.codes)}只股票 × {len(param_sets)}组参数，{max_workers}个进程"
+        )
+
+        task_size = settings.BACKTEST_SWEEP_TASK_SIZE
+        chunks = [param_sets[i:i + task_size] for i in range(0, len(param_sets), task_size)]
+        rows = []
+        if prices.codes:
+            with SharedPriceArrays(prices.open_prices, prices.close_prices) as shared, ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_attach_shared_prices,
+                initargs=(shared.name, shared.length)
+            ) as executor:
+                futures = {}
+                for index, (start, stop) in enumerate(zip(prices.offsets[:-1], prices.offsets[1:])):
+                    symbol_config = config
+                    if config.price_limit is None:
+                        symbol_config = replace(config, price_limit=prices.price_limits[index])
+                    for chunk in chunks:
+                        future = executor.submit(_run_jobs, int(start), int(stop), sweep.strategy, chunk, symbol_config)
+                        futures[future] = index
+
+                for future in as_completed(futures):
+                    index = futures[future]
+                    for params, summary, error in future.result():
+                        if summary is None:
+                            failed += 1
+                            logger.warning(f"股票 {prices.codes[index]} 参数 {params} 回测失败：{error}")
+                            continue
+                        completed += 1
+                        row = {field: summary[field] for field in RESULT_FIELDS}
+                        row.update({
+                            "sweep_id": sweep_id,
+                            "stock_id": prices.stock_ids[index],
+                            "code": prices.codes[index],
+                            "params": json.dumps(params, sort_keys=True)
+                        })
+                        rows.append(row)
+                    if len(rows) >= settings.BACKTEST_SWEEP_COMMIT_SIZE:
+                        _flush_results(db, sweep, rows, completed, failed)
+
+        sweep.status = "SUCCESS"
+        sweep.finished_at = datetime.now()
+        _flush_results(db, sweep, rows, completed, failed)
+        logger.info(f"参数扫描 {sweep_id} 完成：成功{completed}，失败{failed}")
+        return sweep_status(sweep)
+
+    except Exception as e:
+        logger.error(f"参数扫描 {sweep_id} 失败：{str(e)}")
+        logger.error("错误详情：", exc_info=True)
+        db.rollback()
+        sweep.status = "FAILURE"
+        sweep.error = str(e)
+        sweep.finished_at = datetime.now()
+        db.commit()
+        raise e
+
+def sweep_status(sweep: BacktestSweep) -> Dict:
+    """参数扫描任务的状态和进度"""
+    elapsed = None
+    if sweep.started_at:
+        elapsed = ((sweep.finished_at or datetime.now()) - sweep.started_at).total_seconds()
+    done = sweep.completed_jobs + sweep.failed_jobs
+    return {
+        "sweep_id": sweep.id,
+        "strategy": sweep.strategy,
+        "param_grid": json.loads(sweep.param_grid),
+        "status": sweep.status,
+        "total_jobs": sweep.total_jobs,
+        "completed_jobs": sweep.completed_jobs,
+        "failed_jobs": sweep.failed_jobs,
+        "progress": round(done / sweep.total_jobs, 4) if sweep.total_jobs else 1.0,
+        "elapsed": round(elapsed, 3) if elapsed is not None else None,
+        "throughput": round(done / elapsed, 2) if elapsed else None,
+        "error": sweep.error
+    }
+
+def get_leaderboard(db: Session, sweep_id: int, sort: str = "sharpe_ratio", limit: int = 50) -> Optional[Dict]:
+    """查询参数扫描的排行榜，任务不存在时返回 None
+
+    leaderboard 为按指标排序的（股票 × 参数）结果；params 为各参数组合在所有股票上的平均表现，
+    用于挑选对多数股票都稳健的参数。
+    """
+    if sort not in LEADERBOARD_METRICS:
+        raise ValueError(f"不支持的排序指标：{sort}")
+    sweep = db.get(BacktestSweep, sweep_id)
+    if sweep is None:
+        return None
+
+    metric = getattr(BacktestResult, sort)
+    rows = db.execute(
+        select(BacktestResult)
+        .where(BacktestResult.sweep_id == sweep_id)
+        .order_by(metric.desc().nulls_last(), BacktestResult.id)
+        .limit(limit)
+    ).scalars().all()
+
+    average = func.avg(metric).label("average")
+    by_params = db.execute(
+        select(
+            BacktestResult.params,
+            func.count().label("symbols"),
+            average,
+            func.avg(BacktestResult.total_return).label("average_total_return")
+        )
+        .where(BacktestResult.sweep_id == sweep_id)
+        .group_by(BacktestResult.params)
+        .order_by(average.desc().nulls_last())
+        .limit(limit)
+    ).all()
+
+    return {
+        **sweep_status(sweep),
+        "sort": sort,
+        "leaderboard": [
+            {"code": row.code, "params": json.loads(row.params), **{field: getattr(row, field) for field in RESULT_FIELDS}}
+            for row in rows
+        ],
+        "params": [
+            {
+                "params": json.loads(row.params),
+                "symbols": row.symbols,
+                f"average_{sort}": row.average,
+                "average_total_return": row.average_total_return
+            }
+            for row in by_params
+        ]
+    }
@@ -1,5 +1,152 @@
+import logging
+import time
+from typing import Dict, List
+from celery import chord, group, uuid
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.stock import StockBasic
+from app.services import stock, sweep
 from .worker import celery
 
+logger = logging.getLogger(__name__)
+
 @celery.task
 def add(x, y):
-    return x + y 
\ No newline at end of file
+    return x + y
+
+@celery.task(name='app.tasks.update_stock_basics')
+def update_stock_basics():
+    """更新股票基础数据"""
+    db = SessionLocal()
+    try:
+        return stock.update_stock_basics(db)
+    finally:
+        db.close()
+
+@celery.task(name='app.tasks.run_backtest_sweep')
+def run_backtest_sweep(sweep_id: int, max_workers: int = None):
+    """执行回测参数扫描，结果写入排行榜表"""
+    db = SessionLocal()
+    try:
+        return sweep.run_sweep(db, sweep_id, max_workers=max_workers)
+    finally:
+        db.close()
+
+@celery.task(name='app.tasks.update_stock_trades')
+def update_stock_trades(stock_code: str = None, days: int = 30, incremental: bool = False):
+    """更新股票交易数据"""
+    db = SessionLocal()
+    try:
+        return stock.update_stock_trades(db, stock_code=stock_code, days=days, incremental=incremental)
+    finally:
+        db.close()
+
+@celery.task(bind=True, name='app.tasks.update_stock_trades_chunk')
+def update_stock_trades_chunk(self, stock_codes: List[str], days: int = 30, incremental: bool = False, chunk_index: int = 0) -> Dict:
+    """更新一批股票的交易数据
+
+    处理过程中通过 PROGRESS 状态上报进度。失败时返回错误信息而不抛出异常，
+    保证 chord 的汇总任务始终能够执行。
+    """
+    total = len(stock_codes)
+
+    def report(stats):
+        self.update_state(state='PROGRESS', meta={
+            "chunk_index": chunk_index,
+            "total": total,
+            "processed": stats.processed,
+            "written_rows": stats.written_rows,
+            "errors": stats.fetch_errors + stats.write_errors,
+            "elapsed": round(stats.elapsed, 3)
+        })
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        result = stock.update_stock_trades(
+            db,
+            days=days,
+            incremental=incremental,
+            stock_codes=stock_codes,
+            progress_callback=report
+        )
+        elapsed = time.perf_counter() - started
+        return {
+            "chunk_index": chunk_index,
+            "total": total,
+            "processed": total,
+            "written_rows": result.get("updated_count", 0),
+            "skipped": result.get("skipped_count", 0),
+            "errors": result.get("error_count", 0),
+            "failed_codes": result.get("failed_codes", []),
+            "elapsed": round(elapsed, 3),
+            "throughput": round(total / elapsed, 2) if elapsed > 0 else None
+        }
+    except Exception as e:
+        logger.error(f"第{chunk_index}批交易数据更新失败：{str(e)}", exc_info=True)
+        return {
+            "chunk_index": chunk_index,
+            "total": total,
+            "processed": 0,
+            "written_rows": 0,
+            "errors": total,
+            "failed_codes": stock_codes,
+            "error": str(e),
+            "elapsed": round(time.perf_counter() - started, 3)
+        }
+    finally:
+        db.close()
+
+@celery.task(name='app.tasks.summarize_trade_refresh')
+def summarize_trade_refresh(chunk_results: List[Dict], started_at: float = None) -> Dict:
+    """汇总全市场交易数据刷新结果"""
+    total = sum(r["total"] for r in chunk_results)
+    elapsed = time.time() - started_at if started_at else None
+    return {
+        "chunks": len(chunk_results),
+        "failed_chunks": sum(1 for r in chunk_results if r.get("error")),
+        "total": total,
+        "written_rows": sum(r["written_rows"] for r in chunk_results),
+        "errors": sum(r["errors"] for r in chunk_results),
+        "elapsed": round(elapsed, 3) if elapsed is not None else None,
+        "throughput": round(total / elapsed, 2) if elapsed else None
+    }
+
+@celery.task(bind=True, name='app.tasks.refresh_all_stock_trades')
+def refresh_all_stock_trades(self, days: int = 30, incremental: bool = True, chunk_size: int = None) -> Dict:
+    """全市场交易数据刷新
+
+    将所有股票按 chunk_size 分批，以 chord 并行执行各批任务并在全部完成后汇总。
+    返回的子任务 ID 用于查询任务进度，任务 ID 即本任务自身的 ID。
+    """
+    chunk_size = chunk_size or settings.TRADE_REFRESH_CHUNK_SIZE
+    db = SessionLocal()
+    try:
+        codes = [code for (code,) in db.query(StockBasic.code).order_by(StockBasic.code).all()]
+    finally:
+        db.close()
+
+    chunks = [codes[i:i + chunk_size] for i in range(0, len(codes), chunk_size)]
+    chunk_ids = [uuid() for _ in chunks]
+    callback_id = uuid()
+    started_at = time.time()
+    logger.info(f"开始全市场交易数据刷新：共{len(codes)}只股票，分为{len(chunks)}批")
+
+    meta = {
+        "total": len(codes),
+        "chunk_ids": chunk_ids,
+        "chunk_sizes": [len(chunk) for chunk in chunks],
+        "callback_id": callback_id,
+        "started_at": started_at
+    }
+    # 先记录子任务ID，chord 执行期间即可查询进度
+    self.update_state(state='PROGRESS', meta=meta)
+
+    if chunks:
+        header = group(
+            update_stock_trades_chunk.s(chunk, days, incremental, index).set(task_id=chunk_id)
+            for index, (chunk, chunk_id) in enumerate(zip(chunks, chunk_ids))
+        )
+        chord(header)(summarize_trade_refresh.s(started_at=started_at).set(task_id=callback_id))
+
+    return meta
@@ -1,10 +1,12 @@
 from celery import Celery
+from celery.schedules import crontab
+from app.core.config import settings
 
 # 创建 Celery 实例
 celery = Celery(
     'app',
-    broker='redis://redis:6379/0',
-    backend='redis://redis:6379/1',
+    broker=settings.CELERY_BROKER_URL,
+    backend=settings.CELERY_RESULT_BACKEND,
     include=['app.tasks']  # 这里将包含任务定义
 )
 
@@ -15,4 +17,31 @@ celery.conf.update(
     result_serializer='json',
     timezone='Asia/Shanghai',
     enable_utc=True,
-) 
\ No newline at end of file
+    task_track_started=True,
+    result_extended=True,
+    # 测试时同步执行任务，并保留结果以便查询任务状态
+    task_always_eager=settings.CELERY_TASK_ALWAYS_EAGER,
+    task_store_eager_result=settings.CELERY_TASK_ALWAYS_EAGER,
+    # 参数扫描在任务内部使用进程池，prefork 的子进程不能再创建子进程，
+    # 需由 --pool=solo 的 worker 单独消费 backtest 队列
+    # 交易数据采集由并发数为1的 worker 单独消费 ingestion 队列：令牌桶限流只在进程内生效，
+    # 多个进程同时采集时实际请求速率会成倍增加，且 SQLite 同一时间只能有一个写事务
+    task_routes={
+        'app.tasks.run_backtest_sweep': {'queue': 'backtest'},
+        'app.tasks.update_stock_trades': {'queue': 'ingestion'},
+        'app.tasks.update_stock_trades_chunk': {'queue': 'ingestion'},
+    },
+)
+
+# 定时任务：交易日收盘后更新股票基础数据和交易数据
+celery.conf.beat_schedule = {
+    'update-stock-basics-after-close': {
+        'task': 'app.tasks.update_stock_basics',
+        'schedule': crontab(hour=15, minute=30, day_of_week='mon-fri'),
+    },
+    'refresh-stock-trades-after-close': {
+        'task': 'app.tasks.refresh_all_stock_trades',
+        'schedule': crontab(hour=16, minute=0, day_of_week='mon-fri'),
+        'kwargs': {'days': 30, 'incremental': True},
+    },
+}
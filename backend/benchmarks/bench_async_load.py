@@ -0,0 +1,161 @@
+"""同步线程池与 async 接口并发负载测试
+
+在临时 SQLite 文件中生成交易数据，分别以不同并发数请求：
+- sync：与改造前相同的同步接口，请求在 FastAPI 线程池中执行，会话与查询占用线程直到结束
+- async：/api/v1 下的 async 接口，数据库 I/O 通过 aiosqlite 完成，指标计算在 CPU 计算线程池中执行
+
+统计每种并发数下的吞吐量和延迟分布。--threads 设置 FastAPI 线程池大小（默认与 anyio 一致为40），
+调小可以更明显地观察线程池成为瓶颈时的表现。
+
+    cd backend && python -m benchmarks.bench_async_load --concurrency 1 16 64 256
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+import anyio
+import httpx
+import numpy as np
+import pandas as pd
+from fastapi import Depends
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.api.v1.endpoints import analysis as analysis_endpoints
+from app.db.session import get_async_db, get_db
+from app.main import app
+from app.models.base import Base
+from app.models.stock import StockBasic
+from app.schemas.stock import StockTradeList
+from app.services import stock
+from app.services.stock import _write_stock_trades
+
+def _populate(path: str, stocks: int, bars: int) -> list:
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    dates = pd.bdate_range("2015-01-05", periods=bars)
+    rng = np.random.default_rng(0)
+    codes = [f"{i:06d}" for i in range(1, stocks + 1)]
+    with sessionmaker(bind=engine)() as session:
+        session.add_all([StockBasic(code=code, name=f"股票{code}", update_time=pd.Timestamp.now()) for code in codes])
+        session.commit()
+        for stock_id in range(1, stocks + 1):
+            close = np.round(10 + np.cumsum(rng.normal(0, 0.2, bars)), 2)
+            _write_stock_trades(session, stock_id, pd.DataFrame({
+                "trade_date": dates,
+                "open_price": close,
+                "high_price": close,
+                "low_price": close,
+                "close_price": close,
+                "volume": rng.integers(1, 1_000_000, bars),
+                "amount": close * 1000
+            }))
+        session.commit()
+    engine.dispose()
+    return codes
+
+def _register_sync_routes():
+    """注册与改造前实现相同的同步接口作为对照"""
+    def sync_trades(stock_code: str, db: Session = Depends(get_db)):
+        return stock.get_stock_trades(db=db, stock_code=stock_code, include_total=False)
+
+    def sync_indicators(stock_code: str, db: Session = Depends(get_db)):
+        return analysis_endpoints._technical_indicators(db, stock_code)
+
+    app.add_api_route("/bench/sync/trades/{stock_code}", sync_trades, response_model=StockTradeList)
+    app.add_api_route("/bench/sync/indicators/{stock_code}", sync_indicators)
+
+async def _run(client: httpx.AsyncClient, urls: list, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def request(url):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(url)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(url) for url in urls))
+    return time.perf_counter() - started, np.array(latencies) * 1000
+
+async def main_async(args):
+    path = os.path.join(tempfile.mkdtemp(), "bench_async_load.db")
+    codes = _populate(path, args.stocks, args.bars)
+
+    # 两种模式使用相同的连接池配置；同步模式下会话要等线程池空闲才能关闭，
+    # 高并发时占用的连接数会超过线程数，溢出上限设为最大并发数以免连接池超时
+    pool_options = {"pool_size": args.pool_size, "max_overflow": max(args.concurrency), "pool_timeout": 120}
+    SyncSession = sessionmaker(bind=create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        **pool_options
+    ))
+    async_engine = create_async_engine(
+        f"sqlite+aiosqlite:///{path}",
+        poolclass=AsyncAdaptedQueuePool,
+        **pool_options
+    )
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def override_get_db():
+        db = SyncSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    # 关闭指标缓存，每个请求都真实查询和计算
+    analysis_endpoints.indicator_cache = None
+    _register_sync_routes()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+
+    rng = np.random.default_rng(1)
+    targets = rng.choice(codes, args.requests).tolist()
+    paths = {
+        "trades": ("/bench/sync/trades/{}", "/api/v1/stocks/trades/{}?include_total=false"),
+        "indicators": ("/bench/sync/indicators/{}", "/api/v1/analysis/indicators/{}"),
+    }
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    for label, template in zip(("sync", "async"), paths[endpoint]):
+                        elapsed, latencies = await _run(client, [template.format(code) for code in targets], concurrency)
+                        print(
+                            f"{endpoint:<10} {label:<5} concurrency={concurrency:<4} "
+                            f"rps={len(latencies) / elapsed:,.0f} "
+                            f"p50={np.percentile(latencies, 50):.1f}ms p99={np.percentile(latencies, 99):.1f}ms"
+                        )
+    finally:
+        # aiosqlite 每个连接占用一个线程，需关闭连接池后进程才能退出
+        await async_engine.dispose()
+
+def main():
+    # 关闭逐请求的 INFO 日志，避免日志输出掩盖两种模式的差异
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="同步线程池与 async 接口并发负载测试")
+    parser.add_argument("--stocks", type=int, default=200, help="股票数量")
+    parser.add_argument("--bars", type=int, default=500, help="每只股票的交易日数")
+    parser.add_argument("--requests", type=int, default=1000, help="每轮请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64, 256], help="并发数")
+    parser.add_argument("--endpoints", nargs="+", default=["trades", "indicators"], choices=["trades", "indicators"])
+    parser.add_argument("--threads", type=int, default=40, help="FastAPI 线程池大小")
+    parser.add_argument("--pool-size", type=int, default=20, help="异步连接池大小")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""回测参数扫描扩展性基准测试
+
+在临时数据库中生成日线数据，对（股票 × 参数组合）执行均线交叉参数扫描，比较：
+- pickle：每个任务把该股票的价格数组作为参数提交到进程池（序列化后传给子进程）
+- shared：run_sweep 的实现，价格数组放在共享内存中，任务只传递起止位置，结果写入排行榜表
+
+按不同进程数统计吞吐量和相对单进程的加速比。加速比受机器实际可用的CPU核数限制。
+
+    cd backend && python -m benchmarks.bench_backtest_sweep --stocks 200 --workers 1 2 4 8
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import sessionmaker
+from app.db.session import create_sqlite_engine
+from app.models.base import Base
+from app.models.stock import StockBasic
+from app.services import sweep
+from app.services.backtest import BacktestConfig, backtest_summary
+from app.services.stock import _write_stock_trades
+
+PARAM_GRID = {"fast": [3, 5, 8, 10, 12, 15], "slow": [20, 30, 40, 60, 90, 120]}
+
+def _seed(Session, stocks: int, bars: int) -> None:
+    dates = pd.bdate_range("2012-01-04", periods=bars)
+    rng = np.random.default_rng(0)
+    with Session() as session:
+        session.add_all([StockBasic(code=f"{i:06d}", name=f"股票{i}", update_time=pd.Timestamp.now()) for i in range(1, stocks + 1)])
+        session.commit()
+        for stock_id in range(1, stocks + 1):
+            close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, bars))), 2)
+            _write_stock_trades(session, stock_id, pd.DataFrame({
+                "trade_date": dates,
+                "open_price": close,
+                "high_price": close,
+                "low_price": close,
+                "close_price": close,
+                "volume": rng.integers(1, 1_000_000, bars),
+                "amount": close * 1000
+            }))
+        session.commit()
+
+def _pickled_jobs(open_prices, close_prices, param_sets, config):
+    return [backtest_summary(open_prices, close_prices, "ma_cross", params, config) for params in param_sets]
+
+def _run_pickled(prices: sweep.SweepPrices, param_sets, workers: int, task_size: int) -> int:
+    config = BacktestConfig(price_limit=0.1)
+    chunks = [param_sets[i:i + task_size] for i in range(0, len(param_sets), task_size)]
+    completed = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_pickled_jobs, prices.open_prices[start:stop], prices.close_prices[start:stop], chunk, config)
+            for start, stop in zip(prices.offsets[:-1], prices.offsets[1:])
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            completed += len(future.result())
+    return completed
+
+def main():
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="回测参数扫描扩展性基准测试")
+    parser.add_argument("--stocks", type=int, default=200, help="股票数量")
+    parser.add_argument("--bars", type=int, default=2500, help="每只股票的交易日数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count()], help="进程数")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_backtest_sweep.db")
+    engine = create_sqlite_engine(path)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    _seed(Session, args.stocks, args.bars)
+
+    param_sets = sweep.expand_param_grid(PARAM_GRID)
+    total = args.stocks * len(param_sets)
+    print(f"cpu_count={os.cpu_count()} jobs={total} ({args.stocks} stocks × {len(param_sets)} params, {args.bars} bars)")
+
+    with Session() as session:
+        prices = sweep.load_sweep_prices(session)
+    baseline = {}
+    for workers in sorted(set(args.workers)):
+        started = time.perf_counter()
+        _run_pickled(prices, param_sets, workers, sweep.settings.BACKTEST_SWEEP_TASK_SIZE)
+        pickled = time.perf_counter() - started
+
+        with Session() as session:
+            record = sweep.create_sweep(session, "ma_cross", PARAM_GRID)
+            started = time.perf_counter()
+            result = sweep.run_sweep(session, record.id, max_workers=workers)
+            shared = time.perf_counter() - started
+        assert result["completed_jobs"] == total
+
+        for label, elapsed in (("pickle", pickled), ("shared", shared)):
+            baseline.setdefault(label, elapsed)
+            print(
+                f"{label:<7} workers={workers:<3} elapsed={elapsed:.2f}s "
+                f"jobs/s={total / elapsed:,.0f} speedup={baseline[label] / elapsed:.2f}x"
+            )
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
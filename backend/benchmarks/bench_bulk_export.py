@@ -0,0 +1,127 @@
+"""批量历史数据拉取基准测试
+
+在临时 SQLite 文件中生成多只股票的多年日线数据，对比通过 JSON 接口按每页100条逐页拉取
+与通过 /stocks/trades/bulk 一次拉取 Arrow IPC 流 / Parquet 文件的响应字节数和耗时。
+
+    cd backend && python -m benchmarks.bench_bulk_export --stocks 50 --bars 2500
+"""
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.db.session import get_async_db, get_db, get_read_db
+from app.main import app
+from app.models.base import Base
+from app.models.stock import StockBasic
+from app.services.stock import _write_stock_trades
+
+def _populate(Session, stocks: int, bars: int) -> list:
+    dates = pd.bdate_range("2010-01-04", periods=bars)
+    rng = np.random.default_rng(0)
+    codes = [f"{i:06d}" for i in range(1, stocks + 1)]
+    with Session() as session:
+        session.add_all([StockBasic(code=code, name=f"股票{code}", update_time=pd.Timestamp.now()) for code in codes])
+        session.commit()
+        for stock_id in range(1, stocks + 1):
+            close = np.round(10 + np.cumsum(rng.normal(0, 0.2, bars)), 2)
+            _write_stock_trades(session, stock_id, pd.DataFrame({
+                "trade_date": dates,
+                "open_price": close,
+                "high_price": close,
+                "low_price": close,
+                "close_price": close,
+                "volume": rng.integers(1, 1_000_000, bars),
+                "amount": close * 1000
+            }))
+        session.commit()
+    return codes
+
+def _pull_json(client: TestClient, codes: list):
+    """逐只股票按游标分页拉取，返回 (行数, 字节数)"""
+    rows = size = 0
+    for code in codes:
+        cursor = None
+        while True:
+            params = {"limit": 100, "include_total": "false"}
+            if cursor:
+                params["cursor"] = cursor
+            response = client.get(f"/api/v1/stocks/trades/{code}", params=params)
+            response.raise_for_status()
+            page = response.json()
+            rows += len(page["items"])
+            size += len(response.content)
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+    return rows, size
+
+def _pull_bulk(client: TestClient, codes: list, format: str):
+    """一次拉取全部股票，返回 (解码后的行数, 字节数)"""
+    response = client.get("/api/v1/stocks/trades/bulk", params={"codes": ",".join(codes), "format": format})
+    response.raise_for_status()
+    if format == "arrow":
+        rows = pa.ipc.open_stream(response.content).read_all().num_rows
+    else:
+        rows = pq.read_table(io.BytesIO(response.content)).num_rows
+    return rows, len(response.content)
+
+def main():
+    parser = argparse.ArgumentParser(description="批量历史数据拉取基准测试")
+    parser.add_argument("--stocks", type=int, default=50, help="股票数量")
+    parser.add_argument("--bars", type=int, default=2500, help="每只股票的交易日数")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_bulk_export.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    codes = _populate(Session, args.stocks, args.bars)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    AsyncBenchSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def override_get_async_db():
+        async with AsyncBenchSession() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    try:
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            json_rows, size = _pull_json(client, codes)
+            elapsed = time.perf_counter() - started
+            print(f"json       rows={json_rows} bytes={size:,} elapsed={elapsed:.2f}s")
+
+            for format in ("arrow", "parquet"):
+                started = time.perf_counter()
+                rows, size = _pull_bulk(client, codes, format)
+                elapsed = time.perf_counter() - started
+                print(f"{format:<10} rows={rows} bytes={size:,} elapsed={elapsed:.2f}s")
+                if rows != json_rows:
+                    raise RuntimeError(f"{format} 返回 {rows} 行，与 JSON 接口的 {json_rows} 行不一致")
+    finally:
+        app.dependency_overrides.clear()
+        # aiosqlite 连接的工作线程不是守护线程，不释放时脚本无法退出
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+if __name__ == "__main__":
+    main()
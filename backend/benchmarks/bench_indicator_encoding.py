@@ -0,0 +1,73 @@
+"""技术指标响应编码基准测试
+
+对约10年（默认2500个交易日）的日线计算一次技术指标，比较：
+- nan：逐元素调用 handle_nan 与向量化 nan_to_none 把指标数组转换为可序列化列表的耗时
+- encode：原实现（jsonable_encoder + 标准库 json）、orjson 和列式格式（转换 + orjson）的序列化耗时
+- size：各格式的原始、gzip 和 Brotli 压缩后大小及压缩耗时
+
+    cd backend && python -m benchmarks.bench_indicator_encoding --bars 2500 --repeat 50
+"""
+import argparse
+import gzip
+import json
+import time
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from app.api.v1.endpoints.analysis import _calculate_indicators
+from app.core.config import settings
+from app.services import analysis
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def _measure(func, repeat: int):
+    """返回多次执行的最短耗时（毫秒）和最后一次的结果"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
+
+def _legacy_json(results) -> bytes:
+    return json.dumps(jsonable_encoder(results), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def main():
+    parser = argparse.ArgumentParser(description="技术指标响应编码基准测试")
+    parser.add_argument("--bars", type=int, default=2500, help="交易日数，2500约为10年")
+    parser.add_argument("--repeat", type=int, default=50, help="每项重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2014-01-02", periods=args.bars).strftime("%Y-%m-%d").tolist()
+    prices = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, args.bars))), 2).tolist()
+    volumes = rng.integers(1, 1_000_000, args.bars).tolist()
+    results = _calculate_indicators({"close": prices, "volume": volumes}, dates)
+
+    raw = pd.Series(prices).rolling(window=20).mean().to_numpy()
+    handle_ms, _ = _measure(lambda: [analysis.handle_nan(x) for x in raw.tolist()], args.repeat)
+    vector_ms, _ = _measure(lambda: analysis.nan_to_none(raw), args.repeat)
+    print(f"nan        bars={args.bars} handle_nan={handle_ms:.3f}ms nan_to_none={vector_ms:.3f}ms "
+          f"speedup={handle_ms / vector_ms:.1f}x (单个序列)")
+
+    encoders = [
+        ("legacy", lambda: _legacy_json(results)),
+        ("orjson", lambda: orjson.dumps(results)),
+        ("columnar", lambda: orjson.dumps(analysis.indicators_to_columnar(results))),
+    ]
+    for name, encode in encoders:
+        encode_ms, body = _measure(encode, args.repeat)
+        gzip_ms, gzipped = _measure(lambda: gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL), args.repeat)
+        line = (f"{name:<10} encode={encode_ms:.3f}ms raw={len(body)}B "
+                f"gzip={len(gzipped)}B ({gzip_ms:.3f}ms)")
+        if brotli is not None:
+            br_ms, compressed = _measure(lambda: brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY), args.repeat)
+            line += f" br={len(compressed)}B ({br_ms:.3f}ms)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""全市场技术指标基准测试
+
+对比逐只股票调用 analysis.calculate_* 与按列批量计算的耗时。
+
+    cd backend && python -m benchmarks.bench_market_indicators --stocks 5000 --bars 250
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from app.services import analysis
+from app.services.market_analysis import build_price_matrix, calculate_market_indicators
+
+def _synthetic_trades(stocks: int, bars: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range("2020-01-01", periods=bars)
+    codes = np.repeat([f"{i:06d}" for i in range(stocks)], bars)
+    close = 10 + np.cumsum(rng.normal(0, 0.2, (stocks, bars)), axis=1)
+    return pd.DataFrame({
+        "code": codes,
+        "trade_date": np.tile(dates, stocks),
+        "close_price": np.round(close.ravel(), 2),
+        "volume": rng.integers(1, 1_000_000, stocks * bars)
+    })
+
+def _per_stock(trades: pd.DataFrame) -> None:
+    for _, group in trades.groupby("code", sort=False):
+        prices = group["close_price"].tolist()
+        volumes = group["volume"].tolist()
+        analysis.calculate_ma(prices, 5)
+        analysis.calculate_ma(prices, 10)
+        analysis.calculate_ma(prices, 20)
+        analysis.calculate_macd(prices)
+        analysis.calculate_rsi(prices)
+        analysis.calculate_bollinger_bands(prices)
+        analysis.calculate_volume_ma(volumes)
+
+def main():
+    parser = argparse.ArgumentParser(description="全市场技术指标基准测试")
+    parser.add_argument("--stocks", type=int, default=5000, help="股票数量")
+    parser.add_argument("--bars", type=int, default=250, help="每只股票的交易日数")
+    args = parser.parse_args()
+
+    trades = _synthetic_trades(args.stocks, args.bars)
+
+    started = time.perf_counter()
+    _per_stock(trades)
+    loop_elapsed = time.perf_counter() - started
+    print(f"per-stock  stocks={args.stocks} bars={args.bars} elapsed={loop_elapsed:.2f}s")
+
+    started = time.perf_counter()
+    matrix = build_price_matrix(trades)
+    build_elapsed = time.perf_counter() - started
+    calculate_market_indicators(matrix)
+    batch_elapsed = time.perf_counter() - started
+    print(f"batch      stocks={args.stocks} bars={args.bars} elapsed={batch_elapsed:.2f}s (matrix build {build_elapsed:.2f}s)")
+    print(f"speedup    {loop_elapsed / batch_elapsed:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""实时行情快照基准测试
+
+用全市场规模的回放行情测量：
+- refresh：由 DataFrame 构建快照并计算增量的耗时，以及增量与完整快照的 JSON 大小
+- lookup：按单个代码和按一批代码查询快照的耗时（微秒）
+
+    cd backend && python -m benchmarks.bench_quotes --stocks 5500 --batch 100
+"""
+import argparse
+import time
+import numpy as np
+import orjson
+from app.services.quotes import QuoteStore
+from tests.fakes import generate_spot_snapshots
+
+def _best_us(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="实时行情快照基准测试")
+    parser.add_argument("--stocks", type=int, default=5500, help="股票数量")
+    parser.add_argument("--snapshots", type=int, default=20, help="回放的快照数")
+    parser.add_argument("--change-ratio", type=float, default=0.2, help="每次刷新变化的股票比例")
+    parser.add_argument("--batch", type=int, default=100, help="批量查询的股票数")
+    parser.add_argument("--repeat", type=int, default=2000, help="查询重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    codes = [f"{i:06d}" for i in range(args.stocks)]
+    frames = generate_spot_snapshots(codes, count=args.snapshots, change_ratio=args.change_ratio)
+    store = QuoteStore()
+    store.update(frames[0])
+
+    refresh_ms, delta_bytes = [], []
+    for frame in frames[1:]:
+        started = time.perf_counter()
+        delta = store.update(frame)
+        refresh_ms.append((time.perf_counter() - started) * 1000)
+        delta_bytes.append(len(orjson.dumps(delta)) if delta else 0)
+    snapshot = store.snapshot
+    full_bytes = len(orjson.dumps(snapshot.quotes(codes)))
+    print(f"refresh    stocks={args.stocks} p50={np.percentile(refresh_ms, 50):.2f}ms max={max(refresh_ms):.2f}ms "
+          f"delta={int(np.mean(delta_bytes))}B full={full_bytes}B")
+
+    rng = np.random.default_rng(0)
+    batch = rng.choice(codes, args.batch, replace=False).tolist()
+    single_us = _best_us(lambda: snapshot.quote(batch[0]), args.repeat)
+    batch_us = _best_us(lambda: snapshot.quotes(batch), args.repeat)
+    fields_us = _best_us(lambda: snapshot.quotes(batch, ["price", "change_pct"]), args.repeat)
+    print(f"lookup     single={single_us:.1f}us batch{args.batch}={batch_us:.1f}us "
+          f"batch{args.batch}(2 fields)={fields_us:.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""周期K线读取基准测试
+
+在临时数据库中生成约10年的日线并重建周期K线，比较长周期图表的两种读取方式：
+- daily：读取全部日线后在内存中按周期聚合（原先客户端的做法）
+- rollup：直接读取预先聚合的周期K线
+
+同时统计增量更新一个交易日时维护周期K线的耗时。
+
+    cd backend && python -m benchmarks.bench_rollups --stocks 20 --bars 2500 --repeat 20
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, select
+from sqlalchemy.orm import sessionmaker
+from app.db.session import create_sqlite_engine
+from app.models.base import Base
+from app.models.rollup import StockTradeRollup
+from app.models.stock import StockBasic, StockTrade
+from app.services import rollup
+from app.services.stock import _write_stock_trades
+
+def _seed(Session, stocks: int, bars: int) -> None:
+    dates = pd.bdate_range("2014-01-02", periods=bars)
+    rng = np.random.default_rng(0)
+    with Session() as session:
+        session.add_all([StockBasic(code=f"{i:06d}", name=f"股票{i}", update_time=pd.Timestamp.now()) for i in range(1, stocks + 1)])
+        session.commit()
+        for stock_id in range(1, stocks + 1):
+            close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, bars))), 2)
+            _write_stock_trades(session, stock_id, pd.DataFrame({
+                "trade_date": dates,
+                "open_price": close,
+                "high_price": close * 1.01,
+                "low_price": close * 0.99,
+                "close_price": close,
+                "volume": rng.integers(1, 1_000_000, bars),
+                "amount": close * 1000
+            }))
+        rollup.rebuild_rollups(session)
+        session.commit()
+
+def _read_daily(session, period: str) -> int:
+    rows = session.execute(
+        select(*[getattr(StockTrade, column) for column in rollup.DAILY_COLUMNS])
+        .where(StockTrade.stock_id == 1)
+        .order_by(StockTrade.trade_date)
+    ).all()
+    return len(rollup.resample_bars(pd.DataFrame(rows, columns=rollup.DAILY_COLUMNS), period))
+
+def _read_rollup(session, period: str) -> int:
+    return len(session.execute(
+        select(StockTradeRollup)
+        .where(StockTradeRollup.stock_id == 1, StockTradeRollup.period == period)
+        .order_by(StockTradeRollup.trade_date)
+    ).all())
+
+def _measure(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="周期K线读取基准测试")
+    parser.add_argument("--stocks", type=int, default=20, help="股票数量")
+    parser.add_argument("--bars", type=int, default=2500, help="每只股票的交易日数，2500约为10年")
+    parser.add_argument("--repeat", type=int, default=20, help="每项重复次数，取最短耗时")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_rollups.db")
+    engine = create_sqlite_engine(path)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    started = time.perf_counter()
+    _seed(Session, args.stocks, args.bars)
+    print(f"seed       stocks={args.stocks} bars={args.bars} elapsed={time.perf_counter() - started:.2f}s")
+
+    with Session() as session:
+        for period in rollup.PERIODS:
+            rows = _read_rollup(session, period)
+            daily_ms = _measure(lambda: _read_daily(session, period), args.repeat)
+            rollup_ms = _measure(lambda: _read_rollup(session, period), args.repeat)
+            print(f"{period:<10} rows {args.bars} -> {rows} ({args.bars / rows:.0f}x fewer) "
+                  f"daily={daily_ms:.2f}ms rollup={rollup_ms:.2f}ms speedup={daily_ms / rollup_ms:.1f}x")
+
+        last = session.execute(select(func.max(StockTrade.trade_date))).scalar()
+        next_day = (pd.Timestamp(last) + pd.offsets.BDay(1)).date()
+        bar = pd.DataFrame({"trade_date": [next_day], "open_price": [10.0], "high_price": [10.5], "low_price": [9.5],
+                            "close_price": [10.2], "volume": [1000], "amount": [10000.0]})
+        started = time.perf_counter()
+        for stock_id in range(1, args.stocks + 1):
+            _write_stock_trades(session, stock_id, bar)
+            rollup.update_rollups(session, stock_id, bar)
+        elapsed = time.perf_counter() - started
+        session.commit()
+        print(f"increment  stocks={args.stocks} elapsed={elapsed * 1000:.1f}ms ({elapsed * 1000 / args.stocks:.2f}ms/stock, 含写入日线)")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
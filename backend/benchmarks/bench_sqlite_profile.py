@@ -0,0 +1,112 @@
+"""SQLite 连接配置基准测试
+
+在临时数据库中写入历史日线后，用 update_stock_trades 执行一次全市场交易数据更新（单个长事务），
+同时由多个读线程不断查询单只股票最近100个交易日，对比默认配置（回滚日志、默认缓存）与
+调优配置（WAL、synchronous=NORMAL、mmap、独立的只读连接池）下读取延迟的分布。
+
+    cd backend && python -m benchmarks.bench_sqlite_profile --stocks 300 --readers 8
+"""
+import argparse
+import logging
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.db.session import create_sqlite_engine
+from app.models.base import Base
+from app.models.stock import StockBasic
+from app.services.stock import _write_stock_trades, update_stock_trades
+from tests.fakes import FakeTradeProvider
+
+READ_QUERY = text("""
+    SELECT trade_date, open_price, high_price, low_price, close_price, volume
+    FROM stock_trades
+    WHERE stock_id = :stock_id
+    ORDER BY trade_date DESC
+    LIMIT 100
+""")
+
+def _engines(path: str, profile: str):
+    if profile == "tuned":
+        return create_sqlite_engine(path), create_sqlite_engine(path, read_only=True)
+    # 与改造前相同：默认日志模式和缓存，读写共用一个引擎
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60})
+    return engine, engine
+
+def _seed(Session, stocks: int, bars: int) -> None:
+    dates = pd.bdate_range(end=pd.Timestamp.today() - pd.Timedelta(days=120), periods=bars)
+    rng = np.random.default_rng(0)
+    with Session() as session:
+        session.add_all([StockBasic(code=f"{i:06d}", name=f"股票{i}", update_time=pd.Timestamp.now()) for i in range(1, stocks + 1)])
+        session.commit()
+        for stock_id in range(1, stocks + 1):
+            close = np.round(10 + np.cumsum(rng.normal(0, 0.2, bars)), 2)
+            _write_stock_trades(session, stock_id, pd.DataFrame({
+                "trade_date": dates,
+                "open_price": close,
+                "high_price": close,
+                "low_price": close,
+                "close_price": close,
+                "volume": rng.integers(1, 1_000_000, bars),
+                "amount": close * 1000
+            }))
+        session.commit()
+
+def _reader(engine, stocks: int, stop: threading.Event, latencies: list, seed: int) -> None:
+    rng = np.random.default_rng(seed)
+    while not stop.is_set():
+        started = time.perf_counter()
+        with engine.connect() as connection:
+            connection.execute(READ_QUERY, {"stock_id": int(rng.integers(1, stocks + 1))}).fetchall()
+        latencies.append(time.perf_counter() - started)
+
+def _run_profile(profile: str, args) -> None:
+    path = os.path.join(tempfile.mkdtemp(), f"bench_{profile}.db")
+    writer_engine, reader_engine = _engines(path, profile)
+    Base.metadata.create_all(bind=writer_engine)
+    Session = sessionmaker(bind=writer_engine)
+    _seed(Session, args.stocks, args.bars)
+
+    stop = threading.Event()
+    latencies = []
+    readers = [
+        threading.Thread(target=_reader, args=(reader_engine, args.stocks, stop, latencies, i))
+        for i in range(args.readers)
+    ]
+    for thread in readers:
+        thread.start()
+
+    started = time.perf_counter()
+    with Session() as session:
+        result = update_stock_trades(session, days=args.days, provider=FakeTradeProvider(), max_workers=4, rate_limit=0)
+    ingest_elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    values = np.array(latencies) * 1000
+    print(
+        f"{profile:<8} ingest_rows={result['updated_count']} ingest={ingest_elapsed:.1f}s "
+        f"reads={len(values)} p50={np.percentile(values, 50):.1f}ms p99={np.percentile(values, 99):.1f}ms max={values.max():.1f}ms"
+    )
+    reader_engine.dispose()
+    writer_engine.dispose()
+
+def main():
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="SQLite 连接配置基准测试")
+    parser.add_argument("--stocks", type=int, default=300, help="股票数量")
+    parser.add_argument("--bars", type=int, default=1000, help="已有历史交易日数")
+    parser.add_argument("--days", type=int, default=90, help="本次更新的天数")
+    parser.add_argument("--readers", type=int, default=8, help="并发读线程数")
+    args = parser.parse_args()
+
+    for profile in ("default", "tuned"):
+        _run_profile(profile, args)
+
+if __name__ == "__main__":
+    main()
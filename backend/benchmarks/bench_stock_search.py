@@ -0,0 +1,91 @@
+"""股票搜索基准测试
+
+模拟多个用户同时在股票选择框中逐字输入，对比 LIKE '%term%' 查询与内存前缀索引的延迟分布。
+
+    cd backend && python -m benchmarks.bench_stock_search --stocks 5500 --users 16
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from sqlalchemy import create_engine, or_
+from sqlalchemy.orm import sessionmaker
+from app.models.base import Base
+from app.models.stock import StockBasic
+from app.services.search import StockSearchIndex
+
+CHARACTERS = "平安银行浦发招商中国石油化工科技电子医药生物能源材料控股集团股份实业发展华夏建设汽车机械"
+
+def _typing_sequences(codes, names, count, rng):
+    """生成逐字输入的查询序列，一半按代码输入，一半按名称输入"""
+    sequences = []
+    for i in range(count):
+        index = int(rng.integers(len(codes)))
+        target = codes[index] if i % 2 == 0 else names[index]
+        sequences.append([target[:n] for n in range(1, len(target) + 1)])
+    return sequences
+
+def _percentiles(latencies):
+    values = np.array(latencies) * 1000
+    return f"p50={np.percentile(values, 50):.2f}ms p99={np.percentile(values, 99):.2f}ms max={values.max():.2f}ms"
+
+def main():
+    parser = argparse.ArgumentParser(description="股票搜索基准测试")
+    parser.add_argument("--stocks", type=int, default=5500, help="股票数量")
+    parser.add_argument("--users", type=int, default=16, help="并发用户数")
+    parser.add_argument("--sessions", type=int, default=400, help="输入会话数")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    codes = [f"{600000 + i:06d}" if i % 2 else f"{i:06d}" for i in range(args.stocks)]
+    names = ["".join(rng.choice(list(CHARACTERS), 4)) for _ in range(args.stocks)]
+
+    path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        session.add_all([StockBasic(code=c, name=n, update_time=datetime.now()) for c, n in zip(codes, names)])
+        session.commit()
+
+    index = StockSearchIndex()
+    started = time.perf_counter()
+    index.build(zip(codes, names, [None] * len(codes), [None] * len(codes)))
+    print(f"index      build={(time.perf_counter() - started) * 1000:.0f}ms stocks={args.stocks}")
+
+    sequences = _typing_sequences(codes, names, args.sessions, rng)
+
+    def like_session(terms):
+        latencies = []
+        with Session() as session:
+            for term in terms:
+                started = time.perf_counter()
+                pattern = f"%{term}%"
+                query = session.query(StockBasic).filter(or_(StockBasic.code.like(pattern), StockBasic.name.like(pattern)))
+                query.count()
+                query.limit(20).all()
+                latencies.append(time.perf_counter() - started)
+        return latencies
+
+    def index_session(terms):
+        latencies = []
+        with Session() as session:
+            for term in terms:
+                started = time.perf_counter()
+                page = [code for code, _ in index.search(term)[:20]]
+                session.query(StockBasic).filter(StockBasic.code.in_(page)).all()
+                latencies.append(time.perf_counter() - started)
+        return latencies
+
+    for label, worker in [("like", like_session), ("index", index_session)]:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as executor:
+            latencies = [latency for result in executor.map(worker, sequences) for latency in result]
+        elapsed = time.perf_counter() - started
+        print(f"{label:<10} users={args.users} queries={len(latencies)} qps={len(latencies) / elapsed:.0f} {_percentiles(latencies)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""stock_trades 唯一索引基准测试
+
+在临时 SQLite 文件中按股票批量 upsert 指定行数的日线数据，统计写入吞吐，
+并对比有无 (stock_id, trade_date) 索引时按日期区间查询单只股票的耗时。
+
+    cd backend && python -m benchmarks.bench_trade_index --rows 10000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.models.base import Base
+from app.models.stock import StockBasic
+from app.services.stock import _write_stock_trades
+
+def _populate(session, stocks: int, bars: int) -> float:
+    """写入 stocks × bars 条数据，返回耗时"""
+    dates = pd.bdate_range("2000-01-03", periods=bars)
+    rng = np.random.default_rng(0)
+    session.add_all([StockBasic(code=f"{i:06d}", name=f"股票{i}", update_time=pd.Timestamp.now()) for i in range(1, stocks + 1)])
+    session.commit()
+
+    started = time.perf_counter()
+    for stock_id in range(1, stocks + 1):
+        close = np.round(10 + np.cumsum(rng.normal(0, 0.2, bars)), 2)
+        df = pd.DataFrame({
+            "trade_date": dates,
+            "open_price": close,
+            "high_price": close,
+            "low_price": close,
+            "close_price": close,
+            "volume": rng.integers(1, 1_000_000, bars),
+            "amount": close * 1000
+        })
+        _write_stock_trades(session, stock_id, df)
+        if stock_id % 100 == 0:
+            session.commit()
+    session.commit()
+    return time.perf_counter() - started
+
+def _time_lookups(connection, stocks: int, repeat: int) -> float:
+    """随机抽取股票做一年区间查询，返回平均耗时（毫秒）"""
+    rng = np.random.default_rng(1)
+    query = text("""
+        SELECT * FROM stock_trades 
+        WHERE stock_id = :stock_id AND trade_date BETWEEN :start AND :end 
+        ORDER BY trade_date DESC
+    """)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        connection.execute(query, {"stock_id": int(rng.integers(1, stocks + 1)), "start": "2005-01-01", "end": "2005-12-31"}).fetchall()
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="stock_trades 唯一索引基准测试")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="总行数")
+    parser.add_argument("--bars", type=int, default=2500, help="每只股票的交易日数")
+    parser.add_argument("--lookups", type=int, default=20, help="查询次数")
+    args = parser.parse_args()
+
+    stocks = max(args.rows // args.bars, 1)
+    path = os.path.join(tempfile.mkdtemp(), "bench_trades.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    elapsed = _populate(session, stocks, args.bars)
+    session.close()
+    total = stocks * args.bars
+    print(f"upsert     rows={total} stocks={stocks} elapsed={elapsed:.1f}s throughput={total / elapsed:,.0f} rows/s")
+
+    with engine.connect() as connection:
+        indexed = _time_lookups(connection, stocks, args.lookups)
+        print(f"lookup     index=yes avg={indexed:.2f}ms")
+        connection.execute(text("DROP INDEX uq_stock_trades_stock_id_trade_date"))
+        scanned = _time_lookups(connection, stocks, max(args.lookups // 10, 1))
+        print(f"lookup     index=no  avg={scanned:.2f}ms")
+    print(f"db size    {os.path.getsize(path) / 1024 / 1024:.0f}MB ({path})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""性能基准测试套件
+
+在临时 SQLite 数据库中用 tests/factories.py 的批量生成函数构造数据（股票数 × 多年日线），
+通过 tests/fakes.py 的 FakeAkshare 替换 akshare，依次计时：
+
+- basics：股票基础数据全量写入和无变化时的重复更新（update_stock_basics）
+- ingestion：交易数据采集入库（update_stock_trades，经由 AkshareTradeProvider 解析模拟数据）
+- query：股票列表分页、交易数据日期范围查询和游标翻页
+- calculate：analysis.calculate_* 各函数
+- endpoint：GET /api/v1/analysis/indicators/{stock_code}（关闭指标缓存）
+
+每项重复 --repeat 次，结果（最小值、中位数、吞吐量等）连同提交号、环境和数据规模写入 JSON 文件。
+指定 --compare 时与之前的结果逐项比较，中位数变慢超过 --threshold 倍时以非零状态退出，便于在 CI 中比较不同提交。
+
+    cd backend && python -m benchmarks.suite --scale small --output bench.json
+    cd backend && python -m benchmarks.suite --scale small --compare bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.api.v1.endpoints import analysis as analysis_endpoints
+from app.db.session import create_sqlite_engine, get_async_db, get_db, get_read_db
+from app.main import app
+from app.models.base import Base
+from app.services import analysis, ingestion, stock
+from tests.factories import bulk_create_stock_basics, bulk_create_stock_trades
+from tests.fakes import FakeAkshare
+
+TRADING_DAYS_PER_YEAR = 250
+
+# 数据规模：stocks 为构造的股票数，years 为每只股票的历史年数，
+# ingest_stocks/ingest_days 为采集入库测试的股票数和天数，sample 为查询和接口测试抽样的股票数
+SCALES = {
+    "small": {"stocks": 500, "years": 2, "ingest_stocks": 100, "ingest_days": 120, "sample": 50},
+    "medium": {"stocks": 2000, "years": 5, "ingest_stocks": 300, "ingest_days": 250, "sample": 100},
+    "large": {"stocks": 5000, "years": 10, "ingest_stocks": 1000, "ingest_days": 250, "sample": 200},
+}
+
+def measure(fn: Callable[[], Optional[int]], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """重复执行 fn 并统计耗时
+
+    fn 返回本次处理的条目数（行数、请求数等），用于计算吞吐量。setup 在每次计时前执行，不计入耗时。
+    """
+    timings = []
+    items = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        items = fn()
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        "repeat": repeat,
+        "min": min(timings),
+        "median": median,
+        "mean": statistics.fmean(timings),
+        "stdev": statistics.stdev(timings) if repeat > 1 else 0.0,
+        "items": items,
+        "items_per_second": items / median if items and median > 0 else None
+    }
+
+def _git(*args) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict:
+    """记录结果对应的提交和运行环境"""
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+    }
+
+@contextmanager
+def fake_akshare(fake: FakeAkshare):
+    """把 stock 和 ingestion 模块中的 akshare 替换为模拟实现"""
+    originals = (stock.ak, ingestion.ak)
+    stock.ak = ingestion.ak = fake
+    try:
+        yield fake
+    finally:
+        stock.ak, ingestion.ak = originals
+
+class Database:
+    """临时 SQLite 数据库，使用与应用相同的连接配置"""
+
+    def __init__(self, name: str):
+        self.path = os.path.join(tempfile.mkdtemp(), f"{name}.db")
+        self.engine = create_sqlite_engine(self.path)
+        Base.metadata.create_all(bind=self.engine)
+        self.Session = sessionmaker(bind=self.engine)
+
+    def reset(self) -> None:
+        Base.metadata.drop_all(bind=self.engine)
+        Base.metadata.create_all(bind=self.engine)
+
+    def dispose(self) -> None:
+        self.engine.dispose()
+
+def bench_basics(scale: Dict, repeat: int) -> Dict[str, Dict]:
+    db = Database("basics")
+    results = {}
+    with fake_akshare(FakeAkshare(stock_count=scale["stocks"])):
+        def upsert():
+            with db.Session() as session:
+                stock.update_stock_basics(session)
+            return scale["stocks"]
+
+        results["basics.upsert_insert"] = measure(upsert, repeat, setup=db.reset)
+        # 数据库中已有相同的记录，只做差异比较
+        results["basics.upsert_unchanged"] = measure(upsert, repeat)
+    db.dispose()
+    return results
+
+def bench_ingestion(scale: Dict, repeat: int) -> Dict[str, Dict]:
+    db = Database("ingestion")
+    results = {}
+
+    def setup():
+        db.reset()
+        with db.Session() as session:
+            bulk_create_stock_basics(session, scale["ingest_stocks"])
+
+    def ingest(incremental: bool = False):
+        with db.Session() as session:
+            result = stock.update_stock_trades(session, days=scale["ingest_days"], incremental=incremental, rate_limit=0)
+        return result["updated_count"]
+
+    with fake_akshare(FakeAkshare(stock_count=scale["ingest_stocks"])):
+        results["ingestion.update_stock_trades"] = measure(ingest, repeat, setup=setup)
+        # 已有数据时的增量更新，只拉取最新交易日之后的数据
+        results["ingestion.update_stock_trades_incremental"] = measure(lambda: ingest(incremental=True), repeat)
+    db.dispose()
+    return results
+
+def seed_market(scale: Dict) -> Dict:
+    """构造查询和接口测试共用的数据库"""
+    db = Database("market")
+    days = scale["years"] * TRADING_DAYS_PER_YEAR
+    started = time.perf_counter()
+    with db.Session() as session:
+        code_ids = bulk_create_stock_basics(session, scale["stocks"])
+        rows = bulk_create_stock_trades(session, list(code_ids.values()), days)
+    elapsed = time.perf_counter() - started
+    rng = np.random.default_rng(0)
+    sample = rng.choice(sorted(code_ids), min(scale["sample"], len(code_ids)), replace=False).tolist()
+    return {
+        "db": db,
+        "codes": sorted(code_ids),
+        "sample": sample,
+        "days": days,
+        "seed": {"repeat": 1, "min": elapsed, "median": elapsed, "mean": elapsed, "stdev": 0.0, "items": rows, "items_per_second": rows / elapsed}
+    }
+
+def bench_queries(market: Dict, repeat: int) -> Dict[str, Dict]:
+    db = market["db"]
+    sample = market["sample"]
+    end = date.today()
+    one_year = (end - timedelta(days=365)).strftime('%Y-%m-%d')
+    results = {}
+
+    with db.Session() as session:
+        def basics_pages():
+            count, cursor = 0, None
+            while True:
+                page = stock.get_stock_basics(session, limit=100, cursor=cursor, include_total=False)
+                count += len(page["items"])
+                cursor = page["next_cursor"]
+                if not cursor:
+                    return count
+
+        def basics_offset():
+            # 逐页使用 skip，每页带总数统计，与前端默认分页方式一致
+            count = 0
+            for skip in range(0, len(market["codes"]), 100):
+                count += len(stock.get_stock_basics(session, skip=skip, limit=100)["items"])
+            return count
+
+        def trades_date_range():
+            return sum(
+                len(stock.get_stock_trades(session, code, start_date=one_year, limit=250)["items"])
+                for code in sample
+            )
+
+        def trades_pages():
+            count = 0
+            for code in sample[:10]:
+                cursor = None
+                while True:
+                    page = stock.get_stock_trades(session, code, limit=100, cursor=cursor, include_total=False)
+                    count += len(page["items"])
+                    cursor = page["next_cursor"]
+                    if not cursor:
+                        break
+            return count
+
+        results["query.basics_pages_cursor"] = measure(basics_pages, repeat)
+        results["query.basics_pages_offset"] = measure(basics_offset, repeat)
+        results["query.trades_date_range"] = measure(trades_date_range, repeat)
+        results["query.trades_pages_cursor"] = measure(trades_pages, repeat)
+    return results
+
+def bench_calculations(market: Dict, repeat: int) -> Dict[str, Dict]:
+    rng = np.random.default_rng(0)
+    days = market["days"]
+    series = [
+        (np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, days))), 2).tolist(), rng.integers(100_000, 10_000_000, days).tolist())
+        for _ in range(len(market["sample"]))
+    ]
+    functions = {
+        "calculate_ma": lambda prices, volumes: analysis.calculate_ma(prices, 20),
+        "calculate_macd": lambda prices, volumes: analysis.calculate_macd(prices),
+        "calculate_rsi": lambda prices, volumes: analysis.calculate_rsi(prices),
+        "calculate_bollinger_bands": lambda prices, volumes: analysis.calculate_bollinger_bands(prices),
+        "calculate_volume_ma": lambda prices, volumes: analysis.calculate_volume_ma(volumes),
+        "calculate_price_change": lambda prices, volumes: analysis.calculate_price_change(prices),
+    }
+    results = {}
+    for name, fn in functions.items():
+        def run(fn=fn):
+            for prices, volumes in series:
+                fn(prices, volumes)
+            return len(series)
+        results[f"calculate.{name}"] = measure(run, repeat)
+    return results
+
+def bench_endpoint(market: Dict, repeat: int) -> Dict[str, Dict]:
+    db = market["db"]
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db.path}")
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    def override_get_db():
+        session = db.Session()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    cache = analysis_endpoints.indicator_cache
+    analysis_endpoints.indicator_cache = None
+    results = {}
+    try:
+        with TestClient(app) as client:
+            def indicators():
+                for code in market["sample"]:
+                    client.get(f"/api/v1/analysis/indicators/{code}").raise_for_status()
+                return len(market["sample"])
+
+            def indicators_full_history():
+                start = (date.today() - timedelta(days=market["days"] * 2)).strftime('%Y-%m-%d')
+                for code in market["sample"]:
+                    client.get(f"/api/v1/analysis/indicators/{code}?start_date={start}").raise_for_status()
+                return len(market["sample"])
+
+            results["endpoint.indicators_default"] = measure(indicators, repeat)
+            results["endpoint.indicators_full_history"] = measure(indicators_full_history, repeat)
+    finally:
+        analysis_endpoints.indicator_cache = cache
+        app.dependency_overrides.clear()
+        asyncio.run(async_engine.dispose())
+    return results
+
+GROUPS = ["basics", "ingestion", "query", "calculate", "endpoint"]
+
+def run_suite(scale_name: str, repeat: int, groups: List[str]) -> Dict:
+    scale = SCALES[scale_name]
+    results = {}
+    if "basics" in groups:
+        results.update(bench_basics(scale, repeat))
+    if "ingestion" in groups:
+        results.update(bench_ingestion(scale, repeat))
+    if {"query", "calculate", "endpoint"} & set(groups):
+        market = seed_market(scale)
+        results["seed.bulk_create_stock_trades"] = market["seed"]
+        if "query" in groups:
+            results.update(bench_queries(market, repeat))
+        if "calculate" in groups:
+            results.update(bench_calculations(market, repeat))
+        if "endpoint" in groups:
+            results.update(bench_endpoint(market, repeat))
+        market["db"].dispose()
+    return {
+        "environment": environment(),
+        "scale": {"name": scale_name, **scale},
+        "repeat": repeat,
+        "results": results
+    }
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """逐项比较中位数耗时，返回变慢超过阈值的项目"""
+    if current["scale"] != baseline["scale"]:
+        print("注意：两次结果的数据规模不同，比较结果仅供参考")
+    regressions = []
+    print(f"\n与 {baseline['environment'].get('commit')} 比较（中位数耗时，比值 >1 表示变慢）")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            print(f"{name:<45} {'(新增)':>10}")
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        flag = ""
+        if ratio > threshold:
+            regressions.append(name)
+            flag = "  <-- 变慢"
+        print(f"{name:<45} {before['median'] * 1000:>10.1f}ms -> {result['median'] * 1000:>10.1f}ms  {ratio:>6.2f}x{flag}")
+    return regressions
+
+def main():
+    # 关闭服务代码中的 INFO 日志，避免日志输出影响计时
+    logging.disable(logging.INFO)
+    parser = argparse.ArgumentParser(description="性能基准测试套件")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="数据规模")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数")
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS, help="要运行的测试组")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    parser.add_argument("--compare", help="与之前的结果 JSON 文件比较")
+    parser.add_argument("--threshold", type=float, default=1.25, help="中位数耗时超过基线的倍数时视为变慢")
+    args = parser.parse_args()
+
+    report = run_suite(args.scale, args.repeat, args.groups)
+    for name, result in report["results"].items():
+        throughput = f"{result['items_per_second']:,.0f}/s" if result["items_per_second"] else "-"
+        print(f"{name:<45} median={result['median'] * 1000:>10.1f}ms min={result['min'] * 1000:>10.1f}ms {throughput:>12}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项变慢超过 {args.threshold}x：{', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""从数据库重建列式行情存储
+
+在新目录中重建后整体切换，重建期间接口继续读取旧数据；旧版本的存储目录结构升级后也需执行一次。
+
+    cd backend && python -m scripts.rebuild_columnar_store
+"""
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.columnar import ColumnarStore
+
+def rebuild_columnar_store():
+    """重建列式存储"""
+    db = SessionLocal()
+    try:
+        store = ColumnarStore(settings.COLUMNAR_STORE_PATH)
+        exported = store.rebuild(db)
+        print(f"列式存储重建完成：{settings.COLUMNAR_STORE_PATH}，共{exported}只股票")
+    except Exception as e:
+        print(f"重建列式存储失败：{str(e)}")
+        raise e
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_columnar_store()
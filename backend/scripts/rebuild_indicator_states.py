@@ -0,0 +1,34 @@
+"""从日线重建最新技术指标状态
+
+已有数据库首次启用增量指标状态时执行一次，之后更新日线时会自动逐日推进。
+每处理一批股票提交一次，避免长时间持有写锁。
+
+    cd backend && python -m scripts.rebuild_indicator_states
+"""
+from sqlalchemy import select
+from app.db.session import SessionLocal
+from app.models.stock import StockTrade
+from app.services.indicator_state import rebuild_indicator_states
+
+# 每批处理的股票数
+BATCH_SIZE = 200
+
+def main():
+    """重建全部有交易数据的股票的指标状态"""
+    db = SessionLocal()
+    try:
+        stock_ids = db.execute(select(StockTrade.stock_id).distinct()).scalars().all()
+        for start in range(0, len(stock_ids), BATCH_SIZE):
+            rebuild_indicator_states(db, stock_ids[start:start + BATCH_SIZE])
+            db.commit()
+            print(f"指标状态重建进度：{min(start + BATCH_SIZE, len(stock_ids))}/{len(stock_ids)}只股票")
+        print(f"指标状态重建完成，共{len(stock_ids)}只股票")
+    except Exception as e:
+        db.rollback()
+        print(f"重建指标状态失败：{str(e)}")
+        raise e
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+"""从日线重建周、月、季度K线
+
+已有数据库首次启用周期K线时执行一次，之后更新日线时会自动增量维护。
+
+    cd backend && python -m scripts.rebuild_rollups
+"""
+from app.db.session import SessionLocal
+from app.services.rollup import rebuild_rollups
+
+def main():
+    """清空并重建全部股票的周期K线"""
+    db = SessionLocal()
+    try:
+        written = rebuild_rollups(db)
+        db.commit()
+        print(f"周期K线重建完成，共{written}条")
+    except Exception as e:
+        db.rollback()
+        print(f"重建周期K线失败：{str(e)}")
+        raise e
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
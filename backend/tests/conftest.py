@@ -1,17 +1,28 @@
+import os
+
+# 测试时使用内存 broker 和结果存储，Celery 任务在当前进程内同步执行
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("CELERY_BROKER_URL", "memory://")
+os.environ.setdefault("CELERY_RESULT_BACKEND", "cache+memory://")
+os.environ.setdefault("CELERY_TASK_ALWAYS_EAGER", "true")
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.db.session import get_db
+from app.db.session import enable_sqlite_savepoints, get_db, get_read_db, get_async_db
 from app.main import app
 from app.models.base import Base
+from app.services.cache import indicator_cache
+from app.services.quotes import quote_store
+from app.services.search import stock_search_index
 
 # 使用内存数据库进行测试
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
-engine = create_engine(
+engine = enable_sqlite_savepoints(create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+))
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 @pytest.fixture(scope="session")
@@ -32,6 +43,19 @@ def db_session(db_engine):
     transaction.rollback()
     connection.close()
 
+class SyncSessionRunner:
+    """让 async 接口通过 run_sync 使用测试事务中的同步会话
+
+    async 接口只通过 AsyncSession.run_sync 访问数据库，测试中直接在当前会话上执行，
+    与同步接口看到同一份未提交的测试数据。真实的异步驱动路径见 test_async_session.py。
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.session, *args, **kwargs)
+
 @pytest.fixture(scope="function")
 def client(db_session):
     def override_get_db():
@@ -40,7 +64,21 @@ def client(db_session):
         finally:
             pass
     
+    async def override_get_async_db():
+        yield SyncSessionRunner(db_session)
+    
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_read_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as test_client:
         yield test_client
-    app.dependency_overrides.clear() 
\ No newline at end of file
+    app.dependency_overrides.clear() 
+
+@pytest.fixture(autouse=True)
+def reset_process_caches():
+    """每个测试前清空指标缓存、搜索索引和实时行情快照，避免不同测试之间互相影响"""
+    if indicator_cache:
+        indicator_cache.clear()
+    stock_search_index.clear()
+    quote_store.clear()
+    yield
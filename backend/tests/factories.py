@@ -1,5 +1,10 @@
 from datetime import date, datetime
+from typing import Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select
 from app.models.stock import StockBasic, StockTrade
+from app.services.stock import bulk_upsert_stock_basics, classify_market
 
 def create_stock_basic(db_session, **kwargs):
     """创建股票基础数据"""
@@ -8,7 +13,8 @@ def create_stock_basic(db_session, **kwargs):
         name=kwargs.get("name", "测试股票"),
         industry=kwargs.get("industry", "测试行业"),
         market=kwargs.get("market", "主板"),
-        list_date=kwargs.get("list_date", date(2020, 1, 1))
+        list_date=kwargs.get("list_date", date(2020, 1, 1)),
+        update_time=kwargs.get("update_time", datetime.now())
     )
     db_session.add(stock)
     db_session.commit()
@@ -30,4 +36,87 @@ def create_stock_trade(db_session, stock_id, **kwargs):
     db_session.add(trade)
     db_session.commit()
     db_session.refresh(trade)
-    return trade 
\ No newline at end of file
+    return trade 
+# 批量生成数据时使用的代码前缀，每个前缀最多1000只股票
+BULK_CODE_PREFIXES = ["600", "000", "300", "601", "002", "688", "603", "001", "301", "830"]
+
+def generate_stock_basics(count: int, seed: int = 0) -> pd.DataFrame:
+    """批量生成股票基础数据
+
+    返回包含 code、name、industry、market、update_time 列的 DataFrame，可直接传给 bulk_upsert_stock_basics。
+    代码按 BULK_CODE_PREFIXES 轮流分配前缀，覆盖主板、创业板、科创板和北交所。
+    """
+    if count > len(BULK_CODE_PREFIXES) * 1000:
+        raise ValueError(f"最多生成 {len(BULK_CODE_PREFIXES) * 1000} 只股票")
+    rng = np.random.default_rng(seed)
+    index = np.arange(count)
+    prefixes = np.array(BULK_CODE_PREFIXES)[index % len(BULK_CODE_PREFIXES)]
+    codes = pd.Series([f"{prefix}{number:03d}" for prefix, number in zip(prefixes, index // len(BULK_CODE_PREFIXES))])
+    return pd.DataFrame({
+        "code": codes,
+        "name": [f"测试股票{i}" for i in index],
+        "industry": [f"测试行业{i}" for i in rng.integers(0, 80, count)],
+        "market": classify_market(codes),
+        "update_time": datetime.now()
+    })
+
+def generate_trade_bars(
+    stock_ids: Sequence[int],
+    days: int,
+    end_date: Optional[date] = None,
+    seed: int = 0
+) -> pd.DataFrame:
+    """批量生成多只股票的日线行情
+
+    每只股票生成截至 end_date 的最近 days 个工作日，价格为几何随机游走。返回按 (stock_id, trade_date)
+    排序的长表，包含 stock_id 和 TRADE_COLUMNS 列。
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=end_date or date.today(), periods=days)
+    shape = (len(stock_ids), days)
+    start = rng.uniform(5, 50, (len(stock_ids), 1))
+    close = np.round(start * np.exp(np.cumsum(rng.normal(0, 0.02, shape), axis=1)), 2)
+    open_price = np.round(close * (1 + rng.normal(0, 0.005, shape)), 2)
+    high = np.round(np.maximum(open_price, close) * 1.01, 2)
+    low = np.round(np.minimum(open_price, close) * 0.99, 2)
+    volume = rng.integers(100_000, 10_000_000, shape)
+    return pd.DataFrame({
+        "stock_id": np.repeat(np.asarray(stock_ids), days),
+        "trade_date": np.tile(dates.date, len(stock_ids)),
+        "open_price": open_price.ravel(),
+        "high_price": high.ravel(),
+        "low_price": low.ravel(),
+        "close_price": close.ravel(),
+        "volume": volume.ravel(),
+        "amount": np.round(volume * close, 2).ravel()
+    })
+
+def bulk_create_stock_basics(db_session, count: int, seed: int = 0) -> Dict[str, int]:
+    """批量写入股票基础数据，返回股票代码到 id 的映射"""
+    stocks = generate_stock_basics(count, seed)
+    bulk_upsert_stock_basics(db_session, stocks)
+    db_session.commit()
+    rows = db_session.execute(select(StockBasic.code, StockBasic.id).where(StockBasic.code.in_(stocks["code"].tolist())))
+    return {code: stock_id for code, stock_id in rows}
+
+def bulk_create_stock_trades(
+    db_session,
+    stock_ids: Sequence[int],
+    days: int,
+    end_date: Optional[date] = None,
+    seed: int = 0,
+    batch_size: int = 50000
+) -> int:
+    """批量写入多只股票的日线行情，返回写入的记录数
+
+    直接以 executemany 插入，不更新指标状态和列式存储，用于快速构造大数据量的测试库。
+    """
+    trades = generate_trade_bars(stock_ids, days, end_date, seed)
+    now = datetime.utcnow()
+    trades["created_at"] = now
+    trades["updated_at"] = now
+    records = trades.astype(object).to_dict(orient="records")
+    for start in range(0, len(records), batch_size):
+        db_session.execute(insert(StockTrade.__table__), records[start:start + batch_size])
+    db_session.commit()
+    return len(records)
@@ -0,0 +1,126 @@
+import time
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+from app.services.ingestion import TradeDataProvider, TRADE_COLUMN_MAPPING, TRADE_COLUMNS
+from tests.factories import generate_stock_basics
+
+class FakeTradeProvider(TradeDataProvider):
+    """本地模拟行情数据源
+
+    按工作日生成确定性的随机行情，可通过 latency 模拟网络延迟，
+    通过 fail_codes 模拟指定股票采集失败。
+    """
+
+    name = "fake"
+
+    def __init__(self, latency: float = 0.0, fail_codes=None, seed: int = 42):
+        self.latency = latency
+        self.fail_codes = set(fail_codes or [])
+        self.seed = seed
+        self.calls = []
+
+    def fetch_daily(self, code: str, start_date: date, end_date: date) -> pd.DataFrame:
+        self.calls.append((code, start_date, end_date))
+        if self.latency:
+            time.sleep(self.latency)
+        if code in self.fail_codes:
+            raise ConnectionError(f"模拟获取 {code} 失败")
+
+        dates = pd.bdate_range(start_date, end_date)
+        if len(dates) == 0:
+            return pd.DataFrame(columns=TRADE_COLUMNS)
+
+        rng = np.random.default_rng(self.seed + int(code))
+        close = 10 + np.cumsum(rng.normal(0, 0.2, len(dates)))
+        close = np.round(np.maximum(close, 1.0), 2)
+        open_price = np.round(close * (1 + rng.normal(0, 0.005, len(dates))), 2)
+        high = np.round(np.maximum(open_price, close) * 1.01, 2)
+        low = np.round(np.minimum(open_price, close) * 0.99, 2)
+        volume = rng.integers(100_000, 10_000_000, len(dates))
+
+        return pd.DataFrame({
+            "trade_date": dates,
+            "open_price": open_price,
+            "high_price": high,
+            "low_price": low,
+            "close_price": close,
+            "volume": volume,
+            "amount": np.round(volume * close, 2)
+        })
+
+class FakeAkshare:
+    """模拟 akshare 模块
+
+    提供与真实接口列名一致的股票列表、行业板块和历史行情数据，用于替换
+    app.services.stock.ak 和 app.services.ingestion.ak，在不访问网络的情况下
+    走完整的采集和解析流程。历史行情由 FakeTradeProvider 生成。
+    """
+
+    def __init__(self, stock_count: int = 5000, industry_count: int = 80, latency: float = 0.0, seed: int = 42):
+        self.stock_count = stock_count
+        self.industry_count = industry_count
+        self.latency = latency
+        self.trade_provider = FakeTradeProvider(latency=latency, seed=seed)
+
+    def _sleep(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def stock_zh_a_spot_em(self) -> pd.DataFrame:
+        self._sleep()
+        stocks = generate_stock_basics(self.stock_count)
+        return pd.DataFrame({
+            "序号": range(1, len(stocks) + 1),
+            "代码": stocks["code"],
+            "名称": stocks["name"],
+            "最新价": 10.0,
+            "涨跌幅": 0.0
+        })
+
+    stock_zh_a_spot = stock_zh_a_spot_em
+
+    def stock_board_industry_name_em(self) -> pd.DataFrame:
+        self._sleep()
+        return pd.DataFrame({
+            "排名": range(1, self.industry_count + 1),
+            "板块名称": [f"测试行业{i}" for i in range(self.industry_count)],
+            "板块代码": [f"BK{i:04d}" for i in range(self.industry_count)]
+        })
+
+    def stock_zh_a_hist(self, symbol: str, period: str = "daily", start_date: str = "", end_date: str = "", adjust: str = "") -> pd.DataFrame:
+        df = self.trade_provider.fetch_daily(
+            symbol,
+            datetime.strptime(start_date, "%Y%m%d").date(),
+            datetime.strptime(end_date, "%Y%m%d").date()
+        )
+        df = df.rename(columns={column: name for name, column in TRADE_COLUMN_MAPPING.items()})
+        df["日期"] = pd.to_datetime(df["日期"]).dt.strftime("%Y-%m-%d")
+        return df
+
+def generate_spot_snapshots(codes, count: int = 3, change_ratio: float = 0.2, seed: int = 42):
+    """生成连续的全市场实时行情快照，列名与 ak.stock_zh_a_spot_em 一致
+
+    每个快照相对上一个随机选取 change_ratio 比例的股票改变最新价、涨跌幅和成交量，用于 ReplayQuoteSource。
+    """
+    rng = np.random.default_rng(seed)
+    codes = list(codes)
+    prev_close = np.round(rng.uniform(5, 50, len(codes)), 2)
+    price = prev_close.copy()
+    volume = np.zeros(len(codes))
+    frames = []
+    for _ in range(count):
+        moved = rng.random(len(codes)) < change_ratio if frames else np.ones(len(codes), dtype=bool)
+        price = np.where(moved, np.round(price * (1 + rng.normal(0, 0.005, len(codes))), 2), price)
+        volume = np.where(moved, volume + rng.integers(100, 10_000, len(codes)), volume)
+        frames.append(pd.DataFrame({
+            "序号": range(1, len(codes) + 1),
+            "代码": codes,
+            "名称": [f"测试股票{code}" for code in codes],
+            "最新价": price,
+            "涨跌幅": np.round((price / prev_close - 1) * 100, 2),
+            "涨跌额": np.round(price - prev_close, 2),
+            "成交量": volume,
+            "昨收": prev_close
+        }))
+    return frames
@@ -1,5 +1,23 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import os
 import pytest
-from datetime import date
+import numpy as np
+import pandas as pd
+from datetime import date, datetime, timedelta
+from app.models.indicator import StockIndicatorState
+from app.models.stock import StockTrade
+from app.services.indicator_state import update_indicator_state
+from app.core.config import settings
+from app.services.cache import IndicatorCache, indicator_cache
+from app.services.columnar import ColumnarStore
+from app.services import stock as stock_service
+from app.services import analysis, indicator_state
+from app.services.market_analysis import load_price_matrix, calculate_market_indicators, extract_symbol
+from tests.fakes import FakeTradeProvider
 from tests.factories import create_stock_basic, create_stock_trade
 
 def test_get_technical_indicators(client, db_session):
@@ -45,37 +63,60 @@ def test_export_stock_basics(client, db_session):
     # 测试CSV导出
     response = client.get("/api/v1/analysis/export/basics?format=csv")
     assert response.status_code == 200
-    data = response.json()
-    assert "filename" in data
-    assert data["filename"].endswith(".csv")
+    assert response.headers["content-type"].startswith("text/csv")
+    assert ".csv" in response.headers["content-disposition"]
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0][:3] == ["id", "code", "name"]
+    assert [row[1] for row in rows[1:]] == ["000001", "000002"]
+    
+    # 测试NDJSON导出
+    response = client.get("/api/v1/analysis/export/basics?format=ndjson")
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["name"] for record in records] == ["测试股票1", "测试股票2"]
     
     # 测试Excel导出
     response = client.get("/api/v1/analysis/export/basics?format=excel")
     assert response.status_code == 200
-    data = response.json()
-    assert "filename" in data
-    assert data["filename"].endswith(".xlsx")
+    assert ".xlsx" in response.headers["content-disposition"]
+    df = pd.read_excel(io.BytesIO(response.content), dtype={"code": str})
+    assert df["code"].tolist() == ["000001", "000002"]
 
 def test_export_stock_trades(client, db_session):
     """测试导出股票交易数据"""
     # 创建测试数据
     stock = create_stock_basic(db_session, code="000001", name="测试股票")
-    create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1))
     create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 2))
+    create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1))
     
     # 测试CSV导出
     response = client.get(f"/api/v1/analysis/export/trades/{stock.code}?format=csv")
     assert response.status_code == 200
-    data = response.json()
-    assert "filename" in data
-    assert data["filename"].endswith(".csv")
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert [row["trade_date"] for row in rows] == ["2023-01-01", "2023-01-02"]
+    
+    # 测试日期过滤和gzip压缩
+    response = client.get(
+        f"/api/v1/analysis/export/trades/{stock.code}?format=ndjson&gzip=true&start_date=2023-01-02",
+        headers={"Accept-Encoding": "identity"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    body = response.content
+    if body[:2] == b"\x1f\x8b":
+        body = gzip.decompress(body)
+    records = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert [record["trade_date"] for record in records] == ["2023-01-02"]
     
     # 测试Excel导出
     response = client.get(f"/api/v1/analysis/export/trades/{stock.code}?format=excel")
     assert response.status_code == 200
-    data = response.json()
-    assert "filename" in data
-    assert data["filename"].endswith(".xlsx")
+    assert ".xlsx" in response.headers["content-disposition"]
+    assert len(pd.read_excel(io.BytesIO(response.content))) == 2
+    
+    # 股票不存在
+    response = client.get("/api/v1/analysis/export/trades/999999?format=csv")
+    assert response.status_code == 404
 
 def test_export_analysis_results(client, db_session):
     """测试导出分析结果"""
@@ -99,6 +140,416 @@ def test_export_analysis_results(client, db_session):
     # 测试导出分析结果
     response = client.get(f"/api/v1/analysis/export/analysis/{stock.code}")
     assert response.status_code == 200
+    assert ".xlsx" in response.headers["content-disposition"]
+    sheets = pd.read_excel(io.BytesIO(response.content), sheet_name=None)
+    assert "macd" in sheets
+    assert len(sheets["price_change"]) == 1
+
+def test_columnar_store_matches_database(client, db_session, tmp_path, monkeypatch):
+    """测试列式存储读取的指标与数据库路径一致"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(40):
+        create_stock_trade(
+            db_session,
+            stock.id,
+            trade_date=date(2023, 1, 1) + timedelta(days=i),
+            close_price=10.0 + (i % 7) * 0.3,
+            volume=1000000 + i
+        )
+    
+    url = f"/api/v1/analysis/indicators/{stock.code}?start_date=2023-01-05&end_date=2023-02-09"
+    expected = client.get(url).json()
+    
+    store = ColumnarStore(str(tmp_path))
+    assert store.sync_symbols(db_session, [stock.id]) == 1
+    columns = store.read_range("000001", start_date=date(2023, 1, 5), end_date=date(2023, 1, 9))
+    assert isinstance(columns["close_price"], np.memmap)
+    assert len(columns["trade_date"]) == 5
+    
+    monkeypatch.setattr(settings, "COLUMNAR_STORE_ENABLED", True)
+    monkeypatch.setattr(settings, "COLUMNAR_STORE_PATH", str(tmp_path))
+    indicator_cache.clear()
+    assert client.get(url).json() == expected
+
+def test_columnar_store_appends_new_bars_and_swaps_versions(db_session, tmp_path):
+    """测试列式存储只追加新日线、保留空成交量，旧版本在替换后仍可读，重建后整体切换"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(10):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1) + timedelta(days=i), close_price=10.0 + i)
+    store = ColumnarStore(str(tmp_path))
+    store.sync_symbols(db_session, [stock.id])
+    before = store.read_range("000001")
+    
+    # 覆盖最后一天并新增两天，其中一天成交量为空
+    trade = db_session.query(StockTrade).filter(StockTrade.trade_date == date(2023, 1, 10)).one()
+    trade.close_price = 99.0
+    create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 11), close_price=20.0)
+    create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 12), close_price=21.0, volume=None)
+    # 只读取起始日期之后的日线：直接在数据库中改动更早的数据不会被同步
+    db_session.query(StockTrade).filter(StockTrade.trade_date == date(2023, 1, 1)).update({"close_price": 0.0})
+    db_session.commit()
+    assert store.sync_symbols(db_session, [stock.id], since={stock.id: date(2023, 1, 10)}) == 1
+    
+    after = store.read_range("000001")
+    assert after["close_price"].tolist() == [10.0 + i for i in range(9)] + [99.0, 20.0, 21.0]
+    assert np.isnan(after["volume"][-1]) and after["volume"][0] == 1000000
+    # 替换前读取的映射仍指向旧版本的完整数据
+    assert before["close_price"].tolist() == [10.0 + i for i in range(10)]
+    assert len(os.listdir(os.path.join(str(tmp_path), store._generation(), "000001"))) == 2
+    
+    old_generation = store._generation()
+    assert store.rebuild(db_session) == 1
+    assert store._generation() != old_generation
+    assert not os.path.exists(os.path.join(str(tmp_path), old_generation))
+    assert store.read_range("000001")["close_price"][0] == 0.0
+
+def test_indicator_cache_invalidated_by_trade_update(client, db_session):
+    """测试指标结果缓存命中，并在交易数据更新后失效"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(30):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, i + 1), close_price=10.0 + i * 0.1)
+    
+    url = f"/api/v1/analysis/indicators/{stock.code}"
+    first = client.get(url).json()
+    hits = indicator_cache.hits
+    assert client.get(url).json() == first
+    assert indicator_cache.hits == hits + 1
+    
+    stock_service.update_stock_trades(db_session, stock_code=stock.code, days=10, provider=FakeTradeProvider())
+    refreshed = client.get(url).json()
+    assert refreshed["dates"][-1] != first["dates"][-1]
+    
+    stats = client.get("/api/v1/debug/cache-stats").json()
+    assert stats["enabled"] is True
+    assert stats["invalidations"] >= 1
+
+def test_indicator_cache_sees_writes_from_other_processes(client, db_session):
+    """其他进程（如 Celery worker）写入数据时不会调用本进程的 invalidate，缓存键中的数据版本仍会变化"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(30):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, i + 1), close_price=10.0 + i * 0.1)
+    
+    url = f"/api/v1/analysis/indicators/{stock.code}"
+    first = client.get(url).json()
+    assert client.get(url).json() == first
+    
+    # 绕过 update_stock_trades 直接写入，模拟另一个进程
+    trade = db_session.query(StockTrade).filter_by(stock_id=stock.id, trade_date=date(2023, 1, 30)).one()
+    trade.close_price = 20.0
+    trade.updated_at = datetime.utcnow() + timedelta(seconds=1)
+    db_session.commit()
+    
+    refreshed = client.get(url).json()
+    assert refreshed["ma5"][-1] != first["ma5"][-1]
+
+def test_indicator_cache_evicts_least_recently_used():
+    """测试指标缓存按条目数淘汰最久未使用的结果"""
+    cache = IndicatorCache(max_entries=2)
+    cache.set("000001", {"p": 1}, [1])
+    cache.set("000002", {"p": 1}, [2])
+    assert cache.get("000001", {"p": 1}) == [1]
+    cache.set("000003", {"p": 1}, [3])
+    
+    assert cache.get("000002", {"p": 1}) is None
+    assert cache.get("000001", {"p": 1}) == [1]
+    assert cache.stats()["evictions"] == 1
+
+def test_market_indicators_match_single_stock(db_session):
+    """测试全市场批量指标与逐只计算的结果完全一致"""
+    rng = np.random.default_rng(0)
+    all_dates = [date(2023, 1, 1) + timedelta(days=i) for i in range(80)]
+    series = {}
+    for i in range(1, 5):
+        stock = create_stock_basic(db_session, code=f"00000{i}", name=f"测试股票{i}")
+        # 各股票交易日数不同，并随机缺失部分交易日（模拟停牌）
+        dates = sorted(rng.choice(all_dates, 30 + i * 10, replace=False).tolist())
+        closes = np.round(10 + np.cumsum(rng.normal(0, 0.3, len(dates))), 2).tolist()
+        for trade_date, close in zip(dates, closes):
+            create_stock_trade(db_session, stock.id, trade_date=trade_date, close_price=close, volume=int(close * 1000))
+        series[stock.code] = closes
+    
+    matrix = load_price_matrix(db_session)
+    indicators = calculate_market_indicators(matrix)
+    
+    for code, closes in series.items():
+        assert extract_symbol(matrix, indicators["ma20"], code) == analysis.calculate_ma(closes, 20)
+        assert extract_symbol(matrix, indicators["rsi"], code) == analysis.calculate_rsi(closes)
+        macd = analysis.calculate_macd(closes)
+        for key in macd:
+            assert extract_symbol(matrix, indicators["macd"][key], code) == macd[key]
+        bands = analysis.calculate_bollinger_bands(closes)
+        for key in bands:
+            assert extract_symbol(matrix, indicators["bollinger_bands"][key], code) == bands[key]
+
+def test_incremental_indicator_state(client, db_session):
+    """测试逐日推进的指标状态与完整重算结果一致"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    provider = FakeTradeProvider()
+    today = datetime.now().date()
+    
+    # 先写入较早的历史，再增量追加最近的交易日
+    stock_service.update_stock_trades(db_session, stock_code="000001", days=90, provider=provider)
+    initial = db_session.query(StockIndicatorState).filter_by(stock_id=stock.id).one().bar_count
+    stock_service.update_stock_trades(db_session, stock_code="000001", days=90, incremental=True, provider=provider)
+    db_session.add(StockTrade(stock_id=stock.id, trade_date=today + timedelta(days=1), close_price=12.3, volume=100))
+    db_session.commit()
+    df = pd.DataFrame({"trade_date": [today + timedelta(days=1)], "close_price": [12.3], "volume": [100]})
+    assert update_indicator_state(db_session, stock.id, df) == "advanced"
+    
+    trades = db_session.query(StockTrade).filter_by(stock_id=stock.id).order_by(StockTrade.trade_date).all()
+    prices = [t.close_price for t in trades]
+    volumes = [t.volume for t in trades]
+    
+    response = client.get(f"/api/v1/analysis/indicators/{stock.code}/latest")
+    assert response.status_code == 200
+    latest = response.json()
+    assert latest["bar_count"] == initial + 1
+    assert latest["ma20"] == pytest.approx(analysis.calculate_ma(prices, 20)[-1])
+    assert latest["macd_line"] == pytest.approx(analysis.calculate_macd(prices)["macd_line"][-1])
+    assert latest["signal_line"] == pytest.approx(analysis.calculate_macd(prices)["signal_line"][-1])
+    assert latest["rsi"] == pytest.approx(analysis.calculate_rsi(prices)[-1])
+    assert latest["bb_upper"] == pytest.approx(analysis.calculate_bollinger_bands(prices)["upper_band"][-1])
+    assert latest["volume_ma"] == pytest.approx(analysis.calculate_volume_ma(volumes)[-1])
+
+def test_indicator_state_skips_rebuild_for_unchanged_overlap(db_session, monkeypatch):
+    """全量刷新覆盖的历史日线未变化时只推进新增日线，变化时才重建"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    today = datetime.now().date()
+    history = FakeTradeProvider().fetch_daily("000001", today - timedelta(days=90), today)
+
+    class FixedHistoryProvider(FakeTradeProvider):
+        """同一交易日每次返回相同的行情"""
+        def fetch_daily(self, code, start_date, end_date):
+            dates = history["trade_date"].dt.date
+            return history[((dates >= start_date) & (dates <= end_date)).to_numpy()]
+
+    provider = FixedHistoryProvider()
+    stock_service.update_stock_trades(db_session, stock_code="000001", days=90, provider=provider)
+
+    # 非增量刷新与已有数据重叠，数据未变化，不应从完整历史重建
+    results = []
+    original = indicator_state.update_indicator_state
+    monkeypatch.setattr(stock_service, "update_indicator_state", lambda *args, **kwargs: results.append(original(*args, **kwargs)))
+    stock_service.update_stock_trades(db_session, stock_code="000001", days=30, provider=provider)
+    assert results == ["unchanged"]
+
+    state_date = db_session.query(StockIndicatorState).filter_by(stock_id=stock.id).one().trade_date
+    changed = pd.DataFrame({"trade_date": [state_date], "close_price": [99.0], "volume": [100]})
+    assert indicator_state.overlap_differs(db_session, stock.id, changed)
+    stored = db_session.query(StockTrade).filter_by(stock_id=stock.id, trade_date=state_date).one()
+    appended = pd.DataFrame({
+        "trade_date": [state_date, state_date + timedelta(days=1)],
+        "close_price": [stored.close_price, 12.3],
+        "volume": [stored.volume, 100]
+    })
+    assert not indicator_state.overlap_differs(db_session, stock.id, appended)
+    assert original(db_session, stock.id, appended, overlap_changed=False) == "advanced"
+    assert original(db_session, stock.id, appended) == "rebuilt"
+
+def test_export_stock_trades_parquet(client, db_session):
+    """测试以 Parquet 格式导出交易数据"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 2), volume=200)
+    create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1), volume=100)
+
+    response = client.get(f"/api/v1/analysis/export/trades/{stock.code}?format=parquet")
+    assert response.status_code == 200
+    assert ".parquet" in response.headers["content-disposition"]
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("volume").to_pylist() == [100, 200]
+
+def test_batch_indicators_match_single_endpoint(client, db_session):
+    """测试批量指标接口与逐只查询的结果一致"""
+    rng = np.random.default_rng(1)
+    for i, bars in enumerate([120, 45, 10], start=1):
+        stock = create_stock_basic(db_session, code=f"00000{i}", name=f"测试股票{i}")
+        closes = np.round(10 + np.cumsum(rng.normal(0, 0.3, bars)), 2)
+        for day, close in enumerate(closes):
+            create_stock_trade(
+                db_session,
+                stock.id,
+                trade_date=date(2023, 1, 1) + timedelta(days=day),
+                close_price=float(close),
+                high_price=float(close) + 0.2 + (day % 3) * 0.1,
+                low_price=float(close) - 0.3,
+                volume=1000 + day
+            )
+    create_stock_basic(db_session, code="000009", name="无数据股票")
+
+    response = client.post("/api/v1/analysis/indicators/batch", json={
+        "codes": ["000001", "000002", "000003", "000009", "999999"]
+    })
+    assert response.status_code == 200
     data = response.json()
-    assert "filename" in data
-    assert data["filename"].endswith(".xlsx") 
\ No newline at end of file
+    assert set(data["results"]) == {"000001", "000002"}
+    assert set(data["errors"]) == {"000003", "000009", "999999"}
+    for code in data["results"]:
+        assert data["results"][code] == client.get(f"/api/v1/analysis/indicators/{code}").json()
+
+    # 指定日期范围和指标
+    response = client.post("/api/v1/analysis/indicators/batch", json={
+        "codes": ["000001"],
+        "start_date": "2023-01-10",
+        "end_date": "2023-03-31",
+        "indicators": ["rsi", "macd"]
+    })
+    expected = client.get("/api/v1/analysis/indicators/000001?start_date=2023-01-10&end_date=2023-03-31").json()
+    result = response.json()["results"]["000001"]
+    assert set(result) == {"dates", "rsi", "macd"}
+    assert result["dates"] == expected["dates"]
+    assert result["macd"] == expected["macd"]
+
+    # 注册表中的全部指标都可以批量计算，OBV 同样从返回区间第一天开始累计
+    names = ["kdj", "atr", "obv", "cci", "williams_r", "price_change"]
+    for params in ["start_date=2023-02-10&end_date=2023-03-31", "start_date=2023-01-01", ""]:
+        response = client.post("/api/v1/analysis/indicators/batch", json={
+            "codes": ["000001", "000002"], "indicators": names,
+            **dict(item.split("=") for item in params.split("&") if item)
+        })
+        for code, result in response.json()["results"].items():
+            expected = client.get(f"/api/v1/analysis/indicators/{code}?indicators={','.join(names)}&{params}").json()
+            assert result == expected
+    
+    response = client.post("/api/v1/analysis/indicators/batch", json={"codes": ["000001"], "indicators": ["unknown"]})
+    assert response.status_code == 400
+
+def test_nan_to_none():
+    """测试向量化地把 NaN 和无穷值转换为 None"""
+    assert analysis.nan_to_none([1.5, np.nan, 2, np.inf]) == [1.5, None, 2.0, None]
+    assert analysis.nan_to_none(np.array([], dtype=float)) == []
+
+def test_columnar_indicators_match_json(client, db_session):
+    """测试列式格式解码后与 JSON 格式一致，缺失值为 NaN"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(40):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1) + timedelta(days=i), close_price=10.0 + (i % 7) * 0.3)
+
+    url = f"/api/v1/analysis/indicators/{stock.code}"
+    expected = client.get(url).json()
+    data = client.get(f"{url}?format=columnar").json()
+    assert data["format"] == "columnar"
+    assert data["length"] == len(expected["dates"])
+
+    def decode(column):
+        return np.frombuffer(base64.b64decode(column["data"]), dtype=np.dtype(column["dtype"]).newbyteorder("<"))
+
+    dates = decode(data["dates"]).astype("datetime64[D]").astype(str).tolist()
+    assert dates == expected["dates"]
+    for name, column in data["columns"].items():
+        values = expected
+        for key in name.split("."):
+            values = values[key]
+        decoded = decode(column)
+        assert np.array_equal(np.isnan(decoded), [value is None for value in values])
+        assert np.allclose(decoded[~np.isnan(decoded)], [value for value in values if value is not None])
+    assert data["price_change"] == expected["price_change"]
+
+    assert client.get(f"{url}?format=xml").status_code == 422
+
+def test_indicator_response_compression(client, db_session):
+    """测试较大的指标响应按 Accept-Encoding 压缩"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(200):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1) + timedelta(days=i), close_price=10.0 + (i % 11) * 0.2)
+
+    url = f"/api/v1/analysis/indicators/{stock.code}"
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert len(plain.content) >= settings.RESPONSE_COMPRESSION_MIN_SIZE
+
+    gzipped = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.headers["vary"] == "Accept-Encoding"
+    assert gzipped.json() == plain.json()
+
+    brotli_response = client.get(url, headers={"Accept-Encoding": "gzip, br"})
+    assert brotli_response.headers["content-encoding"] == "br"
+    assert brotli_response.json() == plain.json()
+
+    no_brotli = client.get(url, headers={"Accept-Encoding": "br;q=0, gzip"})
+    assert no_brotli.headers["content-encoding"] == "gzip"
+
+def test_indicator_registry_shares_intermediates():
+    """测试注册表中的指标共用中间结果，新增指标与逐日计算的结果一致"""
+    rng = np.random.default_rng(3)
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.2, 60)), 2)
+    high, low = close + rng.uniform(0, 0.5, 60), close - rng.uniform(0, 0.5, 60)
+
+    context = analysis.IndicatorContext(close=close, high=high, low=low)
+    ma20 = analysis.INDICATORS["ma20"].func(context, **analysis.INDICATORS["ma20"].params)
+    bands = analysis.INDICATORS["bollinger_bands"].func(context, **analysis.INDICATORS["bollinger_bands"].params)
+    assert bands["middle_band"] is ma20
+
+    results = analysis.calculate_indicators({"close": close, "high": high, "low": low}, ["kdj", "williams_r"])
+    assert list(results) == ["kdj", "williams_r"]
+    k = d = None
+    for i in range(8, 60):
+        highest, lowest = high[i - 8:i + 1].max(), low[i - 8:i + 1].min()
+        rsv = (close[i] - lowest) / (highest - lowest) * 100
+        k = rsv if k is None else (2 * k + rsv) / 3
+        d = k if d is None else (2 * d + k) / 3
+        assert results["kdj"]["k"][i] == pytest.approx(k)
+        assert results["kdj"]["j"][i] == pytest.approx(3 * k - 2 * d)
+    highest, lowest = high[-14:].max(), low[-14:].min()
+    assert results["williams_r"][-1] == pytest.approx((highest - close[-1]) / (highest - lowest) * -100)
+    assert results["williams_r"][12] is None
+
+    with pytest.raises(ValueError):
+        analysis.calculate_indicators({"close": close}, ["atr"])
+
+def test_get_selected_indicators(client, db_session):
+    """测试 indicators 参数只返回请求的指标"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    for i in range(40):
+        price = 10.0 + (i % 5) * 0.2
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1) + timedelta(days=i),
+                           close_price=price, high_price=price + 0.3, low_price=price - 0.3, volume=1000 + i)
+
+    url = f"/api/v1/analysis/indicators/{stock.code}"
+    data = client.get(f"{url}?indicators=ma20,atr,obv,cci,kdj").json()
+    assert list(data) == ["dates", "ma20", "atr", "obv", "cci", "kdj"]
+    assert data["ma20"] == client.get(url).json()["ma20"]
+    assert data["obv"][0] == 0
+    assert set(data["kdj"]) == {"k", "d", "j"}
+
+    response = client.get(f"{url}?indicators=ma20,unknown")
+    assert response.status_code == 400
+    assert "unknown" in response.json()["detail"]
+
+def test_indicators_warm_up_before_start_date(client, db_session):
+    """测试短区间在开始日期之前读取预热数据，结果与在完整历史上计算后截取的一致"""
+    stock = create_stock_basic(db_session, code="000001", name="测试股票")
+    rng = np.random.default_rng(5)
+    closes = np.round(10 + np.cumsum(rng.normal(0, 0.3, 150)), 2)
+    for day, close in enumerate(closes):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, 1) + timedelta(days=day),
+                           close_price=float(close), volume=1000 + day)
+
+    url = f"/api/v1/analysis/indicators/{stock.code}"
+    full = client.get(f"{url}?start_date=2023-01-01&end_date=2023-05-30").json()
+    data = client.get(f"{url}?start_date=2023-05-20&end_date=2023-05-24").json()
+    assert data["dates"] == ["2023-05-20", "2023-05-21", "2023-05-22", "2023-05-23", "2023-05-24"]
+    offset = full["dates"].index("2023-05-20")
+    assert data["ma20"] == pytest.approx(full["ma20"][offset:offset + 5])
+    # 指数平均按 lookback 预热后初始值的权重已衰减到1%以下
+    assert data["macd"]["macd_line"] == pytest.approx(full["macd"]["macd_line"][offset:offset + 5], abs=0.01)
+    assert None not in data["rsi"]
+
+    response = client.post("/api/v1/analysis/indicators/batch", json={
+        "codes": ["000001"], "start_date": "2023-05-20", "end_date": "2023-05-24"
+    })
+    assert response.json()["results"]["000001"] == data
+
+    # 未指定开始日期时返回最近 INDICATOR_DEFAULT_BARS 个交易日，开头的指标同样经过预热
+    latest = client.get(url).json()
+    assert len(latest["dates"]) == settings.INDICATOR_DEFAULT_BARS
+    assert latest["ma20"][0] is not None
+
+    assert client.get(f"{url}?start_date=2024-01-01").status_code == 404
+
+    # OBV 从返回区间第一天开始累计，不受同时请求的长预热指标影响
+    obv = client.get(f"{url}?start_date=2023-05-20&end_date=2023-05-24&indicators=obv").json()["obv"]
+    with_macd = client.get(f"{url}?start_date=2023-05-20&end_date=2023-05-24&indicators=obv,macd").json()["obv"]
+    assert obv == with_macd
+    assert obv[0] == 0
@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.db.session import get_async_db
+from app import main
+from app.main import app
+from app.models.base import Base
+from app.services.search import stock_search_index
+from tests.factories import create_stock_basic, create_stock_trade
+
+@pytest.fixture
+def async_client(tmp_path, monkeypatch):
+    """使用 aiosqlite 读取临时数据库文件的客户端，应用关闭时释放该引擎"""
+    pytest.importorskip("aiosqlite")
+    path = tmp_path / "async.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    # 与应用的异步引擎一样使用连接池，连接归还后不关闭
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=AsyncAdaptedQueuePool)
+    monkeypatch.setattr(main, "async_sqlite_engine", async_engine)
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    with TestClient(app) as test_client:
+        yield test_client, session
+    app.dependency_overrides.clear()
+    session.close()
+    engine.dispose()
+
+def test_async_read_endpoints(async_client):
+    """测试 async 接口通过异步驱动读取数据"""
+    client, session = async_client
+    stock = create_stock_basic(session, code="000001", name="测试股票")
+    for i in range(40):
+        create_stock_trade(session, stock.id, trade_date=date(2023, 1, 1) + timedelta(days=i), close_price=10.0 + i * 0.1)
+    session.commit()
+
+    response = client.get("/api/v1/stocks/basics/000001")
+    assert response.status_code == 200
+    assert response.json()["name"] == "测试股票"
+
+    response = client.get("/api/v1/stocks/trades/000001?limit=5")
+    assert response.status_code == 200
+    assert [item["trade_date"] for item in response.json()["items"]][:2] == ["2023-02-09", "2023-02-08"]
+
+    response = client.get("/api/v1/analysis/indicators/000001")
+    assert response.status_code == 200
+    assert len(response.json()["dates"]) == 40
+
+    assert client.get("/api/v1/stocks/basics/999999").status_code == 404
+
+def test_concurrent_search_does_not_block_event_loop(async_client):
+    """冷启动和索引过期时并发搜索，异步驱动下不能因等待索引刷新而卡住事件循环"""
+    client, session = async_client
+    for i in range(20):
+        create_stock_basic(session, code=f"{600000 + i}", name=f"测试股票{i}")
+    session.commit()
+
+    def search(term):
+        return client.get("/api/v1/stocks/search", params={"q": term})
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        for _ in range(2):
+            stock_search_index.invalidate()
+            futures = [executor.submit(search, f"6000{i % 2}") for i in range(8)]
+            responses = [future.result(timeout=30) for future in futures]
+            assert all(response.status_code == 200 for response in responses)
+            assert all(response.json() for response in responses)
+
+def test_shutdown_disposes_async_engine(async_client):
+    """测试应用关闭时释放 aiosqlite 连接，连接的非守护线程退出后进程才能正常结束"""
+    client, session = async_client
+    before = set(threading.enumerate())
+    assert client.get("/api/v1/stocks/basics").status_code == 200
+    workers = [thread for thread in threading.enumerate() if thread not in before and not thread.daemon]
+    assert workers
+
+    client.__exit__(None, None, None)
+    for thread in workers:
+        thread.join(timeout=5)
+    assert not any(thread.is_alive() for thread in workers)
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app import tasks
+from app.core.config import settings
+from app.models.stock import StockTrade
+from app.services.backtest import BacktestConfig, backtest_summary, run_backtest, strategy_signal
+from app.services.sweep import expand_param_grid
+from tests.factories import create_stock_basic, create_stock_trade
+
+def _random_bars(days: int = 300, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = np.round(10 * np.exp(np.cumsum(rng.normal(0, 0.02, days))), 2)
+    open_ = np.round(np.concatenate([[close[0]], close[:-1]]) * (1 + rng.normal(0, 0.01, days)), 2)
+    return pd.DataFrame({
+        "trade_date": pd.bdate_range("2022-01-03", periods=days),
+        "open_price": open_,
+        "close_price": close
+    })
+
+def _loop_backtest(bars: pd.DataFrame, signal: np.ndarray, config: BacktestConfig, price_limit: float):
+    """逐日循环的参考实现"""
+    opens = bars["open_price"].to_numpy()
+    closes = bars["close_price"].to_numpy()
+    equity = config.initial_capital
+    position = 0
+    curve = []
+    for t in range(len(bars)):
+        if t > 0:
+            equity *= 1 + position * (opens[t] / closes[t - 1] - 1)
+        target = signal[t - 1] if t > 0 else 0
+        if t > 0 and target != position:
+            limit_up = opens[t] >= round(closes[t - 1] * (1 + price_limit), 2) - 1e-6
+            limit_down = opens[t] <= round(closes[t - 1] * (1 - price_limit), 2) + 1e-6
+            if target == 1 and not limit_up:
+                equity *= 1 - (config.commission + config.slippage)
+                position = 1
+            elif target == 0 and not limit_down:
+                equity *= 1 - (config.commission + config.stamp_duty + config.slippage)
+                position = 0
+        equity *= 1 + position * (closes[t] / opens[t] - 1)
+        curve.append(equity)
+    return np.array(curve)
+
+@pytest.mark.parametrize("strategy,params", [
+    ("ma_cross", {"fast": 5, "slow": 20}),
+    ("rsi", {"period": 14, "lower": 40, "upper": 60}),
+    ("bollinger", {"period": 20, "std_dev": 1.5}),
+])
+def test_vectorized_backtest_matches_loop(strategy, params):
+    """测试向量化回测与逐日循环结果一致"""
+    bars = _random_bars()
+    config = BacktestConfig(commission=0.0003, stamp_duty=0.0005, slippage=0.001, price_limit=0.1)
+    result = run_backtest(bars, strategy, params, config)
+
+    signal = strategy_signal(strategy, bars["close_price"].to_numpy(), params)
+    expected = _loop_backtest(bars, signal, config, 0.1)
+    np.testing.assert_allclose(result["equity_curve"]["equity"], expected, rtol=1e-10)
+    assert result["summary"]["trade_count"] > 0
+
+def test_limit_up_blocks_entry():
+    """测试开盘涨停时买单无法成交，次日开盘后才建仓"""
+    closes = [10.0] * 25 + [11.0, 12.1, 12.5, 12.6]
+    opens = [10.0] * 25 + [10.5, 12.1, 12.2, 12.6]
+    bars = pd.DataFrame({
+        "trade_date": pd.bdate_range("2023-01-02", periods=len(closes)),
+        "open_price": opens,
+        "close_price": closes
+    })
+    # 第25根收盘产生买入信号，第26根开盘即涨停（11.0 × 1.1 = 12.1），第27根开盘买入
+    result = run_backtest(bars, "ma_cross", {"fast": 2, "slow": 5}, BacktestConfig(price_limit=0.1))
+    position = result["equity_curve"]["position"]
+    assert position[25] == 0 and position[26] == 0 and position[27] == 1
+    assert result["summary"]["blocked_orders"] == 1
+    assert result["trades"][0]["entry_price"] == 12.2
+
+def test_backtest_endpoint(client, db_session):
+    """测试回测接口"""
+    stock = create_stock_basic(db_session, code="300001", name="测试股票", market="创业板")
+    bars = _random_bars(days=80, seed=1)
+    for row in bars.itertuples():
+        create_stock_trade(
+            db_session,
+            stock.id,
+            trade_date=row.trade_date.date(),
+            open_price=row.open_price,
+            close_price=row.close_price
+        )
+
+    response = client.post("/api/v1/analysis/backtest", json={
+        "code": "300001",
+        "strategy": "ma_cross",
+        "params": {"fast": 5, "slow": 10},
+        "start_date": "2022-01-01"
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["equity_curve"]["dates"]) == 80
+    assert set(data["summary"]) >= {"total_return", "max_drawdown", "sharpe_ratio", "win_rate", "trade_count"}
+
+    response = client.post("/api/v1/analysis/backtest", json={"code": "300001", "strategy": "unknown"})
+    assert response.status_code == 400
+    response = client.post("/api/v1/analysis/backtest", json={"code": "300001", "strategy": "ma_cross", "params": {"fast": 20, "slow": 5}})
+    assert response.status_code == 400
+    response = client.post("/api/v1/analysis/backtest", json={"code": "999999", "strategy": "ma_cross"})
+    assert response.status_code == 404
+
+def test_expand_param_grid():
+    """测试参数网格展开"""
+    assert expand_param_grid({"slow": [20, 30], "fast": [5]}) == [{"fast": 5, "slow": 20}, {"fast": 5, "slow": 30}]
+    assert expand_param_grid({}) == [{}]
+    with pytest.raises(ValueError):
+        expand_param_grid({"fast": []})
+
+def test_backtest_sweep(client, db_session, monkeypatch):
+    """测试参数扫描在进程池中执行并写入排行榜"""
+    monkeypatch.setattr(tasks, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(settings, "BACKTEST_SWEEP_WORKERS", 2)
+    monkeypatch.setattr(settings, "BACKTEST_SWEEP_TASK_SIZE", 2)
+    monkeypatch.setattr(settings, "BACKTEST_SWEEP_COMMIT_SIZE", 3)
+
+    all_bars = {}
+    for i, code in enumerate(["000001", "000002", "300003"]):
+        stock = create_stock_basic(db_session, code=code, name=f"测试股票{i}", market="创业板" if code.startswith("3") else "主板")
+        all_bars[code] = _random_bars(days=120, seed=i)
+        for row in all_bars[code].itertuples():
+            db_session.add(StockTrade(
+                stock_id=stock.id,
+                trade_date=row.trade_date.date(),
+                open_price=row.open_price,
+                close_price=row.close_price
+            ))
+    # 只有1天交易数据的股票计为失败
+    stock = create_stock_basic(db_session, code="000004", name="测试股票3")
+    create_stock_trade(db_session, stock.id)
+    db_session.commit()
+
+    response = client.post("/api/v1/analysis/backtest/sweep", json={
+        "strategy": "ma_cross",
+        "param_grid": {"fast": [3, 5, 10], "slow": [20, 30]}
+    })
+    assert response.status_code == 200
+    sweep_id = response.json()["sweep_id"]
+    assert response.json()["total_jobs"] == 24
+
+    response = client.get(f"/api/v1/analysis/backtest/sweep/{sweep_id}?sort=total_return&limit=100")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "SUCCESS"
+    assert data["completed_jobs"] == 18
+    assert data["failed_jobs"] == 6
+    assert len(data["leaderboard"]) == 18
+    returns = [row["total_return"] for row in data["leaderboard"]]
+    assert returns == sorted(returns, reverse=True)
+    assert len(data["params"]) == 6 and all(row["symbols"] == 3 for row in data["params"])
+
+    # 排行榜结果与单独回测一致，创业板按20%涨跌幅计算
+    row = next(r for r in data["leaderboard"] if r["code"] == "300003" and r["params"] == {"fast": 5, "slow": 20})
+    bars = all_bars["300003"]
+    expected = backtest_summary(
+        bars["open_price"].to_numpy(), bars["close_price"].to_numpy(), "ma_cross", {"fast": 5, "slow": 20},
+        BacktestConfig(price_limit=0.2)
+    )
+    assert row["total_return"] == pytest.approx(expected["total_return"])
+    assert row["sharpe_ratio"] == pytest.approx(expected["sharpe_ratio"])
+
+def test_backtest_sweep_validation(client, db_session):
+    """测试参数扫描请求校验"""
+    create_stock_basic(db_session, code="000001")
+    response = client.post("/api/v1/analysis/backtest/sweep", json={"strategy": "ma_cross", "param_grid": {"fast": [30], "slow": [20]}})
+    assert response.status_code == 400
+    response = client.post("/api/v1/analysis/backtest/sweep", json={"strategy": "ma_cross", "param_grid": {"fast": [5]}, "codes": ["999999"]})
+    assert response.status_code == 404
+    response = client.get("/api/v1/analysis/backtest/sweep/9999")
+    assert response.status_code == 404
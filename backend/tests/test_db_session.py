@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db import migrations
+from app.db.session import create_sqlite_engine, get_db
+from app.main import app
+
+@pytest.fixture
+def engines(tmp_path):
+    path = str(tmp_path / "profile.db")
+    writer = create_sqlite_engine(path)
+    with writer.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)"))
+        connection.execute(text("INSERT INTO items (value) VALUES ('a')"))
+    reader = create_sqlite_engine(path, read_only=True)
+    yield writer, reader
+    reader.dispose()
+    writer.dispose()
+
+def test_sqlite_pragmas_applied(engines):
+    """测试新连接按配置设置 PRAGMA"""
+    writer, reader = engines
+    with writer.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert connection.execute(text("PRAGMA temp_store")).scalar() == 2  # MEMORY
+    with reader.connect() as connection:
+        assert connection.execute(text("PRAGMA query_only")).scalar() == 1
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO items (value) VALUES ('b')"))
+
+def test_readers_not_blocked_by_open_write_transaction(engines):
+    """测试 WAL 模式下未提交的写事务不阻塞只读连接"""
+    writer, reader = engines
+    with writer.connect() as write_connection:
+        transaction = write_connection.begin()
+        write_connection.execute(text("INSERT INTO items (value) VALUES ('b')"))
+
+        with reader.connect() as connection:
+            assert connection.execute(text("SELECT COUNT(*) FROM items")).scalar() == 1
+
+        transaction.commit()
+
+    with reader.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM items")).scalar() == 2
+
+def test_busy_writer_returns_503(client, tmp_path, monkeypatch):
+    """测试唯一的写连接被占用时，写接口在 SQLITE_WRITER_POOL_TIMEOUT 后返回 503 而不是一直等待"""
+    monkeypatch.setattr(settings, "SQLITE_WRITER_POOL_TIMEOUT", 0.1)
+    writer = create_sqlite_engine(str(tmp_path / "busy.db"))
+
+    def busy_get_db():
+        db = Session(bind=writer)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = busy_get_db
+    try:
+        with writer.connect():
+            response = client.post("/api/v1/stocks/trades/update", params={"stock_code": "000001"})
+    finally:
+        writer.dispose()
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+def test_trade_unique_index_migration(tmp_path, monkeypatch, capsys):
+    """测试添加唯一索引的迁移只保留每个 (stock_id, trade_date) 最新写入的一条，重复执行不再修改数据"""
+    writer = create_sqlite_engine(str(tmp_path / "migrate.db"))
+    monkeypatch.setattr(migrations, "sqlite_engine", writer)
+    with writer.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE stock_trades (id INTEGER PRIMARY KEY, stock_id INTEGER, trade_date DATE, close_price FLOAT)"
+        ))
+        connection.execute(text(
+            "INSERT INTO stock_trades (id, stock_id, trade_date, close_price) VALUES "
+            "(1, 1, '2023-01-03', 10.0), (2, 1, '2023-01-03', 10.5), (3, 1, '2023-01-04', 11.0), "
+            "(4, 2, '2023-01-03', 20.0), (5, 1, '2023-01-03', 10.8)"
+        ))
+
+    def snapshot():
+        with writer.connect() as connection:
+            rows = connection.execute(text("SELECT id, stock_id, trade_date, close_price FROM stock_trades ORDER BY id")).all()
+            indexes = connection.execute(text("SELECT name FROM pragma_index_list('stock_trades') WHERE \"unique\" = 1")).scalars().all()
+        return [tuple(row) for row in rows], indexes
+
+    try:
+        migrations.migrate_add_trade_unique_index()
+        rows, indexes = snapshot()
+        assert rows == [(3, 1, "2023-01-04", 11.0), (4, 2, "2023-01-03", 20.0), (5, 1, "2023-01-03", 10.8)]
+        assert indexes == ["uq_stock_trades_stock_id_trade_date"]
+        with pytest.raises(IntegrityError):
+            with writer.begin() as connection:
+                connection.execute(text("INSERT INTO stock_trades (stock_id, trade_date) VALUES (1, '2023-01-04')"))
+
+        capsys.readouterr()
+        migrations.migrate_add_trade_unique_index()
+        assert "唯一索引已存在" in capsys.readouterr().out
+        assert snapshot() == (rows, indexes)
+    finally:
+        writer.dispose()
@@ -0,0 +1,70 @@
+import time
+from collections import Counter
+from app.core.profiling import RequestMetrics, RequestProfile, SamplingProfiler, profile_section, request_metrics
+from tests.factories import create_stock_basic, create_stock_trade
+
+def test_server_timing_and_route_metrics(client, db_session):
+    """测试 Server-Timing 响应头和按路由模板汇总的延迟分布"""
+    stock = create_stock_basic(db_session, code="000001")
+    create_stock_trade(db_session, stock.id)
+    request_metrics.reset()
+
+    for _ in range(3):
+        response = client.get("/api/v1/stocks/trades/000001")
+        assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("app;dur=")
+    sql = next(part for part in timing.split(", ") if part.startswith("sql;"))
+    assert int(sql.split('desc="')[1].split()[0]) >= 2
+
+    client.get("/api/v1/stocks/trades/999999")
+    data = client.get("/api/v1/debug/metrics").json()
+    route = data["routes"]["GET /api/v1/stocks/trades/{stock_code}"]
+    assert route["count"] == 4
+    assert route["mean_sql_count"] >= 1
+    assert sum(bucket["count"] for bucket in route["histogram"]) == 4
+    assert route["histogram"][-1]["le_ms"] == "+Inf"
+    assert route["p50_ms"] <= route["p99_ms"] <= route["max_ms"]
+
+def test_profile_section_outside_request():
+    """测试不在请求中时 profile_section 不做任何事"""
+    with profile_section("cpu"):
+        pass
+
+def test_slowest_requests_keep_top_n():
+    """测试只保留最慢请求的采样结果"""
+    metrics = RequestMetrics(window=10, slow_requests=2, sampler_interval=0.01)
+    for duration in [5, 50, 1, 20]:
+        metrics.record("GET /x", duration, RequestProfile(), 200, Counter({"main;work": 3}))
+    slowest = metrics.snapshot()["slowest_requests"]
+    assert [entry["duration_ms"] for entry in slowest] == [50, 20]
+    assert slowest[0]["stacks"] == [{"stack": "main;work", "count": 3}]
+    assert metrics.snapshot()["routes"]["GET /x"]["window"] == 4
+
+def test_sampling_profiler_collects_busy_stacks():
+    """测试采样分析器采集忙碌线程的调用栈"""
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    try:
+        profiler.begin(1)
+        deadline = time.perf_counter() + 0.1
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        samples = profiler.end(1)
+    finally:
+        profiler.stop()
+    assert samples
+    assert any("test_sampling_profiler_collects_busy_stacks" in stack for stack in samples)
+
+def test_profiler_toggle(client):
+    """测试通过接口开关采样分析器"""
+    response = client.post("/api/v1/debug/metrics/profiler?enabled=true")
+    assert response.json() == {"profiler_enabled": True}
+    try:
+        client.get("/api/v1/stocks/basics")
+        data = client.get("/api/v1/debug/metrics").json()
+        assert data["profiler_enabled"] is True
+        assert data["slowest_requests"]
+    finally:
+        client.post("/api/v1/debug/metrics/profiler?enabled=false")
+    assert client.get("/api/v1/debug/metrics").json()["profiler_enabled"] is False
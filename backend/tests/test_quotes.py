@@ -0,0 +1,107 @@
+import asyncio
+import orjson
+import pytest
+from app.services.quotes import QuoteRefresher, QuoteStore, ReplayQuoteSource, quote_store, stream_quote_events
+from tests.fakes import generate_spot_snapshots
+
+CODES = [f"{600000 + i}" for i in range(50)]
+
+@pytest.fixture
+def replay_store():
+    frames = generate_spot_snapshots(CODES, count=4)
+    store = QuoteStore(history=2)
+    return store, QuoteRefresher(store, ReplayQuoteSource(frames)), frames
+
+@pytest.fixture
+def live_quotes():
+    """向全局快照写入回放行情，测试结束后清空"""
+    frames = generate_spot_snapshots(CODES, count=2)
+    quote_store.update(frames[0])
+    yield frames
+    quote_store.clear()
+
+def _parse_event(message: bytes):
+    lines = dict(line.split(": ", 1) for line in message.decode().strip().split("\n"))
+    return lines["event"], int(lines["id"]), orjson.loads(lines["data"])
+
+def test_refresh_produces_field_level_deltas(replay_store):
+    store, refresher, frames = replay_store
+    first = refresher.refresh_once()
+    assert len(first["changed"]) == len(CODES) and store.version == 1
+
+    delta = refresher.refresh_once()
+    previous, current = frames[0].set_index("代码"), frames[1].set_index("代码")
+    moved = current.index[current["最新价"] != previous["最新价"]].tolist()
+    assert 0 < len(delta["changed"]) < len(CODES)
+    assert sorted(delta["changed"]) == sorted(moved)
+    for code, fields in delta["changed"].items():
+        # 未变化的昨收和不存在的列（全为空）不出现在增量中
+        assert set(fields) == {"price", "change_pct", "change", "volume"}
+        assert fields["price"] == current.loc[code, "最新价"]
+
+    # 行情不变时不增加版本号
+    unchanged = frames[1].copy()
+    assert store.update(unchanged) is None and store.version == 2
+
+    # 股票消失时记入 removed
+    delta = store.update(frames[2][frames[2]["代码"] != CODES[0]])
+    assert delta["removed"] == [CODES[0]] and CODES[0] not in store.snapshot.index
+
+    assert [d["version"] for d in store.deltas_since(1)] == [2, 3]
+    assert store.deltas_since(3) == []
+    # 超出保留范围或版本号来自重启前时需要完整快照
+    assert store.deltas_since(0) is None
+    assert store.deltas_since(99) is None
+    assert refresher.stats()["refreshes"] == 2
+
+def test_quote_endpoints(client, live_quotes):
+    frame = live_quotes[0].set_index("代码")
+    response = client.get("/api/v1/quotes", params={"codes": f"{CODES[0]},{CODES[1]},999999", "fields": "price,volume,pe"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 1 and data["missing"] == ["999999"]
+    assert data["items"][0] == {
+        "code": CODES[0],
+        "name": frame.loc[CODES[0], "名称"],
+        "price": frame.loc[CODES[0], "最新价"],
+        "volume": frame.loc[CODES[0], "成交量"],
+        "pe": None
+    }
+
+    assert client.get("/api/v1/quotes", params={"codes": CODES[0], "fields": "foo"}).status_code == 400
+    response = client.get(f"/api/v1/quotes/{CODES[1]}")
+    assert response.status_code == 200 and response.json()["prev_close"] == frame.loc[CODES[1], "昨收"]
+    assert client.get("/api/v1/quotes/999999").status_code == 404
+    assert client.get("/api/v1/debug/quote-stats").json()["stocks"] == len(CODES)
+
+    quote_store.clear()
+    assert client.get(f"/api/v1/quotes/{CODES[1]}").status_code == 503
+
+def test_stream_sends_snapshot_then_filtered_deltas(replay_store):
+    store, refresher, frames = replay_store
+    refresher.refresh_once()
+    # 订阅下一次刷新中会变化的两只股票
+    previous, current = frames[0].set_index("代码"), frames[1].set_index("代码")
+    subscribed = set(current.index[current["最新价"] != previous["最新价"]][:2])
+
+    async def consume(last_version=None, count=2):
+        events = stream_quote_events(store, codes=subscribed, last_version=last_version, heartbeat=5)
+        received = [_parse_event(await events.__anext__())]
+        while len(received) < count:
+            refresher.refresh_once()
+            received.append(_parse_event(await events.__anext__()))
+        await events.aclose()
+        return received
+
+    (kind, version, snapshot), (delta_kind, delta_version, delta) = asyncio.run(consume())
+    assert kind == "snapshot" and version == 1
+    assert sorted(item["code"] for item in snapshot["items"]) == sorted(subscribed)
+    assert delta_kind == "delta" and delta_version > version
+    assert delta["changed"] and set(delta["changed"]) <= subscribed
+    assert store.subscriber_count == 0
+
+    # 带 Last-Event-ID 重连时补发之后的增量，不再发送完整快照
+    store.update(frames[0])
+    (kind, version, delta), = asyncio.run(consume(last_version=delta_version, count=1))
+    assert kind == "delta" and version == store.version
+    assert set(delta["changed"]) == subscribed
@@ -0,0 +1,70 @@
+from datetime import date
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from app.models.rollup import StockTradeRollup
+from app.services import stock as stock_service
+from app.services.rollup import rebuild_rollups, resample_bars, update_rollups
+from tests.factories import create_stock_basic
+from tests.fakes import FakeTradeProvider
+
+ROLLUP_COLUMNS = ["period", "period_start", "trade_date", "open_price", "high_price", "low_price",
+                  "close_price", "volume", "amount", "bar_count"]
+
+def _rollup_rows(db_session, stock_id):
+    return db_session.execute(
+        select(*[getattr(StockTradeRollup, column) for column in ROLLUP_COLUMNS])
+        .where(StockTradeRollup.stock_id == stock_id)
+        .order_by(StockTradeRollup.period, StockTradeRollup.period_start)
+    ).all()
+
+def test_resample_bars_matches_pandas_resample():
+    """测试周期K线与 pandas resample 的结果一致"""
+    trades = FakeTradeProvider().fetch_daily("000001", date(2023, 1, 1), date(2023, 12, 31))
+    daily = trades.set_index(pd.to_datetime(trades["trade_date"]))
+    aggregations = {"open_price": "first", "high_price": "max", "low_price": "min",
+                    "close_price": "last", "volume": "sum", "amount": "sum"}
+    for period, rule in [("week", "W-SUN"), ("month", "MS"), ("quarter", "QS")]:
+        bars = resample_bars(trades, period)
+        expected = daily.resample(rule).agg(aggregations).dropna()
+        assert len(bars) == len(expected)
+        assert np.allclose(bars[list(aggregations)].to_numpy(float), expected.to_numpy(float))
+    weeks = resample_bars(trades, "week")
+    assert (pd.to_datetime(weeks["period_start"]).dt.weekday == 0).all()
+    assert weeks["bar_count"].sum() == len(trades)
+
+def test_incremental_rollups_match_rebuild(db_session):
+    """测试分批写入日线时增量更新的周期K线与完整重建一致"""
+    stock = create_stock_basic(db_session, code="000001")
+    trades = FakeTradeProvider().fetch_daily("000001", date(2023, 1, 1), date(2023, 8, 31))
+    # 第二批从周中、月中开始，覆盖已有周期的后半段
+    for batch in [trades.iloc[:100], trades.iloc[100:]]:
+        stock_service._write_stock_trades(db_session, stock.id, batch)
+        update_rollups(db_session, stock.id, batch)
+    incremental = _rollup_rows(db_session, stock.id)
+
+    rebuild_rollups(db_session, [stock.id])
+    assert _rollup_rows(db_session, stock.id) == incremental
+    periods = [row.period for row in incremental]
+    assert periods.count("month") == 8 and periods.count("quarter") == 3
+
+def test_trades_and_indicators_by_period(client, db_session):
+    """测试交易数据和技术指标接口按周期读取聚合K线"""
+    stock = create_stock_basic(db_session, code="000001")
+    stock_service.update_stock_trades(db_session, stock_code="000001", days=400, provider=FakeTradeProvider())
+
+    response = client.get("/api/v1/stocks/trades/000001?period=week&limit=5")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 5
+    assert data["items"][0]["period"] == "week"
+    assert 1 <= data["items"][0]["bar_count"] <= 5
+    second_page = client.get(f"/api/v1/stocks/trades/000001?period=week&limit=5&cursor={data['next_cursor']}").json()
+    assert second_page["items"][0]["trade_date"] < data["items"][-1]["trade_date"]
+    assert "period" not in client.get("/api/v1/stocks/trades/000001?limit=1").json()["items"][0]
+
+    weekly = client.get("/api/v1/analysis/indicators/000001?period=week&indicators=ma5,macd").json()
+    weekly_dates = sorted(row.trade_date.strftime("%Y-%m-%d") for row in _rollup_rows(db_session, stock.id) if row.period == "week")
+    assert weekly["dates"] == weekly_dates[-len(weekly["dates"]):]
+    assert weekly["ma5"][-1] is not None
+    assert client.get("/api/v1/analysis/indicators/000001?period=year").status_code == 422
@@ -1,13 +1,23 @@
+import io
+import time
 import pytest
-from datetime import date
-from app.models.stock import StockBasic
-from tests.factories import create_stock_basic, create_stock_trade
+import pandas as pd
+from datetime import date, datetime, timedelta
+from app.models.indicator import StockIndicatorState
+from app.models.stock import StockBasic, StockTrade
+from app.services import stock as stock_service
+from app.services import ingestion
+from tests.factories import bulk_create_stock_basics, bulk_create_stock_trades, create_stock_basic, create_stock_trade
+from tests.fakes import FakeAkshare, FakeTradeProvider
 
-def test_update_stock_basics(client):
+def test_update_stock_basics(client, monkeypatch):
     """测试更新股票基础数据"""
+    monkeypatch.setattr(stock_service, "ak", FakeAkshare(stock_count=10))
     response = client.post("/api/v1/stocks/basics/update")
     assert response.status_code == 200
-    assert "message" in response.json()
+    data = response.json()
+    assert "message" in data
+    assert data["inserted_count"] == 10 and data["error_count"] == 0
 
 def test_get_stock_basics(client, db_session):
     """测试获取股票基础数据列表"""
@@ -19,25 +29,28 @@ def test_get_stock_basics(client, db_session):
     response = client.get("/api/v1/stocks/basics")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 2
+    assert data["total"] == 2
+    assert [item["code"] for item in data["items"]] == ["000001", "000002"]
+    assert data["next_cursor"] is None
     
     # 测试分页
     response = client.get("/api/v1/stocks/basics?skip=0&limit=1")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 1
+    assert len(data["items"]) == 1
+    assert data["next_cursor"] is not None
     
     # 测试按行业筛选
     response = client.get("/api/v1/stocks/basics?industry=测试行业")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 2
+    assert len(data["items"]) == 2
     
     # 测试按市场筛选
     response = client.get("/api/v1/stocks/basics?market=主板")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 2
+    assert len(data["items"]) == 2
 
 def test_get_stock_trades(client, db_session):
     """测试获取股票交易数据"""
@@ -50,16 +63,255 @@ def test_get_stock_trades(client, db_session):
     response = client.get(f"/api/v1/stocks/trades/{stock.code}")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 2
+    assert data["total"] == 2
+    assert [item["trade_date"] for item in data["items"]] == ["2023-01-02", "2023-01-01"]
+    assert data["next_cursor"] is None
     
     # 测试日期筛选
     response = client.get(f"/api/v1/stocks/trades/{stock.code}?start_date=2023-01-01&end_date=2023-01-01")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 1
+    assert len(data["items"]) == 1
     
     # 测试分页
     response = client.get(f"/api/v1/stocks/trades/{stock.code}?skip=0&limit=1")
     assert response.status_code == 200
     data = response.json()
-    assert len(data) == 1 
\ No newline at end of file
+    assert len(data["items"]) == 1
+    assert data["next_cursor"] is not None
+
+def test_classify_market():
+    """测试按代码前缀批量判断市场类型"""
+    codes = pd.Series(["600000", "300750", "688981", "830799", "000001"])
+    markets = stock_service.classify_market(codes)
+    assert markets.tolist() == ["主板", "创业板", "科创板", "北交所", "中小板"]
+
+def test_bulk_upsert_stock_basics(db_session):
+    """测试批量写入股票基础数据"""
+    create_stock_basic(db_session, code="000001", name="平安银行", industry="银行", market="中小板")
+    create_stock_basic(db_session, code="000002", name="万科A", industry="房地产", market="中小板")
+    
+    stock_df = pd.DataFrame({
+        "code": ["000001", "000002", "600000"],
+        "name": ["平安银行", "万科A改", "浦发银行"],
+        "industry": ["银行", "房地产", None],
+        "market": ["中小板", "中小板", "主板"],
+        "update_time": datetime.now()
+    })
+    result = stock_service.bulk_upsert_stock_basics(db_session, stock_df, batch_size=2)
+    db_session.commit()
+    
+    assert result == {"inserted_count": 1, "updated_count": 1, "unchanged_count": 1}
+    stocks = {s.code: s for s in db_session.query(StockBasic).all()}
+    assert stocks["000002"].name == "万科A改"
+    assert stocks["600000"].market == "主板"
+    assert stocks["600000"].industry is None
+    
+    # 再次写入相同数据时全部跳过
+    result = stock_service.bulk_upsert_stock_basics(db_session, stock_df)
+    assert result == {"inserted_count": 0, "updated_count": 0, "unchanged_count": 3}
+
+def test_update_stock_trades_pipeline(db_session):
+    """测试并发采集交易数据并由单一写入者落库"""
+    create_stock_basic(db_session, code="000001", name="测试股票1")
+    create_stock_basic(db_session, code="000002", name="测试股票2")
+    create_stock_basic(db_session, code="000003", name="测试股票3")
+    
+    provider = FakeTradeProvider(latency=0.01, fail_codes={"000003"})
+    result = stock_service.update_stock_trades(db_session, days=10, provider=provider, max_workers=3, rate_limit=0)
+    
+    assert len(provider.calls) == 3
+    assert result["error_count"] == 1
+    trade_count = db_session.query(StockTrade).count()
+    assert trade_count > 0
+    assert result["updated_count"] == trade_count
+
+def test_trade_pipeline_stops_workers_when_writer_fails():
+    """写入出错时采集线程不能阻塞在已满的队列上，异常应及时抛给调用方"""
+    jobs = [(i, f"{i:06d}", date(2023, 1, 2), date(2023, 1, 31)) for i in range(1, 41)]
+
+    def progress(stats):
+        raise RuntimeError("进度回调失败")
+
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError):
+        ingestion.run_trade_pipeline(
+            jobs, FakeTradeProvider(), writer=lambda stock_id, code, df: len(df),
+            max_workers=4, queue_size=1, progress_callback=progress
+        )
+    assert time.perf_counter() - started < 5
+
+def test_update_stock_trades_commits_in_batches(db_session, monkeypatch):
+    """按批提交，不在整个采集过程中持有写事务"""
+    for i in range(1, 6):
+        create_stock_basic(db_session, code=f"00000{i}", name=f"测试股票{i}")
+    monkeypatch.setattr(stock_service.settings, "TRADE_WRITE_COMMIT_SIZE", 2)
+    commits = []
+    original_commit = db_session.commit
+    monkeypatch.setattr(db_session, "commit", lambda: (commits.append(db_session.query(StockTrade.stock_id).distinct().count()), original_commit()))
+    
+    stock_service.update_stock_trades(db_session, days=10, provider=FakeTradeProvider(), max_workers=1, rate_limit=0)
+    
+    assert commits == [2, 4, 5]
+
+def test_update_stock_trades_rolls_back_failed_stock(db_session, monkeypatch):
+    """一只股票的任一步写入失败时整只股票回滚，其他股票正常提交"""
+    failing = create_stock_basic(db_session, code="000001", name="测试股票1")
+    healthy = create_stock_basic(db_session, code="000002", name="测试股票2")
+    original = stock_service.update_rollups
+    
+    def update_rollups(db, stock_id, df):
+        if stock_id == failing.id:
+            raise RuntimeError("模拟周期K线写入失败")
+        return original(db, stock_id, df)
+    
+    monkeypatch.setattr(stock_service, "update_rollups", update_rollups)
+    result = stock_service.update_stock_trades(db_session, days=10, provider=FakeTradeProvider(), max_workers=1, rate_limit=0)
+    
+    assert result["failed_codes"] == ["000001"]
+    assert db_session.query(StockTrade).filter_by(stock_id=failing.id).count() == 0
+    assert db_session.query(StockIndicatorState).filter_by(stock_id=failing.id).count() == 0
+    assert db_session.query(StockTrade).filter_by(stock_id=healthy.id).count() > 0
+    assert db_session.query(StockIndicatorState).filter_by(stock_id=healthy.id).count() == 1
+
+def test_update_with_fake_akshare(db_session, monkeypatch):
+    """测试使用模拟 akshare 走完整的股票列表和历史行情解析流程"""
+    fake = FakeAkshare(stock_count=30)
+    monkeypatch.setattr(stock_service, "ak", fake)
+    monkeypatch.setattr(ingestion, "ak", fake)
+    
+    result = stock_service.update_stock_basics(db_session)
+    assert result["inserted_count"] == 30 and result["error_count"] == 0
+    assert db_session.query(StockBasic).filter(StockBasic.market == "创业板").count() == 3
+    
+    result = stock_service.update_stock_trades(db_session, stock_code="300000", days=20)
+    assert result["updated_count"] == db_session.query(StockTrade).count() > 0
+
+def test_bulk_factories(db_session):
+    """测试批量生成股票和交易数据"""
+    code_ids = bulk_create_stock_basics(db_session, 25)
+    assert len(code_ids) == 25
+    rows = bulk_create_stock_trades(db_session, list(code_ids.values()), days=40, end_date=date(2024, 3, 29))
+    assert rows == 25 * 40
+    trades = db_session.query(StockTrade).filter(StockTrade.stock_id == code_ids["600000"]).order_by(StockTrade.trade_date).all()
+    assert len(trades) == 40
+    assert trades[-1].trade_date == date(2024, 3, 29)
+    assert all(t.low_price <= min(t.open_price, t.close_price) <= max(t.open_price, t.close_price) <= t.high_price for t in trades)
+
+def test_update_stock_trades_incremental(db_session):
+    """测试按最新交易日期增量更新"""
+    today = datetime.now().date()
+    stale = create_stock_basic(db_session, code="000001", name="测试股票1")
+    fresh = create_stock_basic(db_session, code="000002", name="测试股票2")
+    create_stock_basic(db_session, code="000003", name="测试股票3")
+    create_stock_trade(db_session, stale.id, trade_date=today - timedelta(days=7))
+    create_stock_trade(db_session, fresh.id, trade_date=today)
+    
+    provider = FakeTradeProvider()
+    result = stock_service.update_stock_trades(db_session, days=30, incremental=True, provider=provider)
+    
+    calls = {code: (start, end) for code, start, end in provider.calls}
+    assert "000002" not in calls
+    assert calls["000001"][0] > today - timedelta(days=7)
+    assert calls["000003"][0] == today - timedelta(days=30)
+    assert result["skipped_count"] == 1
+
+def test_update_stock_trades_upsert_is_idempotent(db_session):
+    """测试重复更新同一时间段不会产生重复交易数据"""
+    create_stock_basic(db_session, code="000001", name="测试股票")
+    provider = FakeTradeProvider()
+    
+    first = stock_service.update_stock_trades(db_session, days=10, provider=provider)
+    count = db_session.query(StockTrade).count()
+    second = stock_service.update_stock_trades(db_session, days=10, provider=provider)
+    
+    assert first["updated_count"] == second["updated_count"] == count
+    assert db_session.query(StockTrade).count() == count
+
+def test_keyset_pagination(client, db_session):
+    """测试游标分页和跳过总数统计"""
+    for i in range(1, 6):
+        create_stock_basic(db_session, code=f"00000{i}", name=f"测试股票{i}")
+    stock = db_session.query(StockBasic).filter_by(code="000001").one()
+    for i in range(5):
+        create_stock_trade(db_session, stock.id, trade_date=date(2023, 1, i + 1))
+    
+    codes = []
+    cursor = None
+    while True:
+        params = {"limit": 2, "include_total": "false"}
+        if cursor:
+            params["cursor"] = cursor
+        data = client.get("/api/v1/stocks/basics", params=params).json()
+        assert data["total"] is None
+        codes += [item["code"] for item in data["items"]]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert codes == ["000001", "000002", "000003", "000004", "000005"]
+    
+    first = client.get("/api/v1/stocks/trades/000001?limit=3").json()
+    assert first["total"] == 5
+    second = client.get(f"/api/v1/stocks/trades/000001?limit=3&cursor={first['next_cursor']}").json()
+    dates = [item["trade_date"] for item in first["items"] + second["items"]]
+    assert dates == ["2023-01-05", "2023-01-04", "2023-01-03", "2023-01-02", "2023-01-01"]
+    assert second["next_cursor"] is None
+    
+    # 最后一页恰好取满时不返回游标，不会多请求一个空页
+    assert client.get("/api/v1/stocks/basics", params={"limit": 5}).json()["next_cursor"] is None
+    assert client.get("/api/v1/stocks/trades/000001?limit=5").json()["next_cursor"] is None
+    first = client.get("/api/v1/stocks/trades/000001?limit=4").json()
+    last = client.get(f"/api/v1/stocks/trades/000001?limit=1&cursor={first['next_cursor']}").json()
+    assert len(last["items"]) == 1 and last["next_cursor"] is None
+    
+    response = client.get("/api/v1/stocks/trades/000001?cursor=invalid")
+    assert response.status_code == 400
+
+def test_search_stocks_ranked(client, db_session):
+    """测试搜索索引按匹配程度排序，并支持拼音首字母"""
+    create_stock_basic(db_session, code="000001", name="平安银行", industry="银行")
+    create_stock_basic(db_session, code="600000", name="浦发银行", industry="银行")
+    create_stock_basic(db_session, code="601318", name="中国平安", industry="保险")
+    create_stock_basic(db_session, code="600036", name="招商银行", industry="银行")
+    
+    data = client.get("/api/v1/stocks/search", params={"q": "平安"}).json()
+    assert [item["code"] for item in data] == ["000001", "601318"]
+    
+    data = client.get("/api/v1/stocks/search", params={"q": "600000"}).json()
+    assert data[0]["code"] == "600000" and data[0]["rank"] == 0
+    
+    data = client.get("/api/v1/stocks/search", params={"q": "zsyh"}).json()
+    assert [item["code"] for item in data] == ["600036"]
+    
+    data = client.get("/api/v1/stocks/basics", params={"search": "银行", "limit": 2}).json()
+    assert data["total"] == 3
+    assert [item["code"] for item in data["items"]] == ["000001", "600000"]
+    data = client.get("/api/v1/stocks/basics", params={"search": "银行", "limit": 2, "cursor": data["next_cursor"]}).json()
+    assert [item["code"] for item in data["items"]] == ["600036"]
+    assert data["next_cursor"] is None
+
+def test_get_bulk_stock_trades(client, db_session):
+    """测试以 Arrow/Parquet 批量获取多只股票的交易数据"""
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    first = create_stock_basic(db_session, code="000001", name="测试股票1")
+    second = create_stock_basic(db_session, code="000002", name="测试股票2")
+    for i in range(3):
+        create_stock_trade(db_session, first.id, trade_date=date(2023, 1, 3 + i), close_price=10.0 + i)
+        create_stock_trade(db_session, second.id, trade_date=date(2023, 1, 3 + i), close_price=20.0 + i)
+
+    response = client.get("/api/v1/stocks/trades/bulk?codes=000002,000001,999999&start_date=2023-01-04")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column("code").to_pylist() == ["000001", "000001", "000002", "000002"]
+    assert table.column("close_price").to_pylist() == [11.0, 12.0, 21.0, 22.0]
+    assert table.schema.field("trade_date").type == pa.date32()
+
+    response = client.get("/api/v1/stocks/trades/bulk?codes=000001&format=parquet")
+    assert response.status_code == 200
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column("trade_date").to_pylist() == [date(2023, 1, 3), date(2023, 1, 4), date(2023, 1, 5)]
+
+    assert client.get("/api/v1/stocks/trades/bulk?codes=,").status_code == 400
@@ -0,0 +1,44 @@
+import pytest
+from app import tasks
+from app.models.stock import StockTrade
+from app.services import stock as stock_service
+from tests.factories import create_stock_basic
+from tests.fakes import FakeTradeProvider
+
+@pytest.fixture
+def task_db(db_session, monkeypatch):
+    """让任务使用测试数据库会话和模拟数据源"""
+    monkeypatch.setattr(tasks, "SessionLocal", lambda: db_session)
+    monkeypatch.setattr(stock_service, "AkshareTradeProvider", lambda: FakeTradeProvider(fail_codes={"000003"}))
+    return db_session
+
+def test_refresh_all_stock_trades_job(client, task_db):
+    """测试全市场交易数据刷新任务分批执行并上报进度"""
+    for i in range(1, 6):
+        create_stock_basic(task_db, code=f"00000{i}", name=f"测试股票{i}")
+    
+    response = client.post("/api/v1/jobs/trades/refresh?days=10&chunk_size=2")
+    assert response.status_code == 200
+    job_id = response.json()["job_id"]
+    
+    response = client.get(f"/api/v1/jobs/{job_id}")
+    assert response.status_code == 200
+    data = response.json()
+    
+    assert data["state"] == "SUCCESS"
+    assert data["total"] == 5
+    assert data["processed"] == 5
+    assert data["progress"] == 1.0
+    assert len(data["chunks"]) == 3
+    assert [c["total"] for c in data["chunks"]] == [2, 2, 1]
+    assert data["chunks"][1]["failed_codes"] == ["000003"]
+    assert data["errors"] == 1
+    assert data["written_rows"] == task_db.query(StockTrade).count()
+    assert data["result"]["chunks"] == 3
+
+def test_update_stock_trades_task(task_db):
+    """测试单只股票交易数据更新任务"""
+    create_stock_basic(task_db, code="000001", name="测试股票")
+    
+    result = tasks.update_stock_trades.delay(stock_code="000001", days=10)
+    assert result.get()["updated_count"] > 0
@@ -10,6 +10,7 @@ interface StockBasicsResponse {
   }>
   skip: number
   limit: number
+  next_cursor?: string | null
 }
 
 interface StockTradesResponse {
@@ -25,6 +26,7 @@ interface StockTradesResponse {
   }>
   skip: number
   limit: number
+  next_cursor?: string | null
 }
 
 export async function fetchStockBasics(